@@ -0,0 +1,83 @@
+"""
+Admin account search against the in-memory n-gram index: 100k remorqueurs
+with generated names, usernames and numbers, searched by name fragments,
+usernames and partial numbers, with and without filters.
+
+Purely in memory, nothing touches the database. Usage:
+
+    python -m server.benchmarks.account_search [remorqueurs] [queries]
+"""
+import random
+import statistics
+import sys
+import time
+from server.controllers.accountSearchController import RemorqueurDoc, NgramIndex, search_text
+
+FIRST_NAMES = ["jean", "marie", "luc", "sophie", "marc", "julie", "pierre", "nathalie", "eric", "isabelle",
+               "david", "chantal", "alain", "sylvie", "martin", "josee", "michel", "karine", "andre", "caroline"]
+LAST_NAMES = ["tremblay", "gagnon", "roy", "cote", "bouchard", "gauthier", "morin", "lavoie", "fortin", "gagne",
+              "ouellet", "pelletier", "belanger", "levesque", "bergeron", "leblanc", "paquette", "girard", "simard"]
+PAYMENT_STATUSES = ["paid", "unpaid", "pending"]
+PAGE_SIZE = 25
+
+
+def report(label: str, timings: list):
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1] if len(timings) > 1 else timings[0]
+    print(f"{label:<42} median {statistics.median(timings) * 1e6:8.1f} us   p95 {p95 * 1e6:8.1f} us")
+
+
+def brute_force(docs: list, term: str, accept) -> list:
+    return [doc.id for doc in docs if term in doc.text and accept(doc)][:PAGE_SIZE + 1]
+
+
+def run(count: int, query_count: int):
+    rng = random.Random(42)
+    docs = []
+    for remorqueur_id in range(1, count + 1):
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}-{rng.choice(LAST_NAMES)}"
+        username = f"{name.split()[0][:3]}{remorqueur_id}"
+        number = f"+1{rng.choice(['514', '438', '450', '819'])}{rng.randrange(10 ** 7):07d}"
+        tel = f"({number[2:5]}) {number[5:8]}-{number[8:]}"
+        docs.append(RemorqueurDoc(
+            remorqueur_id, name.title(), username, tel, rng.random() < 0.8, rng.randrange(2000),
+            f"garage {rng.randrange(2000)}", rng.choice(PAYMENT_STATUSES), search_text(name, username, tel, number),
+        ))
+
+    started = time.perf_counter()
+    index = NgramIndex.build(docs)
+    print(f"{count} remorqueurs indexed in {time.perf_counter() - started:.2f} s: {index.stats()}\n")
+
+    def everyone(doc):
+        return True
+
+    def active_paid(doc):
+        return doc.is_active and doc.payment_status == "paid"
+
+    cases = {
+        "name fragment": lambda doc: doc.name.split()[1][:5].lower(),
+        "username": lambda doc: doc.username,
+        "partial number": lambda doc: doc.text.rsplit("+1", 1)[1][:7],
+    }
+    mismatches = checked = 0
+    for label, make_term in cases.items():
+        for accept, suffix in ((everyone, ""), (active_paid, ", active and paid")):
+            timings = []
+            for query in range(query_count):
+                term = make_term(rng.choice(docs))
+                started = time.perf_counter()
+                hits = index.search(term, 0, PAGE_SIZE, accept)
+                timings.append(time.perf_counter() - started)
+                if query % 50 == 0:
+                    checked += 1
+                    if [doc.id for doc in hits] != brute_force(docs, term, accept):
+                        mismatches += 1
+            report(label + suffix, timings)
+
+    print(f"\nmismatches against a full scan: {mismatches} of {checked} checked")
+
+
+if __name__ == "__main__":
+    remorqueurs = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    queries = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    run(remorqueurs, queries)
@@ -0,0 +1,150 @@
+"""
+Broadcast creation and inbox reads at 10k recipients: one recipient row per
+garage (previous behaviour) against a broadcast stored once and resolved at
+read time.
+
+Runs against the database configured in .env and removes everything it
+creates. Usage:
+
+    python -m server.benchmarks.broadcast_fanout [garages] [samples]
+"""
+import asyncio
+import secrets
+import statistics
+import sys
+import time
+from sqlalchemy import delete, insert, select, update
+from server.controllers.messagesController import (
+    admin_message_recipients,
+    create_admin_message_logic,
+    get_admin_messages_page_logic,
+    get_unread_count_logic,
+    unread_cache,
+)
+from server.models.authModel import Role, User
+from server.models.garageModel import Garage
+from server.models.messagesModel import AdminMessage, AdminMessageCreate, get_eastern_time
+from server.settings import PrimarySessionLocal
+
+BATCH_SIZE = 1000
+
+
+def report(label: str, timings: list):
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1] if len(timings) > 1 else timings[0]
+    print(f"{label:<42} median {statistics.median(timings) * 1000:8.2f} ms   p95 {p95 * 1000:8.2f} ms")
+
+
+async def materialized_broadcast(db, admin_id: int, garage_ids: list) -> float:
+    """The previous to_all path: one recipient row and one counter update per garage"""
+    started = time.perf_counter()
+    message = AdminMessage(
+        admin_id=admin_id,
+        title="benchmark materialized",
+        content="x" * 500,
+        to_all=True,
+        fanout_on_read=False,
+        created_at=get_eastern_time(),
+    )
+    db.add(message)
+    await db.flush()
+    await db.execute(insert(admin_message_recipients).values([
+        {"message_id": message.id, "garage_id": garage_id, "is_read": False}
+        for garage_id in garage_ids
+    ]))
+    await db.execute(
+        update(Garage)
+        .where(Garage.id.in_(garage_ids))
+        .values(unread_admin_messages=Garage.unread_admin_messages + 1)
+    )
+    await db.commit()
+    return time.perf_counter() - started
+
+
+async def run(garage_count: int, samples: int):
+    suffix = secrets.token_hex(4)
+    admin_id = None
+    garage_ids = []
+    message_ids = []
+
+    async with PrimarySessionLocal() as db:
+        garage_role_id = (await db.execute(select(Role.id).where(Role.name == "garage"))).scalar()
+        if garage_role_id is None:
+            print("No 'garage' role in this database")
+            return
+
+        try:
+            admin = User(username=f"bench_admin_{suffix}", password="-", role_id=1, is_active=True)
+            db.add(admin)
+            await db.flush()
+            admin_id = admin.id
+
+            for start in range(0, garage_count, BATCH_SIZE):
+                await db.execute(insert(Garage).values([
+                    {
+                        "name": f"bench_{suffix}_{i}",
+                        "email": f"bench_{suffix}_{i}@example.invalid",
+                        "username": f"bench_{suffix}_{i}",
+                        "password": "-",
+                        "role_id": garage_role_id,
+                        "is_active": True,
+                        "created_by_id": admin_id,
+                    }
+                    for i in range(start, min(start + BATCH_SIZE, garage_count))
+                ]))
+            await db.commit()
+            garage_ids = list((await db.execute(
+                select(Garage.id).where(Garage.created_by_id == admin_id)
+            )).scalars())
+            print(f"{len(garage_ids)} garages created for admin {admin_id}\n")
+
+            # Broadcast creation
+            materialized, fanout = [], []
+            for _ in range(samples):
+                materialized.append(await materialized_broadcast(db, admin_id, garage_ids))
+                started = time.perf_counter()
+                await create_admin_message_logic(admin_id, AdminMessageCreate(
+                    title="benchmark fan-out on read",
+                    content="x" * 500,
+                    to_all=True,
+                    admin_id=admin_id,
+                ), db)
+                fanout.append(time.perf_counter() - started)
+            report("create broadcast, one row per garage", materialized)
+            report("create broadcast, fan-out on read", fanout)
+
+            # Inbox reads of a sample of recipients, with both kinds of broadcasts present
+            sample_ids = garage_ids[:: max(len(garage_ids) // 200, 1)]
+            inbox, badge = [], []
+            for garage_id in sample_ids:
+                started = time.perf_counter()
+                await get_admin_messages_page_logic(garage_id, db, None, 50, True)
+                inbox.append(time.perf_counter() - started)
+
+                unread_cache.invalidate("garage", [garage_id])
+                started = time.perf_counter()
+                await get_unread_count_logic("garage", garage_id, db)
+                badge.append(time.perf_counter() - started)
+            report("inbox page (50, summary)", inbox)
+            report("unread badge (no memory tier)", badge)
+        finally:
+            await db.rollback()
+            message_ids = list((await db.execute(
+                select(AdminMessage.id).where(AdminMessage.admin_id == admin_id)
+            )).scalars()) if admin_id is not None else []
+            if message_ids:
+                await db.execute(delete(admin_message_recipients).where(
+                    admin_message_recipients.c.message_id.in_(message_ids)
+                ))
+                await db.execute(delete(AdminMessage).where(AdminMessage.id.in_(message_ids)))
+            if admin_id is not None:
+                await db.execute(delete(Garage).where(Garage.created_by_id == admin_id))
+                await db.execute(delete(User).where(User.id == admin_id))
+            await db.commit()
+            print("\nbenchmark data removed")
+
+
+if __name__ == "__main__":
+    garages = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    samples = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    asyncio.run(run(garages, samples))
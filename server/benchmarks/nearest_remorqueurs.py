@@ -0,0 +1,97 @@
+"""
+Nearest-driver queries against the in-memory position index while drivers
+keep moving: 50k drivers spread over the garages of a metropolitan area,
+a share of them reporting a new position between two queries.
+
+Purely in memory, nothing touches the database. Usage:
+
+    python -m server.benchmarks.nearest_remorqueurs [drivers] [garages] [queries]
+"""
+import random
+import statistics
+import sys
+import time
+from server.controllers.locationController import PositionIndex, haversine_km
+
+# Area covered by the drivers (greater Montreal) and how far they move per report
+LAT_RANGE = (45.30, 45.80)
+LON_RANGE = (-74.10, -73.30)
+STEP_DEGREES = 0.002
+
+# Reports applied between two queries (continuous updates)
+UPDATES_PER_QUERY = 50
+
+
+def report(label: str, timings: list):
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1] if len(timings) > 1 else timings[0]
+    print(f"{label:<42} median {statistics.median(timings) * 1e6:8.1f} us   p95 {p95 * 1e6:8.1f} us")
+
+
+def brute_force(positions: dict, garage_id: int, lat: float, lon: float, k: int, radius_km: float):
+    distances = sorted(
+        (haversine_km(lat, lon, p_lat, p_lon), remorqueur_id)
+        for remorqueur_id, (p_garage, p_lat, p_lon) in positions.items()
+        if p_garage == garage_id
+    )
+    return [remorqueur_id for distance, remorqueur_id in distances if distance <= radius_km][:k]
+
+
+def run(driver_count: int, garage_count: int, query_count: int):
+    rng = random.Random(42)
+    index = PositionIndex()
+    positions = {}
+
+    started = time.perf_counter()
+    now = time.time()
+    for remorqueur_id in range(1, driver_count + 1):
+        garage_id = rng.randrange(garage_count)
+        lat, lon = rng.uniform(*LAT_RANGE), rng.uniform(*LON_RANGE)
+        positions[remorqueur_id] = (garage_id, lat, lon)
+        index.update(remorqueur_id, garage_id, lat, lon, now)
+    print(f"{driver_count} drivers in {garage_count} garages indexed in {time.perf_counter() - started:.2f} s\n")
+
+    update_timings, query_timings, wide_timings = [], [], []
+    mismatches = 0
+    for query in range(query_count):
+        # Drivers keep moving between queries
+        for _ in range(UPDATES_PER_QUERY):
+            remorqueur_id = rng.randrange(1, driver_count + 1)
+            garage_id, lat, lon = positions[remorqueur_id]
+            lat += rng.uniform(-STEP_DEGREES, STEP_DEGREES)
+            lon += rng.uniform(-STEP_DEGREES, STEP_DEGREES)
+            positions[remorqueur_id] = (garage_id, lat, lon)
+            now += 0.001
+            started = time.perf_counter()
+            index.update(remorqueur_id, garage_id, lat, lon, now)
+            update_timings.append(time.perf_counter() - started)
+
+        garage_id = rng.randrange(garage_count)
+        lat, lon = rng.uniform(*LAT_RANGE), rng.uniform(*LON_RANGE)
+
+        started = time.perf_counter()
+        nearest = index.nearest(garage_id, lat, lon, 5, 25, now)
+        query_timings.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        index.nearest(garage_id, lat, lon, 20, 100, now)
+        wide_timings.append(time.perf_counter() - started)
+
+        # Check a sample against a full scan
+        if query % 50 == 0:
+            expected = brute_force(positions, garage_id, lat, lon, 5, 25)
+            if [position.remorqueur_id for _, position in nearest] != expected:
+                mismatches += 1
+
+    report("position update", update_timings)
+    report("5 nearest within 25 km", query_timings)
+    report("20 nearest within 100 km", wide_timings)
+    print(f"\nmismatches against a full scan: {mismatches} of {(query_count + 49) // 50} checked")
+    print(index.stats())
+
+
+if __name__ == "__main__":
+    drivers = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    garages = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    queries = int(sys.argv[3]) if len(sys.argv) > 3 else 2000
+    run(drivers, garages, queries)
@@ -0,0 +1,335 @@
+import asyncio
+import os
+import re
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Set
+from fastapi import HTTPException, status
+from sqlalchemy import select, union
+from server.models.garageModel import Garage
+from server.models.remorqueurModel import Remorqueur
+from server.models.reponseModel import GarageSearchHit, GarageSearchPage, RemorqueurSearchHit, RemorqueurSearchPage
+from server.settings import AsyncSession, PrimarySessionLocal
+
+# Optional in-memory n-gram index: substring matches in any field instead of
+# prefixes, without touching MariaDB. Rebuilt in the background, so accounts
+# created or changed in the meantime show up after up to a refresh.
+ACCOUNT_NGRAM_INDEX = os.getenv("ACCOUNT_NGRAM_INDEX", "false").lower() in ("1", "true", "yes")
+ACCOUNT_INDEX_REFRESH_SECONDS = int(os.getenv("ACCOUNT_INDEX_REFRESH_SECONDS", 60))
+
+NGRAM_SIZE = 3
+
+# A term of digits and phone punctuation also matches remorqueurs.tel_normalized
+PHONE_TERM_PATTERN = re.compile(r"^\+?[\d\s().-]{3,}$")
+
+
+class GarageDoc(NamedTuple):
+    id: int
+    name: str
+    email: str
+    username: str
+    is_active: bool
+    payment_status: Optional[str]
+    text: str  # searched fields, lowercased and joined
+
+
+class RemorqueurDoc(NamedTuple):
+    id: int
+    name: str
+    username: str
+    tel: str
+    is_active: bool
+    garage_id: int
+    garage_name: str
+    payment_status: Optional[str]  # of the garage
+    text: str
+
+
+def search_text(*fields: Optional[str]) -> str:
+    return "\n".join(field.lower() for field in fields if field)
+
+
+def ngrams(text: str) -> Set[str]:
+    return {text[i:i + NGRAM_SIZE] for i in range(len(text) - NGRAM_SIZE + 1)}
+
+
+class NgramIndex:
+    """
+    Documents by id plus, for every n-gram of their text, the sorted array
+    of the ids containing it (4 bytes per posting, about 20 MB for 100k
+    remorqueurs). A search intersects the postings of the term's n-grams,
+    walking the shortest in id order from the cursor, so a page stops as
+    soon as it is full. Immutable once built.
+    """
+
+    def __init__(self, docs: Dict[int, NamedTuple], postings: Dict[str, array]):
+        self._docs = docs
+        self._postings = postings
+
+    @classmethod
+    def build(cls, docs: Iterable[NamedTuple]) -> "NgramIndex":
+        by_id = {doc.id: doc for doc in docs}
+        postings: Dict[str, List[int]] = {}
+        for doc_id in sorted(by_id):
+            for gram in ngrams(by_id[doc_id].text):
+                postings.setdefault(gram, []).append(doc_id)
+        return cls(by_id, {gram: array("i", ids) for gram, ids in postings.items()})
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def search(self, term: str, after_id: int, limit: int, accept: Callable[[NamedTuple], bool]) -> List[NamedTuple]:
+        """Up to limit + 1 documents after after_id whose text contains term (lowercased, >= NGRAM_SIZE chars)"""
+        postings = []
+        for gram in ngrams(term):
+            ids = self._postings.get(gram)
+            if ids is None:
+                return []
+            postings.append(ids)
+        postings.sort(key=len)
+        shortest, others = postings[0], postings[1:]
+
+        hits = []
+        for position in range(bisect_right(shortest, after_id), len(shortest)):
+            doc_id = shortest[position]
+            if not all(_contains(ids, doc_id) for ids in others):
+                continue
+            doc = self._docs[doc_id]
+            if term in doc.text and accept(doc):
+                hits.append(doc)
+                if len(hits) > limit:
+                    break
+        return hits
+
+    def stats(self) -> dict:
+        return {
+            "documents": len(self._docs),
+            "ngrams": len(self._postings),
+            "postings": sum(len(ids) for ids in self._postings.values()),
+        }
+
+
+def _contains(ids: array, doc_id: int) -> bool:
+    position = bisect_left(ids, doc_id)
+    return position < len(ids) and ids[position] == doc_id
+
+
+class AccountIndex:
+    """Garage and remorqueur n-gram indexes, swapped in together after each rebuild"""
+
+    def __init__(self):
+        self.garages = NgramIndex({}, {})
+        self.remorqueurs = NgramIndex({}, {})
+        self.loaded = False
+        self.build_seconds = 0.0
+        self.queries = 0
+
+    async def refresh(self, db: AsyncSession):
+        garage_rows = (await db.execute(
+            select(Garage.id, Garage.name, Garage.email, Garage.username, Garage.is_active, Garage.payment_status)
+        )).all()
+        remorqueur_rows = (await db.execute(
+            select(
+                Remorqueur.id, Remorqueur.name, Remorqueur.username, Remorqueur.tel, Remorqueur.tel_normalized,
+                Remorqueur.is_active, Remorqueur.garage_id,
+                Garage.name.label("garage_name"), Garage.payment_status,
+            )
+            .join(Garage, Garage.id == Remorqueur.garage_id)
+        )).all()
+
+        started = time.perf_counter()
+        # Building is pure CPU work: keep it off the event loop
+        self.garages, self.remorqueurs = await asyncio.to_thread(
+            build_account_indexes, garage_rows, remorqueur_rows
+        )
+        self.build_seconds = time.perf_counter() - started
+        self.loaded = True
+
+    async def refresh_periodically(self):
+        while True:
+            await load_account_index()
+            await asyncio.sleep(ACCOUNT_INDEX_REFRESH_SECONDS)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": ACCOUNT_NGRAM_INDEX,
+            "loaded": self.loaded,
+            "build_seconds": round(self.build_seconds, 3),
+            "queries": self.queries,
+            "garages": self.garages.stats(),
+            "remorqueurs": self.remorqueurs.stats(),
+        }
+
+
+def build_account_indexes(garage_rows, remorqueur_rows):
+    garages = NgramIndex.build(
+        GarageDoc(
+            row.id, row.name, row.email, row.username, row.is_active, row.payment_status,
+            search_text(row.name, row.email, row.username),
+        )
+        for row in garage_rows
+    )
+    remorqueurs = NgramIndex.build(
+        RemorqueurDoc(
+            row.id, row.name, row.username, row.tel, row.is_active, row.garage_id, row.garage_name,
+            row.payment_status, search_text(row.name, row.username, row.tel, row.tel_normalized),
+        )
+        for row in remorqueur_rows
+    )
+    return garages, remorqueurs
+
+
+account_index = AccountIndex()
+
+
+async def load_account_index() -> bool:
+    try:
+        async with PrimarySessionLocal() as db:
+            await account_index.refresh(db)
+        return True
+    except Exception as e:
+        print(f"Error loading account index: {str(e)}")
+        return False
+
+
+def _search_term(q: str) -> str:
+    term = q.strip()
+    if not term:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Empty search term")
+    return term
+
+
+def _use_index(term: str) -> bool:
+    return ACCOUNT_NGRAM_INDEX and account_index.loaded and len(term) >= NGRAM_SIZE
+
+
+def _accepts(is_active: Optional[bool], payment_status: Optional[str]) -> Callable[[NamedTuple], bool]:
+    def accept(doc) -> bool:
+        if is_active is not None and doc.is_active != is_active:
+            return False
+        return payment_status is None or doc.payment_status == payment_status
+    return accept
+
+
+def _tel_prefixes(term: str) -> List[str]:
+    """tel_normalized prefixes a phone-looking term may stand for, with or without the country code"""
+    if not PHONE_TERM_PATTERN.match(term):
+        return []
+    digits = re.sub(r"\D", "", term)
+    if len(digits) < 3:
+        return []
+    if term.startswith("+"):
+        return ["+" + digits]
+    return ["+" + digits, "+1" + digits]
+
+
+async def search_garages_logic(
+    q: str,
+    is_active: Optional[bool],
+    payment_status: Optional[str],
+    after_id: int,
+    limit: int,
+    db: AsyncSession,
+) -> GarageSearchPage:
+    """
+    Garages whose name, email or username starts with q (contains q when
+    served by the n-gram index), in id order. The prefixes are answered by
+    the unique indexes of the three columns, one range scan each, and only
+    the matching ids are joined back for the page.
+    """
+    term = _search_term(q)
+    if _use_index(term):
+        account_index.queries += 1
+        docs = account_index.garages.search(term.lower(), after_id, limit, _accepts(is_active, payment_status))
+        items = [GarageSearchHit(**doc._asdict()) for doc in docs]  # text is ignored
+        source = "index"
+    else:
+        matching = union(
+            select(Garage.id).where(Garage.name.startswith(term, autoescape=True)),
+            select(Garage.id).where(Garage.email.startswith(term, autoescape=True)),
+            select(Garage.id).where(Garage.username.startswith(term, autoescape=True)),
+        ).subquery()
+        query = (
+            select(Garage.id, Garage.name, Garage.email, Garage.username, Garage.is_active, Garage.payment_status)
+            .join(matching, matching.c.id == Garage.id)
+            .where(Garage.id > after_id)
+        )
+        if is_active is not None:
+            query = query.where(Garage.is_active == is_active)
+        if payment_status is not None:
+            query = query.where(Garage.payment_status == payment_status)
+        rows = (await db.execute(query.order_by(Garage.id).limit(limit + 1))).all()
+        items = [GarageSearchHit(**row._mapping) for row in rows]
+        source = "db"
+
+    has_more = len(items) > limit
+    items = items[:limit]
+    return GarageSearchPage(
+        items=items,
+        next_cursor=str(items[-1].id) if has_more else None,
+        source=source,
+    )
+
+
+async def search_remorqueurs_logic(
+    q: str,
+    is_active: Optional[bool],
+    payment_status: Optional[str],
+    after_id: int,
+    limit: int,
+    db: AsyncSession,
+) -> RemorqueurSearchPage:
+    """
+    Remorqueurs whose name or username starts with q, or whose number starts
+    with the digits of q, in id order; payment_status filters on their
+    garage. Same two-step plan as search_garages_logic.
+    """
+    term = _search_term(q)
+    if _use_index(term):
+        account_index.queries += 1
+        # Numbers are matched on their digits, whatever the punctuation typed
+        needle = re.sub(r"\D", "", term) if _tel_prefixes(term) else term.lower()
+        docs = account_index.remorqueurs.search(needle, after_id, limit, _accepts(is_active, payment_status))
+        items = [
+            RemorqueurSearchHit(
+                id=doc.id, name=doc.name, username=doc.username, tel=doc.tel,
+                is_active=doc.is_active, garage_id=doc.garage_id, garage_name=doc.garage_name,
+            )
+            for doc in docs
+        ]
+        source = "index"
+    else:
+        prefix_queries = [
+            select(Remorqueur.id).where(Remorqueur.name.startswith(term, autoescape=True)),
+            select(Remorqueur.id).where(Remorqueur.username.startswith(term, autoescape=True)),
+        ]
+        prefix_queries += [
+            select(Remorqueur.id).where(Remorqueur.tel_normalized.startswith(prefix, autoescape=True))
+            for prefix in _tel_prefixes(term)
+        ]
+        matching = union(*prefix_queries).subquery()
+        query = (
+            select(
+                Remorqueur.id, Remorqueur.name, Remorqueur.username, Remorqueur.tel, Remorqueur.is_active,
+                Remorqueur.garage_id, Garage.name.label("garage_name"),
+            )
+            .join(matching, matching.c.id == Remorqueur.id)
+            .join(Garage, Garage.id == Remorqueur.garage_id)
+            .where(Remorqueur.id > after_id)
+        )
+        if is_active is not None:
+            query = query.where(Remorqueur.is_active == is_active)
+        if payment_status is not None:
+            query = query.where(Garage.payment_status == payment_status)
+        rows = (await db.execute(query.order_by(Remorqueur.id).limit(limit + 1))).all()
+        items = [RemorqueurSearchHit(**row._mapping) for row in rows]
+        source = "db"
+
+    has_more = len(items) > limit
+    items = items[:limit]
+    return RemorqueurSearchPage(
+        items=items,
+        next_cursor=str(items[-1].id) if has_more else None,
+        source=source,
+    )
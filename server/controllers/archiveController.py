@@ -0,0 +1,217 @@
+import asyncio
+import os
+from datetime import timedelta
+from typing import Optional
+from fastapi import HTTPException
+from sqlalchemy import Boolean, Column, DateTime, Index, Integer, Table, and_, delete, func, insert, literal, or_, select
+from server.controllers.messagesController import (
+    BROADCAST_READER_SENDER,
+    _get_message_page,
+    admin_message_recipients,
+    garage_message_recipients,
+    release_message_stmts,
+    unread_cache,
+)
+from server.models.authModel import Base
+from server.models.garageModel import Garage
+from server.models.messagesModel import (
+    AdminMessage,
+    AdminMessagePage,
+    ArchivedAdminMessage,
+    ArchivedGarageMessage,
+    GarageMessage,
+    GarageMessagePage,
+    MessageDeliveryJob,
+    get_eastern_time,
+)
+from server.models.remorqueurModel import Remorqueur
+from server.settings import AsyncSession, PrimarySessionLocal
+
+# Messages older than this leave the hot tables (0 disables archiving)
+MESSAGE_RETENTION_DAYS = int(os.getenv("MESSAGE_RETENTION_DAYS", 365))
+
+# Messages moved per transaction, and the pause between two batches so
+# archiving never holds locks long enough to stall inbox traffic
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", 500))
+ARCHIVE_BATCH_PAUSE_SECONDS = 0.2
+ARCHIVE_INTERVAL_SECONDS = 3600
+
+# MariaDB named lock claimed for a whole run: every worker wakes up hourly,
+# only the one holding the lock archives, the others skip that run
+ARCHIVE_LOCK_NAME = "messages_archive"
+
+admin_message_recipients_archive = Table(
+    "admin_message_recipients_archive",
+    Base.metadata,
+    Column("message_id", Integer, primary_key=True),
+    Column("garage_id", Integer, primary_key=True),
+    Column("is_read", Boolean, default=False, nullable=False),
+    Column("archived_at", DateTime, nullable=False),
+    Index("ix_admin_message_recipients_archive_garage", "garage_id", "message_id"),
+    extend_existing=True
+)
+
+garage_message_recipients_archive = Table(
+    "garage_message_recipients_archive",
+    Base.metadata,
+    Column("message_id", Integer, primary_key=True),
+    Column("remorqueur_id", Integer, primary_key=True),
+    Column("is_read", Boolean, default=False, nullable=False),
+    Column("archived_at", DateTime, nullable=False),
+    Index("ix_garage_message_recipients_archive_remorqueur", "remorqueur_id", "message_id"),
+    extend_existing=True
+)
+
+# kind -> (hot model, archive model, hot recipients, archive recipients, recipient column, sender column)
+ARCHIVES = {
+    "garage": (
+        AdminMessage, ArchivedAdminMessage,
+        admin_message_recipients, admin_message_recipients_archive, "garage_id", "admin_id"
+    ),
+    "remorqueur": (
+        GarageMessage, ArchivedGarageMessage,
+        garage_message_recipients, garage_message_recipients_archive, "remorqueur_id", "garage_id"
+    ),
+}
+
+
+async def archive_batch(kind: str, cutoff, db: AsyncSession) -> int:
+    """
+    Move one batch of messages older than cutoff, with their receipts, to the
+    archive tables. Only primary-key ranges of the hot tables are touched.
+    """
+    message_model, archive_model, recipients_table, archive_recipients, recipient_column, sender_column = ARCHIVES[kind]
+
+    # Messages whose recipients are still being delivered stay put
+    delivering = select(MessageDeliveryJob.message_id).where(
+        and_(
+            MessageDeliveryJob.inbox == kind,
+            MessageDeliveryJob.status.in_(["pending", "running"])
+        )
+    )
+    message_ids = list((await db.execute(
+        select(message_model.id)
+        .where(and_(message_model.created_at < cutoff, message_model.id.notin_(delivering)))
+        .order_by(message_model.created_at, message_model.id)
+        .limit(ARCHIVE_BATCH_SIZE)
+    )).scalars())
+    if not message_ids:
+        return 0
+
+    archived_at = get_eastern_time()
+    columns = ["id", "title", "content", "created_at", sender_column, "to_all", "fanout_on_read"]
+    await db.execute(
+        insert(archive_model)
+        .prefix_with("IGNORE")
+        .from_select(
+            columns + ["archived_at"],
+            select(*[getattr(message_model, column) for column in columns], literal(archived_at))
+            .where(message_model.id.in_(message_ids))
+        )
+    )
+    await db.execute(
+        insert(archive_recipients)
+        .prefix_with("IGNORE")
+        .from_select(
+            ["message_id", recipient_column, "is_read", "archived_at"],
+            select(
+                recipients_table.c.message_id,
+                recipients_table.c[recipient_column],
+                recipients_table.c.is_read,
+                literal(archived_at)
+            )
+            .where(recipients_table.c.message_id.in_(message_ids))
+        )
+    )
+
+    # Archived messages leave the inbox, and its unread counters
+    for stmt in release_message_stmts(kind, message_ids):
+        await db.execute(stmt)
+    await db.execute(delete(recipients_table).where(recipients_table.c.message_id.in_(message_ids)))
+    await db.execute(delete(message_model).where(message_model.id.in_(message_ids)))
+    return len(message_ids)
+
+
+async def archive_old_messages(retention_days: int = MESSAGE_RETENTION_DAYS) -> dict:
+    """
+    Run the retention policy to completion, one short transaction per batch.
+    Returns an empty dict when another worker holds ARCHIVE_LOCK_NAME (it is
+    already archiving); the lock goes with its connection if that worker dies.
+    """
+    moved = {}
+    if retention_days <= 0:
+        return moved
+
+    async with PrimarySessionLocal() as lock_db:
+        claimed = (await lock_db.execute(select(func.get_lock(ARCHIVE_LOCK_NAME, 0)))).scalar()
+        if not claimed:
+            return moved
+        try:
+            cutoff = get_eastern_time() - timedelta(days=retention_days)
+            for kind in ARCHIVES:
+                moved[kind] = 0
+                while True:
+                    async with PrimarySessionLocal() as db:
+                        try:
+                            count = await archive_batch(kind, cutoff, db)
+                            await db.commit()
+                        except Exception:
+                            await db.rollback()
+                            raise
+                    if not count:
+                        break
+                    moved[kind] += count
+                    unread_cache.invalidate(kind)
+                    await asyncio.sleep(ARCHIVE_BATCH_PAUSE_SECONDS)
+        finally:
+            await lock_db.execute(select(func.release_lock(ARCHIVE_LOCK_NAME)))
+    return moved
+
+
+async def archive_periodically():
+    while True:
+        await asyncio.sleep(ARCHIVE_INTERVAL_SECONDS)
+        try:
+            moved = await archive_old_messages()
+            if any(moved.values()):
+                print(f"Archived messages: {moved}")
+        except Exception as e:
+            print(f"Error archiving messages: {str(e)}")
+
+
+def archive_inbox_scope(kind: str, owner_id: int):
+    """inbox_scope over the archive tables: recipient rows plus archived broadcasts of the audience"""
+    _, archive_model, _, archive_recipients, recipient_column, sender_column = ARCHIVES[kind]
+    reader_model = Garage if kind == "garage" else Remorqueur
+    sender_id = select(BROADCAST_READER_SENDER[kind]).where(reader_model.id == owner_id).scalar_subquery()
+    watermark = select(reader_model.broadcast_watermark).where(reader_model.id == owner_id).scalar_subquery()
+
+    recipient = archive_recipients.c[recipient_column]
+    onclause = and_(archive_model.id == archive_recipients.c.message_id, recipient == owner_id)
+    member = or_(
+        recipient.isnot(None),
+        and_(
+            archive_model.fanout_on_read == True,
+            getattr(archive_model, sender_column) == sender_id,
+            archive_model.id > watermark,
+        )
+    )
+    return onclause, member, func.coalesce(archive_recipients.c.is_read, False)
+
+
+async def get_archived_messages_page_logic(kind: str, owner_id: int, db: AsyncSession, cursor: Optional[str], limit: int, summary: bool):
+    """Archived history of one inbox, newest first, with the same cursors as the live pages"""
+    try:
+        _, archive_model, _, archive_recipients, recipient_column, _ = ARCHIVES[kind]
+        onclause, member, is_read = archive_inbox_scope(kind, owner_id)
+        items, next_cursor = await _get_message_page(
+            db, archive_model, is_read, [member],
+            cursor, limit, summary, archive_recipients, recipient_column, inbox_onclause=onclause
+        )
+        page_model = AdminMessagePage if kind == "garage" else GarageMessagePage
+        return page_model(items=items, next_cursor=next_cursor)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error occurred: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to retrieve archived messages: {str(e)}")
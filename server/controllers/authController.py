@@ -1,106 +1,296 @@
+import asyncio
 import datetime
-from typing import Union
-from argon2 import PasswordHasher, Type, exceptions as argon2_exceptions 
+import os
+import re
+import time
+from typing import Iterable, List, Optional, Union
+from argon2 import PasswordHasher, Type, exceptions as argon2_exceptions, extract_parameters
 from fastapi.security import OAuth2PasswordBearer
 import jwt
 from datetime import datetime, timedelta
 import pytz
 from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 from fastapi import HTTPException
 from sqlalchemy.orm import joinedload
 from server.models.authModel import Role, User
 from server.models.garageModel import Garage
 from server.models.remorqueurModel import Remorqueur
+from server.controllers.permissionController import permission_registry
+from server.controllers.throttleController import HASH_CONCURRENCY
+from server.controllers.tokenController import token_store, verified_token_cache
 from server.settings import (
     AsyncSession,
     JWE_SECRET_KEY,
-    ARGON2_SECRET_KEY
+    ARGON2_SECRET_KEY,
+    get_redis_client,
 )
  
 SECRET_KEY = JWE_SECRET_KEY
 ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_HOURS = 24
+# Access tokens are validated without a DB lookup, so keep them short-lived;
+# clients renew them through the refresh token endpoint
+ACCESS_TOKEN_EXPIRE_MINUTES = 15
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 EASTERN_TZ = pytz.timezone("America/New_York")
 
+# ---- Argon2 parameters ----
+# 64 MiB / time_cost 1 is the floor; calibrate_argon2() raises time_cost at
+# startup until a hash takes about ARGON2_TARGET_MS on the deployed CPU
+ARGON2_MEMORY_COST = 65536
+ARGON2_MIN_TIME_COST = 1
+ARGON2_MAX_TIME_COST = 10
+ARGON2_TARGET_MS = int(os.getenv("ARGON2_TARGET_MS", 100))
+ARGON2_TIME_COST = os.getenv("ARGON2_TIME_COST")  # set to skip calibration
+# With Redis, one worker calibrates and publishes its time_cost here and every
+# other worker adopts it, so all of them hash with the same parameters.
+# Delete the key to recalibrate on the next deploy (e.g. after a CPU change).
+ARGON2_SHARED_KEY = "argon2:time_cost"
+ARGON2_CALIBRATION_LOCK_KEY = "argon2:calibrating"
+ARGON2_CALIBRATION_WAIT_SECONDS = 30
 
-
-def argon2_strong_hash(password: str) -> str:
-    # Create the peppered password
-    peppered_password = f"{password}{ARGON2_SECRET_KEY}"
-
-    # Create a PasswordHasher with custom parameters
-    hasher = PasswordHasher(
-        time_cost=1,
-        memory_cost=65536,
+def _build_hasher(time_cost: int) -> PasswordHasher:
+    return PasswordHasher(
+        time_cost=time_cost,
+        memory_cost=ARGON2_MEMORY_COST,
         parallelism=1,
         hash_len=32,
         salt_len=16,
         type=Type.ID,
     )
 
-    # Hash the password
-    hash = hasher.hash(peppered_password)
+# Shared hasher: PasswordHasher is immutable and thread-safe
+password_hasher = _build_hasher(int(ARGON2_TIME_COST or ARGON2_MIN_TIME_COST))
+
+# Last calibration results, used to size login capacity
+argon2_calibration: dict = {}
+
+async def configure_argon2() -> dict:
+    """
+    Settle the Argon2 parameters at startup: ARGON2_TIME_COST when pinned,
+    else the time_cost already published in Redis by another worker, else a
+    local calibration (published for the others when Redis is configured).
+    Without Redis or a pinned cost each worker calibrates on its own; the
+    upgrade-only rehash rule keeps them from undoing each other's hashes.
+    """
+    if ARGON2_TIME_COST:
+        return await asyncio.to_thread(calibrate_argon2, time_cost=int(ARGON2_TIME_COST))
+
+    redis = get_redis_client()
+    if redis is None:
+        return await asyncio.to_thread(calibrate_argon2)
+
+    try:
+        shared = await redis.get(ARGON2_SHARED_KEY)
+        # One worker calibrates, alone on the CPU; the others wait for its result
+        if shared is None and await redis.set(ARGON2_CALIBRATION_LOCK_KEY, 1, nx=True, ex=ARGON2_CALIBRATION_WAIT_SECONDS):
+            calibration = await asyncio.to_thread(calibrate_argon2)
+            await redis.set(ARGON2_SHARED_KEY, calibration["time_cost"])
+            return calibration
+        waited = 0.0
+        while shared is None and waited < ARGON2_CALIBRATION_WAIT_SECONDS:
+            await asyncio.sleep(0.5)
+            waited += 0.5
+            shared = await redis.get(ARGON2_SHARED_KEY)
+        if shared is not None:
+            return await asyncio.to_thread(calibrate_argon2, time_cost=int(shared))
+    except Exception as e:
+        print(f"Error sharing Argon2 parameters: {str(e)}")
+    return await asyncio.to_thread(calibrate_argon2)
+
+def calibrate_argon2(target_ms: int = ARGON2_TARGET_MS, time_cost: Optional[int] = None) -> dict:
+    """
+    Pick the highest time_cost whose hash latency fits target_ms on this machine
+    (never below the floor) and install it as the shared hasher. With time_cost,
+    only measure that cost and install it. Blocking: run it in a thread.
+    """
+    global password_hasher
+    sample = f"calibration-sample{ARGON2_SECRET_KEY}"
+    measurements = {}
+    chosen_cost = ARGON2_MIN_TIME_COST
+    chosen_ms = None
+
+    if time_cost is not None:
+        time_costs = [time_cost]
+    else:
+        time_costs = range(ARGON2_MIN_TIME_COST, ARGON2_MAX_TIME_COST + 1)
+
+    for time_cost in time_costs:
+        hasher = _build_hasher(time_cost)
+        # Best of three to ignore scheduling noise
+        elapsed_ms = min(
+            _time_hash(hasher, sample) for _ in range(3)
+        )
+        measurements[time_cost] = round(elapsed_ms, 1)
+        if elapsed_ms > target_ms and chosen_ms is not None:
+            break
+        chosen_cost, chosen_ms = time_cost, elapsed_ms
+
+    password_hasher = _build_hasher(chosen_cost)
+    argon2_calibration.clear()
+    argon2_calibration.update({
+        "time_cost": chosen_cost,
+        "memory_cost_kib": ARGON2_MEMORY_COST,
+        "parallelism": 1,
+        "target_ms": target_ms,
+        "hash_ms": round(chosen_ms, 1),
+        "measurements_ms": measurements,
+        "max_concurrency": HASH_CONCURRENCY,
+        "estimated_logins_per_second": round(HASH_CONCURRENCY * 1000 / chosen_ms, 1),
+        "calibrated_at": datetime.now(EASTERN_TZ).isoformat(),
+    })
+    print(f"Argon2 calibrated: {argon2_calibration}")
+    return argon2_calibration
+
+def _time_hash(hasher: PasswordHasher, sample: str) -> float:
+    start = time.perf_counter()
+    hasher.hash(sample)
+    return (time.perf_counter() - start) * 1000
+
+def argon2_strong_hash(password: str) -> str:
+    # Create the peppered password
+    peppered_password = f"{password}{ARGON2_SECRET_KEY}"
+
+    # Hash the password with the calibrated parameters
+    hash = password_hasher.hash(peppered_password)
     return hash
 
-def create_jwt_token(user: Union[User, Garage, Remorqueur]) -> str:
-    expiration = datetime.now(EASTERN_TZ) + timedelta(hours=ACCESS_TOKEN_EXPIRE_HOURS)
-    
+def argon2_time_cost() -> int:
+    """time_cost of the shared hasher, i.e. of the last calibration"""
+    return password_hasher.time_cost
+
+def argon2_hash_many(passwords: List[str], time_cost: int) -> List[str]:
+    """
+    Hash a chunk of passwords with the given time_cost. Module-level and
+    self-contained so it can run in a worker process, where the calibration
+    of the parent is not available.
+    """
+    hasher = _build_hasher(time_cost)
+    return [hasher.hash(f"{password}{ARGON2_SECRET_KEY}") for password in passwords]
+
+def password_needs_rehash(stored_password: str) -> bool:
+    """
+    True when a stored hash is weaker than the current parameters. Never for
+    a stronger one: workers calibrated differently would otherwise rehash the
+    same accounts back and forth.
+    """
+    try:
+        stored = extract_parameters(stored_password)
+    except argon2_exceptions.InvalidHashError:
+        return True
+    return (
+        stored.type != Type.ID
+        or stored.time_cost < password_hasher.time_cost
+        or stored.memory_cost < password_hasher.memory_cost
+    )
+
+# MariaDB: (1062, "Duplicate entry 'bob' for key 'username'"); MySQL 8 prefixes the table
+DUPLICATE_KEY_ERROR = 1062
+DUPLICATE_KEY_PATTERN = re.compile(r"for key '(?:[^'.]+\.)?([^']+)'")
+
+def duplicate_key(error: IntegrityError) -> Optional[str]:
+    """
+    Name of the unique index a write collided with, or None for any other
+    integrity error. Uniqueness of account names is left to these indexes:
+    callers insert/update directly and map the index name to their 400.
+    """
+    args = getattr(error.orig, "args", ())
+    if len(args) < 2 or args[0] != DUPLICATE_KEY_ERROR:
+        return None
+    match = DUPLICATE_KEY_PATTERN.search(str(args[1]))
+    return match.group(1) if match else None
+
+def token_role(user: Union[User, Garage, Remorqueur]) -> str:
     # Determine the role based on user type
     if isinstance(user, Garage):
-        role = "garage"
+        return "garage"
     elif isinstance(user, Remorqueur):
-        role = "remorqueur"
+        return "remorqueur"
+    return user.role.name
+
+def create_jwt_token(user: Union[User, Garage, Remorqueur]) -> str:
+    issued_at = datetime.now(EASTERN_TZ)
+    expiration = issued_at + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+
+    if permission_registry.loaded:
+        permissions = [name for _, name in permission_registry.role_permissions(user.role.name)]
     else:
-        role = user.role.name
+        permissions = [perm.name for perm in user.role.permissions]
         
     to_encode = {
         "sub": str(user.id),
+        "iat": issued_at,
         "exp": expiration,
-        "role": role,
-        "permissions": [perm.name for perm in user.role.permissions]
+        "type": "access",
+        "role": token_role(user),
+        "role_id": user.role_id,
+        "username": user.username,
+        "permissions": permissions
     }
+    if isinstance(user, Remorqueur):
+        # Lets driver endpoints (positions, presence) skip the garage lookup
+        to_encode["garage_id"] = user.garage_id
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def authenticate_user(token: str, db: AsyncSession) -> Union[User, Garage, Remorqueur]:
-    """Authenticate user from token"""
+async def decode_access_token(token: str) -> dict:
+    """Stateless token validation: signature, expiry and revocation store, no DB access"""
     credentials_exception = HTTPException(status_code=401, detail="Could not validate credentials")
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: str = payload.get("sub")
-        role: str = payload.get("role")
-        
-        if user_id is None or role is None:
+    if not token:
+        raise credentials_exception
+
+    # Same token seen again: skip signature and claims verification
+    payload = verified_token_cache.get(token)
+    if payload is None:
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except jwt.PyJWTError:
             raise credentials_exception
-            
-    except jwt.PyJWTError:
+
+        if payload.get("sub") is None or payload.get("role") is None:
+            raise credentials_exception
+        if payload.get("type", "access") != "access":
+            raise credentials_exception
+        verified_token_cache.put(token, payload)
+
+    if await token_store.is_subject_revoked(payload["role"], payload["sub"], payload.get("iat")):
         raise credentials_exception
+    return payload
+
+async def load_user(role: str, user_id: int, db: AsyncSession) -> Union[User, Garage, Remorqueur, None]:
+    """Load the account behind a token with its role and permissions"""
+    if role == "garage":
+        result = await db.execute(
+            select(Garage)
+            .options(joinedload(Garage.role).joinedload(Role.permissions))
+            .where(Garage.id == user_id)
+        )
+    elif role == "remorqueur":
+        result = await db.execute(
+            select(Remorqueur)
+            .options(
+                joinedload(Remorqueur.role).joinedload(Role.permissions),
+                joinedload(Remorqueur.garage)
+            )
+            .where(Remorqueur.id == user_id)
+        )
+    else:
+        result = await db.execute(
+            select(User)
+            .options(joinedload(User.role).joinedload(Role.permissions))
+            .where(User.id == user_id)
+        )
+    return result.unique().scalar_one_or_none()
+
+async def authenticate_user(token: str, db: AsyncSession) -> Union[User, Garage, Remorqueur]:
+    """Authenticate user from token"""
+    credentials_exception = HTTPException(status_code=401, detail="Could not validate credentials")
+    payload = await decode_access_token(token)
 
     # Try to find the user based on role
     try:
-        if role == "garage":
-            result = await db.execute(
-                select(Garage)
-                .options(joinedload(Garage.role).joinedload(Role.permissions))
-                .where(Garage.id == int(user_id))
-            )
-            user = result.unique().scalar_one_or_none()
-        elif role == "remorqueur":
-            result = await db.execute(
-                select(Remorqueur)
-                .options(joinedload(Remorqueur.role).joinedload(Role.permissions))
-                .where(Remorqueur.id == int(user_id))
-            )
-            user = result.unique().scalar_one_or_none()
-        else:
-            result = await db.execute(
-                select(User)
-                .options(joinedload(User.role).joinedload(Role.permissions))
-                .where(User.id == int(user_id))
-            )
-            user = result.unique().scalar_one_or_none()
+        user = await load_user(payload["role"], int(payload["sub"]), db)
         
         if user is None:
             raise credentials_exception
@@ -110,10 +300,19 @@ async def authenticate_user(token: str, db: AsyncSession) -> Union[User, Garage,
     except Exception:
         raise credentials_exception
 
+def role_allows(role_id: Optional[int], granted: Iterable[str], permission: str) -> bool:
+    """
+    The one permission check, for tokens and loaded accounts alike: the
+    role's bitset by role id, else the permission names granted to it
+    (registry not loaded, or a token issued before role_id was a claim).
+    """
+    if permission_registry.loaded and role_id is not None:
+        return permission_registry.allows(role_id, permission)
+    return permission in granted
+
 async def has_permission(user: Union[User, Garage, Remorqueur], permission: str, db: AsyncSession):
     """Check if user has required permission"""
-    user_permissions = [perm.name for perm in user.role.permissions]
-    if permission not in user_permissions:
+    if not role_allows(user.role_id, [perm.name for perm in user.role.permissions], permission):
         raise HTTPException(
             status_code=403,
             detail="Not enough permissions"
@@ -123,8 +322,8 @@ async def has_permission(user: Union[User, Garage, Remorqueur], permission: str,
 def verify_password(stored_password: str, provided_password: str) -> bool:
     peppered_password = f"{provided_password}{ARGON2_SECRET_KEY}"
     try:
-        hasher = PasswordHasher()
-        hasher.verify(stored_password, peppered_password)
+        # Parameters are read from the stored hash, any hasher instance can verify
+        password_hasher.verify(stored_password, peppered_password)
         return True
     except argon2_exceptions.VerifyMismatchError:
         return False
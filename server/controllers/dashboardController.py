@@ -0,0 +1,133 @@
+from datetime import timedelta
+from fastapi import HTTPException, status
+from sqlalchemy import and_, case, func, select
+from server.controllers.messagesController import get_unread_count_logic
+from server.controllers.presenceController import get_online_remorqueur_ids
+from server.controllers.permissionController import load_role_permissions, permission_registry
+from server.controllers.rosterController import roster_cache
+from server.models.authModel import AuthPrincipal, Role, garage_message_recipients
+from server.models.garageModel import Garage
+from server.models.messagesModel import GarageMessage, get_eastern_time
+from server.models.reponseModel import GarageDashboardResponse, GarageDriverCounts, GarageResponse, GarageSendStats
+from server.settings import AsyncSession
+
+# Period covered by the send statistics
+DASHBOARD_WINDOW_DAYS = 30
+
+
+async def get_garage_send_stats(garage_id: int, db: AsyncSession) -> GarageSendStats:
+    """Messages sent over the window, from the (garage_id, created_at, id) index and the recipients primary key"""
+    now = get_eastern_time()
+    since = now - timedelta(days=DASHBOARD_WINDOW_DAYS)
+    week_ago = now - timedelta(days=7)
+    in_window = and_(GarageMessage.garage_id == garage_id, GarageMessage.created_at >= since)
+
+    sent = (await db.execute(
+        select(
+            func.count(),
+            func.coalesce(func.sum(case((GarageMessage.created_at >= week_ago, 1), else_=0)), 0),
+            func.coalesce(func.sum(case((GarageMessage.to_all == True, 1), else_=0)), 0),
+            func.max(GarageMessage.created_at),
+        )
+        .where(in_window)
+    )).one()
+
+    # Broadcasts are fanned out on read and have no recipient rows
+    recipients = (await db.execute(
+        select(
+            func.count(),
+            func.coalesce(func.sum(case((garage_message_recipients.c.is_read == True, 1), else_=0)), 0),
+        )
+        .select_from(GarageMessage)
+        .join(garage_message_recipients, garage_message_recipients.c.message_id == GarageMessage.id)
+        .where(in_window)
+    )).one()
+
+    return GarageSendStats(
+        window_days=DASHBOARD_WINDOW_DAYS,
+        sent_last_7_days=int(sent[1]),
+        sent_in_window=int(sent[0]),
+        broadcasts_in_window=int(sent[2]),
+        direct_recipients_in_window=int(recipients[0]),
+        direct_reads_in_window=int(recipients[1]),
+        last_sent_at=sent[3],
+    )
+
+
+async def get_garage_dashboard_logic(principal: AuthPrincipal, db: AsyncSession) -> GarageDashboardResponse:
+    """
+    Everything the garage dashboard shows: profile, driver counts (from the
+    cached roster and heartbeat presence), the unread badge (cached counters) and send statistics
+    (two aggregate queries).
+    """
+    if principal.role.lower() != 'garage':
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only garages have a dashboard"
+        )
+
+    try:
+        garage = (await db.execute(
+            select(
+                Garage.id,
+                Garage.name,
+                Garage.email,
+                Garage.username,
+                Garage.role_id,
+                Garage.is_active,
+                Garage.stripe_customer_id,
+                Garage.payment_status,
+                Role.name.label("role_name"),
+            )
+            .join(Role, Role.id == Garage.role_id)
+            .where(Garage.id == principal.id)
+        )).one_or_none()
+        if garage is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Garage not found"
+            )
+
+        if permission_registry.loaded:
+            permissions = permission_registry.role_permissions(garage.role_name)
+        else:
+            permissions = (await load_role_permissions([garage.role_id], db))[garage.role_id]
+
+        roster = await roster_cache.get(garage.id, db)
+        members = roster.members if roster is not None else ()
+        active_ids = {member.id for member in members if member.is_active}
+        online = len(active_ids & await get_online_remorqueur_ids(garage.id))
+
+        return GarageDashboardResponse(
+            profile=GarageResponse(
+                id=garage.id,
+                name=garage.name,
+                email=garage.email,
+                username=garage.username,
+                role_id=garage.role_id,
+                is_active=garage.is_active,
+                stripe_customer_id=garage.stripe_customer_id,
+                payment_status=garage.payment_status,
+                role={
+                    "id": garage.role_id,
+                    "name": garage.role_name,
+                    "permissions": [{"id": perm_id, "name": name} for perm_id, name in permissions],
+                },
+            ),
+            drivers=GarageDriverCounts(
+                total=len(members),
+                active=len(active_ids),
+                inactive=len(members) - len(active_ids),
+                online=online,
+            ),
+            unread_admin_messages=await get_unread_count_logic("garage", garage.id, db),
+            sends=await get_garage_send_stats(garage.id, db),
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error occurred: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to load dashboard: {str(e)}"
+        )
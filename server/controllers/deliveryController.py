@@ -0,0 +1,266 @@
+import asyncio
+import json
+import time
+from datetime import timedelta
+from typing import List, Optional, Tuple
+from fastapi import HTTPException
+from sqlalchemy import and_, func, insert, or_, select
+from server.controllers.messagesController import (
+    INBOXES,
+    increment_unread_stmt,
+    message_created_event,
+    unread_cache,
+)
+from server.controllers.realtimeController import publish_event
+from server.models.garageModel import Garage
+from server.models.messagesModel import DeliveryJobResponse, MessageDeliveryJob, get_eastern_time
+from server.models.remorqueurModel import Remorqueur
+from server.settings import AsyncSession, PrimarySessionLocal
+
+# Recipients written per transaction
+DELIVERY_BATCH_SIZE = 500
+
+# Idle delay between two looks at the queue
+DELIVERY_POLL_SECONDS = 1.0
+
+# A running job without progress for this long belongs to a dead worker
+DELIVERY_STALE_AFTER = timedelta(minutes=5)
+
+DELIVERY_MAX_ATTEMPTS = 5
+
+
+async def deliver_batch(inbox: str, message_id: int, sender_id: int, batch: List[int], db: AsyncSession) -> Tuple[List[int], List[int]]:
+    """
+    Validate one batch against the sender and insert the missing recipient rows.
+    Rows already present (a retried batch) are neither inserted nor counted again.
+    Returns (newly delivered ids, invalid ids).
+    """
+    _, recipients_table, recipient_column = INBOXES[inbox]
+    recipient = recipients_table.c[recipient_column]
+
+    if inbox == "garage":
+        valid_query = select(Garage.id).where(
+            and_(
+                Garage.id.in_(batch),
+                Garage.is_active == True,
+                Garage.created_by_id == sender_id
+            )
+        )
+    else:
+        valid_query = select(Remorqueur.id).where(
+            and_(
+                Remorqueur.id.in_(batch),
+                Remorqueur.garage_id == sender_id
+            )
+        )
+    valid_ids = set((await db.execute(valid_query)).scalars())
+
+    existing = set((await db.execute(
+        select(recipient)
+        .where(and_(recipients_table.c.message_id == message_id, recipient.in_(batch)))
+        .with_for_update()
+    )).scalars())
+
+    new_ids = [recipient_id for recipient_id in batch if recipient_id in valid_ids and recipient_id not in existing]
+    if new_ids:
+        await db.execute(insert(recipients_table).values([
+            {"message_id": message_id, recipient_column: recipient_id, "is_read": False}
+            for recipient_id in new_ids
+        ]))
+        await db.execute(increment_unread_stmt(inbox, new_ids))
+
+    return new_ids, [recipient_id for recipient_id in batch if recipient_id not in valid_ids]
+
+
+class DeliveryWorker:
+    """
+    Background writer of the recipients of large sends. Jobs live in
+    message_delivery_jobs, so any worker can pick them up (SKIP LOCKED) and a
+    job abandoned by a crashed worker is resumed from its last committed batch.
+    """
+
+    def __init__(self):
+        self.batches = 0
+        self.rows_delivered = 0
+        self.jobs_completed = 0
+        self.jobs_failed = 0
+        self.last_batch_seconds: Optional[float] = None
+        self.current_job_id: Optional[int] = None
+
+    async def _claim(self) -> Optional[int]:
+        now = get_eastern_time()
+        async with PrimarySessionLocal() as db:
+            job = (await db.execute(
+                select(MessageDeliveryJob)
+                .where(
+                    or_(
+                        MessageDeliveryJob.status == "pending",
+                        and_(
+                            MessageDeliveryJob.status == "running",
+                            MessageDeliveryJob.updated_at < now - DELIVERY_STALE_AFTER
+                        )
+                    )
+                )
+                .order_by(MessageDeliveryJob.id)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+            )).scalar_one_or_none()
+            if job is None:
+                return None
+
+            job.attempts += 1
+            job.updated_at = now
+            if job.attempts > DELIVERY_MAX_ATTEMPTS:
+                job.status = "failed"
+                self.jobs_failed += 1
+                await db.commit()
+                return None
+            job.status = "running"
+            await db.commit()
+            return job.id
+
+    async def _process(self, job_id: int):
+        event = None
+        while True:
+            started = time.perf_counter()
+            async with PrimarySessionLocal() as db:
+                job = (await db.execute(
+                    select(MessageDeliveryJob)
+                    .where(MessageDeliveryJob.id == job_id)
+                    .with_for_update()
+                )).scalar_one()
+                message_model, _, _ = INBOXES[job.inbox]
+
+                if event is None:
+                    message = (await db.execute(
+                        select(message_model).where(message_model.id == job.message_id)
+                    )).scalar_one_or_none()
+                    if message is None:
+                        # Message deleted before delivery finished
+                        job.status = "cancelled"
+                        job.updated_at = get_eastern_time()
+                        await db.commit()
+                        return
+                    event = message_created_event(job.inbox, message)
+
+                recipient_ids = json.loads(job.recipient_ids)
+                batch = recipient_ids[job.delivered:job.delivered + DELIVERY_BATCH_SIZE]
+                new_ids, invalid_ids = await deliver_batch(job.inbox, job.message_id, job.sender_id, batch, db)
+
+                # Progress commits with the rows it describes
+                job.delivered += len(batch)
+                if invalid_ids:
+                    job.invalid_ids = json.dumps(json.loads(job.invalid_ids) + invalid_ids)
+                job.updated_at = get_eastern_time()
+                done = job.delivered >= job.total
+                if done:
+                    job.status = "done"
+                inbox = job.inbox
+                await db.commit()
+
+            self.batches += 1
+            self.rows_delivered += len(new_ids)
+            self.last_batch_seconds = round(time.perf_counter() - started, 4)
+            if new_ids:
+                unread_cache.invalidate(inbox, new_ids)
+                await publish_event(inbox, new_ids, event)
+            if done:
+                self.jobs_completed += 1
+                return
+
+    async def _release(self, job_id: int, error: str):
+        """Give a failed job back to the queue (or fail it) with its error"""
+        async with PrimarySessionLocal() as db:
+            job = (await db.execute(
+                select(MessageDeliveryJob).where(MessageDeliveryJob.id == job_id)
+            )).scalar_one_or_none()
+            if job is None:
+                return
+            job.error = error[:2000]
+            job.updated_at = get_eastern_time()
+            if job.attempts >= DELIVERY_MAX_ATTEMPTS:
+                job.status = "failed"
+                self.jobs_failed += 1
+            else:
+                job.status = "pending"
+            await db.commit()
+
+    async def run(self):
+        while True:
+            try:
+                job_id = await self._claim()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error claiming delivery job: {str(e)}")
+                job_id = None
+
+            if job_id is None:
+                await asyncio.sleep(DELIVERY_POLL_SECONDS)
+                continue
+
+            self.current_job_id = job_id
+            try:
+                await self._process(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error delivering job {job_id}: {str(e)}")
+                try:
+                    await self._release(job_id, str(e))
+                except Exception as release_error:
+                    print(f"Error releasing delivery job {job_id}: {str(release_error)}")
+                await asyncio.sleep(DELIVERY_POLL_SECONDS)
+            finally:
+                self.current_job_id = None
+
+    async def stats(self, db: AsyncSession) -> dict:
+        counts = dict((await db.execute(
+            select(MessageDeliveryJob.status, func.count())
+            .group_by(MessageDeliveryJob.status)
+        )).all())
+        backlog = (await db.execute(
+            select(func.coalesce(func.sum(MessageDeliveryJob.total - MessageDeliveryJob.delivered), 0))
+            .where(MessageDeliveryJob.status.in_(["pending", "running"]))
+        )).scalar()
+        return {
+            "jobs_by_status": counts,
+            "recipients_waiting": int(backlog or 0),
+            "current_job_id": self.current_job_id,
+            "batches": self.batches,
+            "rows_delivered": self.rows_delivered,
+            "jobs_completed": self.jobs_completed,
+            "jobs_failed": self.jobs_failed,
+            "last_batch_seconds": self.last_batch_seconds,
+        }
+
+
+delivery_worker = DeliveryWorker()
+
+
+async def get_delivery_job_logic(job_id: int, inbox: str, sender_id: int, db: AsyncSession) -> DeliveryJobResponse:
+    """A job of the sender asking; anyone else's is reported as not found"""
+    job = (await db.execute(
+        select(MessageDeliveryJob).where(
+            and_(
+                MessageDeliveryJob.id == job_id,
+                MessageDeliveryJob.inbox == inbox,
+                MessageDeliveryJob.sender_id == sender_id,
+            )
+        )
+    )).scalar_one_or_none()
+    if job is None:
+        raise HTTPException(status_code=404, detail="Delivery job not found")
+
+    return DeliveryJobResponse(
+        id=job.id,
+        inbox=job.inbox,
+        message_id=job.message_id,
+        status=job.status,
+        total=job.total,
+        delivered=job.delivered,
+        invalid_ids=json.loads(job.invalid_ids),
+        error=job.error,
+        created_at=job.created_at,
+        updated_at=job.updated_at,
+    )
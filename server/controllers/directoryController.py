@@ -0,0 +1,110 @@
+import json
+from typing import AsyncIterator, Optional
+from fastapi import HTTPException
+from sqlalchemy import select
+from server.models.garageModel import Garage
+from server.models.remorqueurModel import Remorqueur
+from server.models.reponseModel import (
+    GarageBaseResponse,
+    GarageWithRemorqueursResponse,
+    RemorqueurBaseResponse,
+    RemorqueurWithGarageResponse,
+)
+from server.settings import PrimarySessionLocal
+
+# Garages whose remorqueurs are loaded by one query while streaming a page
+DIRECTORY_CHUNK_SIZE = 50
+
+GARAGE_COLUMNS = (
+    Garage.id, Garage.name, Garage.username, Garage.role_id, Garage.is_active, Garage.created_by_id,
+)
+REMORQUEUR_COLUMNS = (
+    Remorqueur.id, Remorqueur.name, Remorqueur.username, Remorqueur.role_id, Remorqueur.garage_id, Remorqueur.is_active,
+)
+
+
+def decode_directory_cursor(cursor: Optional[str]) -> int:
+    """Directory cursors are the last id of the previous page"""
+    if not cursor:
+        return 0
+    try:
+        return int(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+async def stream_garages_with_remorqueurs(after_id: int, limit: int) -> AsyncIterator[str]:
+    """
+    One page of garages with their remorqueurs as a JSON document
+    {"items": [...], "next_cursor": ...}, written garage by garage.
+    Two-phase load over plain columns: the page of garages, then the
+    remorqueurs of DIRECTORY_CHUNK_SIZE garages at a time, so no join
+    multiplies rows and only one chunk is held in memory.
+    """
+    async with PrimarySessionLocal() as db:
+        garages = (await db.execute(
+            select(*GARAGE_COLUMNS)
+            .where(Garage.id > after_id)
+            .order_by(Garage.id)
+            .limit(limit + 1)
+        )).all()
+        has_more = len(garages) > limit
+        garages = garages[:limit]
+
+        yield '{"items":['
+        first = True
+        for start in range(0, len(garages), DIRECTORY_CHUNK_SIZE):
+            chunk = garages[start:start + DIRECTORY_CHUNK_SIZE]
+            remorqueurs_by_garage = {garage.id: [] for garage in chunk}
+            remorqueurs = await db.execute(
+                select(*REMORQUEUR_COLUMNS)
+                .where(Remorqueur.garage_id.in_(list(remorqueurs_by_garage)))
+                .order_by(Remorqueur.garage_id, Remorqueur.id)
+            )
+            for remorqueur in remorqueurs:
+                remorqueurs_by_garage[remorqueur.garage_id].append(
+                    RemorqueurBaseResponse(**remorqueur._mapping)
+                )
+
+            for garage in chunk:
+                item = GarageWithRemorqueursResponse(
+                    **garage._mapping, remorqueurs=remorqueurs_by_garage[garage.id]
+                )
+                yield ("" if first else ",") + item.model_dump_json()
+                first = False
+
+        next_cursor = str(garages[-1].id) if has_more else None
+        yield f'],"next_cursor":{json.dumps(next_cursor)}}}'
+
+
+async def stream_remorqueurs_with_garages(after_id: int, limit: int) -> AsyncIterator[str]:
+    """Same streaming page for remorqueurs, each garage loaded once per chunk"""
+    async with PrimarySessionLocal() as db:
+        remorqueurs = (await db.execute(
+            select(*REMORQUEUR_COLUMNS)
+            .where(Remorqueur.id > after_id)
+            .order_by(Remorqueur.id)
+            .limit(limit + 1)
+        )).all()
+        has_more = len(remorqueurs) > limit
+        remorqueurs = remorqueurs[:limit]
+
+        yield '{"items":['
+        first = True
+        for start in range(0, len(remorqueurs), DIRECTORY_CHUNK_SIZE):
+            chunk = remorqueurs[start:start + DIRECTORY_CHUNK_SIZE]
+            garage_ids = {remorqueur.garage_id for remorqueur in chunk}
+            garages = {
+                garage.id: GarageBaseResponse(**garage._mapping)
+                for garage in await db.execute(select(*GARAGE_COLUMNS).where(Garage.id.in_(garage_ids)))
+            }
+
+            for remorqueur in chunk:
+                item = RemorqueurWithGarageResponse(
+                    **remorqueur._mapping, garage=garages.get(remorqueur.garage_id)
+                )
+                yield ("" if first else ",") + item.model_dump_json()
+                first = False
+
+        next_cursor = str(remorqueurs[-1].id) if has_more else None
+        yield f'],"next_cursor":{json.dumps(next_cursor)}}}'
@@ -1,16 +1,28 @@
 from typing import List
 from fastapi import HTTPException, Request,status
 from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session, joinedload
 from server.models.garageModel import Garage, CreateGarageRequest, UpdateGarageRequest
-from server.models.authModel import RoleResponse, User, Role, PermissionResponse
-from server.controllers.authController import argon2_strong_hash, has_permission, authenticate_user
-from server.models.remorqueurModel import Remorqueur
+from server.models.authModel import AuthPrincipal, RoleResponse, Role, PermissionResponse
+from server.controllers.messagesController import broadcast_join_values
+from server.controllers.presenceController import get_online_remorqueur_ids
+from server.controllers.rosterController import roster_cache
+from server.controllers.throttleController import run_hash_operation
+from server.controllers.tokenController import token_store
+from server.controllers.authController import argon2_strong_hash, duplicate_key, has_permission, authenticate_user
 from server.models.reponseModel import GarageResponse, RemorqueurResponse
 from server.settings import (
     AsyncSession,
 )
 
+# Unique index of the garages table -> 400 message
+GARAGE_DUPLICATE_MESSAGES = {
+    "name": "Garage with this name already exists",
+    "email": "Garage with this email already exists",
+    "username": "Username already taken",
+}
+
 async def create_garage(
     request: Request,
     db: AsyncSession,
@@ -31,26 +43,6 @@ async def create_garage(
     # Check permission
     await has_permission(current_user, 'create_garage', db)
     
-    # Check if garage name already exists
-    result = await db.execute(
-        select(Garage).where(Garage.name == garage_data.name)
-    )
-    if result.scalar_one_or_none():
-        raise HTTPException(
-            status_code=400,
-            detail="Garage with this name already exists"
-        )
-    
-    # Check if username already exists
-    result = await db.execute(
-        select(Garage).where(Garage.username == garage_data.username)
-    )
-    if result.scalar_one_or_none():
-        raise HTTPException(
-            status_code=400,
-            detail="Username already taken"
-        )
-    
     # Get role by name
     result = await db.execute(
         select(Role).where(Role.name == garage_data.role_name)
@@ -63,9 +55,10 @@ async def create_garage(
         )
     
     # Hash the password
-    hashed_password = argon2_strong_hash(garage_data.password)
+    hashed_password = await run_hash_operation(argon2_strong_hash, garage_data.password)
     
-    # Create new garage
+    # Create new garage; the admin's earlier broadcasts are not its own
+    join_values = await broadcast_join_values("garage", current_user.id, db)
     new_garage = Garage(
         name=garage_data.name,
         email=garage_data.email,
@@ -73,11 +66,27 @@ async def create_garage(
         password=hashed_password,
         role_id=role.id,
         created_by_id=current_user.id,
-        is_active = False
+        is_active = False,
+        **join_values
     )
     
+    # Name, email and username uniqueness is enforced by their unique indexes
     db.add(new_garage)
-    await db.commit()
+    try:
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        key = duplicate_key(e)
+        if key in GARAGE_DUPLICATE_MESSAGES:
+            raise HTTPException(
+                status_code=400,
+                detail=GARAGE_DUPLICATE_MESSAGES[key]
+            )
+        print(f"Error occurred: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="Failed to create garage"
+        )
     await db.refresh(new_garage)
     
     # Load relationships
@@ -126,26 +135,32 @@ async def update_garage(
             detail="You are not authorized to update this garage."
         )
 
+    # New credentials must end the garage's current sessions
+    revoke_sessions = bool(update_data.password) or bool(update_data.username)
+
     # Update username and/or password
     if update_data.username:
-        # Check if the new username is unique
-        username_exists = await db.execute(
-            select(Garage).where(Garage.username == update_data.username)
-        )
-        if username_exists.scalar_one_or_none():
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Username already in use. Please choose another one."
-            )
+        # Uniqueness is checked by the unique index at commit
         garage.username = update_data.username
 
     if update_data.password:
-        garage.password = argon2_strong_hash(update_data.password)
+        garage.password = await run_hash_operation(argon2_strong_hash, update_data.password)
 
     # Commit changes
     try:
         await db.commit()
         await db.refresh(garage)
+    except IntegrityError as e:
+        await db.rollback()
+        if duplicate_key(e) == "username":
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Username already in use. Please choose another one."
+            )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to update garage: {str(e)}"
+        )
     except Exception as e:
         await db.rollback()
         raise HTTPException(
@@ -153,62 +168,50 @@ async def update_garage(
             detail=f"Failed to update garage: {str(e)}"
         )
 
+    if revoke_sessions:
+        await token_store.revoke_subject("garage", garage.id)
+
     return {"message": "Garage updated successfully", "garage_name": garage.name, "username": garage.username}
 
 async def get_garage_remorqueurs(
     db: AsyncSession,
-    current_user: User
+    current_user: AuthPrincipal
 ) -> List[RemorqueurResponse]:
-    if not current_user.role.name.lower() == 'garage':
+    if not current_user.role.lower() == 'garage':
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only garages can access their remorqueurs"
         )
 
     try:
-        # Get garage details
-        garage_result = await db.execute(
-            select(Garage)
-            .where(Garage.username == current_user.username)
-        )
-        garage = garage_result.scalar_one_or_none()
-        
-        if not garage:
+        # Served from the roster cache; a miss loads garage and remorqueurs in one query
+        roster = await roster_cache.get(current_user.id, db)
+        if roster is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Garage not found"
             )
+        online_ids = await get_online_remorqueur_ids(roster.garage_id)
 
-        # Fetch remorqueurs with roles and permissions
-        stmt = select(Remorqueur).options(
-            joinedload(Remorqueur.role).joinedload(Role.permissions)
-        ).where(Remorqueur.garage_id == garage.id)
-        
-        result = await db.execute(stmt)
-        remorqueurs = result.scalars().unique().all()
-        
-        # Transform the data into the response model
         return [
             RemorqueurResponse(
-                id=remorqueur.id,
-                name=remorqueur.name,
-                tel=remorqueur.tel,
-                username=remorqueur.username,
+                id=member.id,
+                name=member.name,
+                tel=member.tel,
+                username=member.username,
                 role=RoleResponse(
-                    id=remorqueur.role.id,
-                    name=remorqueur.role.name,
+                    id=member.role_id,
+                    name=member.role_name,
                     permissions=[
-                        PermissionResponse(
-                            id=permission.id,
-                            name=permission.name
-                        )
-                        for permission in (remorqueur.role.permissions or [])
+                        PermissionResponse(id=permission_id, name=permission_name)
+                        for permission_id, permission_name in roster.role_permissions.get(member.role_id, ())
                     ]
                 ),
-                garage_name=garage.name,
-                is_active=remorqueur.is_active
+                garage_name=roster.garage_name,
+                is_active=member.is_active,
+                is_online=member.id in online_ids
             )
-            for remorqueur in remorqueurs
+            for member in roster.members
         ]
 
     except HTTPException as e:
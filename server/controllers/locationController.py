@@ -0,0 +1,325 @@
+import asyncio
+import heapq
+import math
+import time
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+from fastapi import HTTPException, status
+from sqlalchemy import select
+from server.controllers.realtimeController import Subscription, get_pubsub
+from server.controllers.rosterController import roster_cache
+from server.models.authModel import AuthPrincipal
+from server.models.remorqueurModel import NearbyRemorqueur, NearbyRemorqueursResponse, Remorqueur
+from server.settings import WEB_CONCURRENCY, AsyncSession, get_redis_client
+
+# A driver that stopped reporting disappears from the index after this long
+POSITION_TTL_SECONDS = 120
+POSITION_SWEEP_SECONDS = 30
+
+# Grid cells of 0.01 degree (about 1.1 km north-south), i.e. a fixed-precision geohash
+GRID_CELL_DEGREES = 0.01
+KM_PER_DEGREE = 111.195
+
+# Every worker applies the reports received by the others (see PositionReplica).
+# Only through Redis: with the memory pub/sub each worker knows the reports it
+# received itself, which is only complete for a single worker.
+POSITIONS_CHANNEL = "positions"
+
+
+class DriverPosition(NamedTuple):
+    remorqueur_id: int
+    garage_id: int
+    lat: float
+    lon: float
+    reported_at: float  # epoch seconds, comparable across workers
+
+
+def grid_cell(lat: float, lon: float) -> Tuple[int, int]:
+    return math.floor(lat / GRID_CELL_DEGREES), math.floor(lon / GRID_CELL_DEGREES)
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * 6371.0088 * math.asin(math.sqrt(a))
+
+
+class PositionIndex:
+    """
+    Last reported position of each driver, bucketed per garage in a grid of
+    GRID_CELL_DEGREES cells. Nearest-driver queries visit the cells in rings
+    around the breakdown and stop as soon as no unvisited cell can hold a
+    closer driver; for sparse fleets only the occupied cells are ringed. Reports
+    older than POSITION_TTL_SECONDS are ignored and swept.
+    """
+
+    def __init__(self):
+        self._positions: Dict[int, DriverPosition] = {}
+        self._cells: Dict[int, Dict[Tuple[int, int], Set[int]]] = {}
+        self.updates = 0
+        self.queries = 0
+        self.expired = 0
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def _link(self, position: DriverPosition):
+        cells = self._cells.setdefault(position.garage_id, {})
+        cells.setdefault(grid_cell(position.lat, position.lon), set()).add(position.remorqueur_id)
+
+    def _unlink(self, position: DriverPosition):
+        cells = self._cells.get(position.garage_id)
+        if cells is None:
+            return
+        cell = grid_cell(position.lat, position.lon)
+        members = cells.get(cell)
+        if members is None:
+            return
+        members.discard(position.remorqueur_id)
+        if not members:
+            del cells[cell]
+            if not cells:
+                del self._cells[position.garage_id]
+
+    def update(self, remorqueur_id: int, garage_id: int, lat: float, lon: float, reported_at: Optional[float] = None) -> bool:
+        """Record a report; older or duplicate reports (replicas, retries) are ignored"""
+        if reported_at is None:
+            reported_at = time.time()
+        previous = self._positions.get(remorqueur_id)
+        if previous is not None:
+            if previous.reported_at >= reported_at:
+                return False
+            if previous.garage_id != garage_id or grid_cell(previous.lat, previous.lon) != grid_cell(lat, lon):
+                self._unlink(previous)
+                previous = None
+
+        position = DriverPosition(remorqueur_id, garage_id, lat, lon, reported_at)
+        self._positions[remorqueur_id] = position
+        if previous is None:
+            self._link(position)
+        self.updates += 1
+        return True
+
+    def remove(self, remorqueur_id: int):
+        position = self._positions.pop(remorqueur_id, None)
+        if position is not None:
+            self._unlink(position)
+
+    def get(self, remorqueur_id: int, now: Optional[float] = None) -> Optional[DriverPosition]:
+        position = self._positions.get(remorqueur_id)
+        if position is None or position.reported_at < (now or time.time()) - POSITION_TTL_SECONDS:
+            return None
+        return position
+
+    def nearest(
+        self,
+        garage_id: int,
+        lat: float,
+        lon: float,
+        k: int,
+        radius_km: float,
+        now: Optional[float] = None,
+    ) -> List[Tuple[float, DriverPosition]]:
+        """Up to k (distance_km, position) pairs of the garage's drivers within radius_km, closest first"""
+        self.queries += 1
+        cells = self._cells.get(garage_id)
+        if not cells or k <= 0:
+            return []
+        cutoff = (now or time.time()) - POSITION_TTL_SECONDS
+
+        # Smallest cell side within the radius: longitude degrees shrink with latitude
+        cell_height = GRID_CELL_DEGREES * KM_PER_DEGREE
+        cell_width = cell_height * math.cos(math.radians(min(abs(lat) + radius_km / KM_PER_DEGREE + GRID_CELL_DEGREES, 89.0)))
+        min_side = min(cell_height, cell_width)
+        max_ring = int(radius_km / min_side) + 1
+
+        best: List[Tuple[float, int]] = []  # max-heap on distance: (-distance, id)
+
+        def consider(members: Set[int]):
+            for remorqueur_id in members:
+                position = self._positions[remorqueur_id]
+                if position.reported_at < cutoff:
+                    continue
+                distance = haversine_km(lat, lon, position.lat, position.lon)
+                if distance > radius_km:
+                    continue
+                if len(best) < k:
+                    heapq.heappush(best, (-distance, remorqueur_id))
+                elif distance < -best[0][0]:
+                    heapq.heapreplace(best, (-distance, remorqueur_id))
+
+        def done(ring: int) -> bool:
+            # Anything from this ring outwards is at least (ring - 1) * min_side away
+            return len(best) == k and -best[0][0] <= (ring - 1) * min_side
+
+        # Walk the rings around the query cell while they hold fewer cells
+        # than the garage occupies...
+        center_row, center_col = grid_cell(lat, lon)
+        ring = 0
+        while ring <= max_ring and (2 * ring + 1) ** 2 <= len(cells):
+            if done(ring):
+                return self._sorted(best)
+            if ring == 0:
+                ring_cells = [(center_row, center_col)]
+            else:
+                top, bottom = center_row - ring, center_row + ring
+                left, right = center_col - ring, center_col + ring
+                ring_cells = [(top, col) for col in range(left, right + 1)]
+                ring_cells += [(bottom, col) for col in range(left, right + 1)]
+                ring_cells += [(row, left) for row in range(top + 1, bottom)]
+                ring_cells += [(row, right) for row in range(top + 1, bottom)]
+            for cell in ring_cells:
+                members = cells.get(cell)
+                if members:
+                    consider(members)
+            ring += 1
+
+        # ...then bucket the remaining occupied cells by ring
+        if ring <= max_ring and not done(ring):
+            rings: Dict[int, List[Set[int]]] = {}
+            for (row, col), members in cells.items():
+                cell_ring = max(abs(row - center_row), abs(col - center_col))
+                if ring <= cell_ring <= max_ring:
+                    rings.setdefault(cell_ring, []).append(members)
+            for cell_ring in sorted(rings):
+                if done(cell_ring):
+                    break
+                for members in rings[cell_ring]:
+                    consider(members)
+
+        return self._sorted(best)
+
+    def _sorted(self, best: List[Tuple[float, int]]) -> List[Tuple[float, DriverPosition]]:
+        return sorted(
+            (-negative_distance, self._positions[remorqueur_id])
+            for negative_distance, remorqueur_id in best
+        )
+
+    def expire(self, now: Optional[float] = None) -> int:
+        cutoff = (now or time.time()) - POSITION_TTL_SECONDS
+        stale = [position for position in self._positions.values() if position.reported_at < cutoff]
+        for position in stale:
+            del self._positions[position.remorqueur_id]
+            self._unlink(position)
+        self.expired += len(stale)
+        return len(stale)
+
+    async def expire_periodically(self):
+        while True:
+            await asyncio.sleep(POSITION_SWEEP_SECONDS)
+            self.expire()
+
+    def stats(self) -> dict:
+        return {
+            "positions": len(self._positions),
+            "garages": len(self._cells),
+            "cells": sum(len(cells) for cells in self._cells.values()),
+            "updates": self.updates,
+            "queries": self.queries,
+            "expired": self.expired,
+            "replicated": get_redis_client() is not None,
+        }
+
+
+position_index = PositionIndex()
+
+
+class PositionReplica(Subscription):
+    """Applies the position events of every worker to this worker's index, without queueing"""
+
+    def __init__(self, index: PositionIndex):
+        super().__init__([POSITIONS_CHANNEL])
+        self._index = index
+
+    def deliver(self, event: dict):
+        try:
+            if event["type"] == "position":
+                self._index.update(
+                    event["remorqueur_id"], event["garage_id"], event["lat"], event["lon"], event["reported_at"]
+                )
+            elif event["type"] == "position_removed":
+                self._index.remove(event["remorqueur_id"])
+        except (KeyError, TypeError) as e:
+            print(f"Invalid position event: {str(e)}")
+
+
+async def start_position_replication():
+    """Replicate position reports between workers; needs REDIS_URL as soon as there is more than one"""
+    if get_redis_client() is None and WEB_CONCURRENCY > 1:
+        print(f"Warning: REDIS_URL is not set, each of the {WEB_CONCURRENCY} workers only indexes the positions it receives")
+    await get_pubsub().subscribe([POSITIONS_CHANNEL], PositionReplica(position_index))
+
+
+async def _publish_position_event(event: dict):
+    try:
+        await get_pubsub().publish([POSITIONS_CHANNEL], event)
+    except Exception as e:
+        print(f"Error publishing position: {str(e)}")
+
+
+async def report_position_logic(principal: AuthPrincipal, lat: float, lon: float, db: AsyncSession):
+    """Index a driver's position; no DB write, one lookup only for tokens issued without garage_id"""
+    if principal.role != 'remorqueur':
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only remorqueurs report positions"
+        )
+
+    garage_id = principal.garage_id
+    if garage_id is None:
+        garage_id = (await db.execute(
+            select(Remorqueur.garage_id).where(Remorqueur.id == principal.id)
+        )).scalar_one_or_none()
+        if garage_id is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Remorqueur not found")
+
+    reported_at = time.time()
+    position_index.update(principal.id, garage_id, lat, lon, reported_at)
+    await _publish_position_event({
+        "type": "position",
+        "remorqueur_id": principal.id,
+        "garage_id": garage_id,
+        "lat": lat,
+        "lon": lon,
+        "reported_at": reported_at,
+    })
+
+
+async def forget_positions(remorqueur_ids: List[int]):
+    """Drop deactivated or deleted drivers from the index of every worker"""
+    for remorqueur_id in remorqueur_ids:
+        position_index.remove(remorqueur_id)
+        await _publish_position_event({"type": "position_removed", "remorqueur_id": remorqueur_id})
+
+
+async def get_nearest_remorqueurs_logic(
+    garage_id: int,
+    lat: float,
+    lon: float,
+    k: int,
+    radius_km: float,
+    db: AsyncSession,
+) -> NearbyRemorqueursResponse:
+    """The k closest active drivers of a garage, filtered and named from the cached roster"""
+    roster = await roster_cache.get(garage_id, db)
+    if roster is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Garage not found")
+    members = {member.id: member for member in roster.members if member.is_active}
+
+    # Ask for a few more in case the roster dropped some since they reported
+    candidates = position_index.nearest(garage_id, lat, lon, k + 5, radius_km)
+    items = [
+        NearbyRemorqueur(
+            id=position.remorqueur_id,
+            name=members[position.remorqueur_id].name,
+            tel=members[position.remorqueur_id].tel,
+            lat=position.lat,
+            lon=position.lon,
+            distance_km=round(distance, 3),
+            reported_at=position.reported_at,
+        )
+        for distance, position in candidates
+        if position.remorqueur_id in members
+    ][:k]
+    return NearbyRemorqueursResponse(garage_id=garage_id, items=items)
@@ -1,4 +1,5 @@
 from datetime import datetime, timedelta
+from typing import Optional
 from fastapi import HTTPException, status
 from sqlalchemy import select
 from sqlalchemy.orm import joinedload
@@ -6,29 +7,38 @@ from server.models.garageModel import Garage
 from server.models.remorqueurModel import Remorqueur
 from server.settings import AsyncSession
 from server.controllers.authController import (
-    ACCESS_TOKEN_EXPIRE_HOURS,
+    ACCESS_TOKEN_EXPIRE_MINUTES,
     EASTERN_TZ,
+    argon2_strong_hash,
     create_jwt_token,
+    load_user,
+    password_needs_rehash,
+    token_role,
     verify_password
 )
+from server.controllers.throttleController import run_hash_operation, throttle_login
+from server.controllers.tokenController import token_store
 from server.models.authModel import (
     LoginRequest,
     LoginResponse,
     PermissionResponse,
+    RefreshTokenRequest,
     RoleResponse,
     User,
     Role,
     UserDict
 )
 
-async def process_login(db: AsyncSession, login_data: LoginRequest) -> LoginResponse:
+async def process_login(db: AsyncSession, login_data: LoginRequest, client_ip: Optional[str] = None) -> LoginResponse:
     """
     Process user login request and return appropriate response with user details.
     Handles three types of users: regular users, garage users, and remorqueur users.
     """
-    # Initialize user and garage_name variables
+    # Cheap rejection of bursts before any DB lookup or Argon2 work
+    await throttle_login(login_data.username, client_ip)
+
+    # Initialize user variable
     user = None
-    garage_name = None
 
     # Try to find user in each possible table, with proper relationship loading
     queries = [
@@ -66,12 +76,35 @@ async def process_login(db: AsyncSession, login_data: LoginRequest) -> LoginResp
         )
 
     # Verify the provided password
-    if not verify_password(user.password, login_data.password):
+    if not await run_hash_operation(verify_password, user.password, login_data.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid credentials"
         )
 
+    refresh_token, refresh_expires_at = await token_store.issue_refresh_token(
+        token_role(user), user.id
+    )
+    response = build_login_response(user, refresh_token, refresh_expires_at)
+
+    # Transparently upgrade hashes made with outdated Argon2 parameters
+    # (after the response is built: a rollback would expire the loaded user)
+    if password_needs_rehash(user.password):
+        try:
+            user.password = await run_hash_operation(argon2_strong_hash, login_data.password)
+            await db.commit()
+        except HTTPException:
+            pass  # hashing capacity exhausted, upgrade on a later login
+        except Exception as e:
+            await db.rollback()
+            print(f"Error rehashing password: {str(e)}")
+
+    return response
+
+def build_login_response(user, refresh_token: str, refresh_expires_at: datetime) -> LoginResponse:
+    """Issue a new access token for an already verified account"""
+    garage_name = None
+
     # Determine garage_name based on user type
     if isinstance(user, Garage):
         garage_name = user.name  # Garage users use their own name
@@ -81,7 +114,7 @@ async def process_login(db: AsyncSession, login_data: LoginRequest) -> LoginResp
 
     # Create JWT token and set expiration
     access_token = create_jwt_token(user)
-    expiration = datetime.now(EASTERN_TZ) + timedelta(hours=ACCESS_TOKEN_EXPIRE_HOURS)
+    expiration = datetime.now(EASTERN_TZ) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
 
     # Create user dictionary with garage_name included
     user_dict = UserDict(
@@ -108,7 +141,39 @@ async def process_login(db: AsyncSession, login_data: LoginRequest) -> LoginResp
         user=user_dict,
         role=role_response,
         expires_at=expiration,
-        garage_name=garage_name  # Also include at top level for compatibility
+        garage_name=garage_name,  # Also include at top level for compatibility
+        refresh_token=refresh_token,
+        refresh_expires_at=refresh_expires_at
+    )
+
+    return response
+
+async def process_refresh(db: AsyncSession, refresh_data: RefreshTokenRequest) -> LoginResponse:
+    """
+    Rotate a refresh token and issue a new access token.
+    This is the only place the account is re-read from the database, so deleted
+    or deactivated accounts are cut off here instead of on every request.
+    """
+    record = await token_store.rotate_refresh_token(refresh_data.refresh_token)
+    if record is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token"
+        )
+
+    user = await load_user(record["role"], int(record["sub"]), db)
+    if user is None or (isinstance(user, Remorqueur) and not user.is_active):
+        await token_store.revoke_subject(record["role"], record["sub"])
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token"
+        )
+
+    refresh_token, refresh_expires_at = await token_store.issue_refresh_token(
+        record["role"], user.id, family=record["family"]
     )
+    return build_login_response(user, refresh_token, refresh_expires_at)
 
-    return response
\ No newline at end of file
+async def process_logout(refresh_data: RefreshTokenRequest) -> dict:
+    await token_store.revoke_refresh_token(refresh_data.refresh_token)
+    return {"message": "Logged out successfully"}
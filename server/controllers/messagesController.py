@@ -1,14 +1,23 @@
-from typing import List
-from sqlalchemy import Boolean, and_, delete, select, insert, Table, Column, Integer, ForeignKey, update
+import asyncio
+import base64
+import json
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import Boolean, Index, and_, case, delete, func, literal, or_, select, insert, true, tuple_, Table, Column, Integer, ForeignKey, update
 from sqlalchemy.orm import selectinload
 from fastapi import HTTPException
 from datetime import datetime
 from server.models.authModel import Base, User
 from server.models.garageModel import Garage
-from server.models.messagesModel import AdminMessage, AdminMessageCreate, AdminMessageResponse, GarageMessage, GarageMessageCreate, GarageMessageResponse, get_eastern_time
+from server.models.messagesModel import AdminMessage, AdminMessageCreate, AdminMessagePage, AdminMessageResponse, GarageMessage, GarageMessageCreate, GarageMessagePage, GarageMessageResponse, MessageDeliveryJob, MessageSummary, get_eastern_time
 from server.models.remorqueurModel import Remorqueur
+from server.controllers.presenceController import get_online_remorqueur_ids
+from server.controllers.realtimeController import publish_event
+from server.controllers.rosterController import roster_cache
 from server.settings import (
     AsyncSession,
+    PrimarySessionLocal,
 )
 
 # Define association tables
@@ -18,6 +27,8 @@ admin_message_recipients = Table(
     Column("message_id", Integer, ForeignKey("admin_messages.id"), primary_key=True),
     Column("garage_id", Integer, ForeignKey("garages.id"), primary_key=True),
     Column("is_read", Boolean, default=False, nullable=False),
+    # Inbox lookups go by recipient, not by message
+    Index("ix_admin_message_recipients_garage", "garage_id", "message_id"),
     extend_existing=True
 )
 
@@ -27,9 +38,504 @@ garage_message_recipients = Table(
     Column("message_id", Integer, ForeignKey("garage_messages.id"), primary_key=True),
     Column("remorqueur_id", Integer, ForeignKey("remorqueurs.id"), primary_key=True),
     Column("is_read", Boolean, default=False, nullable=False),
+    Index("ix_garage_message_recipients_remorqueur", "remorqueur_id", "message_id"),
     extend_existing=True
 )
 
+# Length of the content preview returned by summary listings
+MESSAGE_PREVIEW_LENGTH = 140
+
+# Most message ids accepted by one bulk read request
+BULK_READ_MAX_IDS = 1000
+
+# Sends to more explicit recipients than this are delivered by the background queue
+DELIVERY_QUEUE_THRESHOLD = 200
+
+# How long a worker serves unread counts from memory
+UNREAD_CACHE_SECONDS = 10
+
+# Single read receipts are written behind: flushed every interval, or sooner
+# once enough are pending; past the cap requests write through again
+READ_RECEIPT_FLUSH_SECONDS = 1.0
+READ_RECEIPT_FLUSH_SIZE = 500
+READ_RECEIPT_MAX_PENDING = 20000
+READ_RECEIPT_BATCH_SIZE = 500
+READ_RECEIPT_MAX_ATTEMPTS = 5
+
+
+class UnreadCounterCache:
+    """
+    In-memory tier in front of the garages.unread_admin_messages and
+    remorqueurs.unread_garage_messages counters. Local writes invalidate it;
+    writes from other workers show up after UNREAD_CACHE_SECONDS.
+    """
+
+    def __init__(self, max_size: int = 50000):
+        self._entries: Dict[Tuple[str, int], Tuple[int, float]] = {}
+        self._max_size = max_size
+
+    def get(self, kind: str, owner_id: int) -> Optional[int]:
+        entry = self._entries.get((kind, owner_id))
+        if entry is None or entry[1] < time.time():
+            return None
+        return entry[0]
+
+    def set(self, kind: str, owner_id: int, count: int):
+        if len(self._entries) >= self._max_size:
+            self._entries.clear()
+        self._entries[(kind, owner_id)] = (count, time.time() + UNREAD_CACHE_SECONDS)
+
+    def invalidate(self, kind: str, owner_ids=None):
+        if owner_ids is None or len(owner_ids) > 1000:
+            for key in [key for key in self._entries if key[0] == kind]:
+                del self._entries[key]
+            return
+        for owner_id in owner_ids:
+            self._entries.pop((kind, owner_id), None)
+
+
+unread_cache = UnreadCounterCache()
+
+# kind -> (counter owner model, counter column name, recipients table, recipient column)
+UNREAD_COUNTERS = {
+    "garage": (Garage, "unread_admin_messages", admin_message_recipients, "garage_id"),
+    "remorqueur": (Remorqueur, "unread_garage_messages", garage_message_recipients, "remorqueur_id"),
+}
+
+def increment_unread_stmt(kind: str, owner_ids: List[int]):
+    owner_model, counter, _, _ = UNREAD_COUNTERS[kind]
+    counter_column = getattr(owner_model, counter)
+    return (
+        update(owner_model)
+        .where(owner_model.id.in_(owner_ids))
+        .values({counter: counter_column + 1})
+    )
+
+def decrement_unread_stmt(kind: str, owner_id: int, amount: int = 1):
+    owner_model, counter, _, _ = UNREAD_COUNTERS[kind]
+    counter_column = getattr(owner_model, counter)
+    return (
+        update(owner_model)
+        .where(owner_model.id == owner_id)
+        .values({counter: func.greatest(counter_column - amount, 0)})
+    )
+
+def release_unread_stmt(kind: str, message_ids: List[int]):
+    """Before messages disappear: take their unread receipts off each recipient's counter"""
+    owner_model, counter, recipients_table, recipient_column = UNREAD_COUNTERS[kind]
+    counter_column = getattr(owner_model, counter)
+    unread_receipts = and_(
+        recipients_table.c.message_id.in_(message_ids),
+        recipients_table.c.is_read == False
+    )
+    unread_per_owner = (
+        select(func.count())
+        .select_from(recipients_table)
+        .where(and_(unread_receipts, recipients_table.c[recipient_column] == owner_model.id))
+        .scalar_subquery()
+    )
+    return (
+        update(owner_model)
+        .where(owner_model.id.in_(
+            select(recipients_table.c[recipient_column]).where(unread_receipts)
+        ))
+        .values({counter: func.greatest(counter_column - unread_per_owner, 0)})
+    )
+
+# kind -> (message model, sender column, sender model, reader model) of broadcasts
+# stored once and resolved at read time against the sender's audience
+BROADCASTS = {
+    "garage": (AdminMessage, "admin_id", User, Garage),
+    "remorqueur": (GarageMessage, "garage_id", Garage, Remorqueur),
+}
+
+# Realtime channel each kind of broadcast is published on, keyed by sender id
+BROADCAST_CHANNELS = {
+    "garage": "admin_broadcast",
+    "remorqueur": "garage_broadcast",
+}
+
+# kind -> reader column naming the sender whose broadcasts reach the reader
+BROADCAST_READER_SENDER = {
+    "garage": Garage.created_by_id,
+    "remorqueur": Remorqueur.garage_id,
+}
+
+def broadcast_audience(kind: str, owner_id: int):
+    """
+    Clause matching the broadcasts whose audience includes this garage /
+    remorqueur: its sender's broadcasts sent after the account was created.
+    """
+    message_model, sender_column, _, reader_model = BROADCASTS[kind]
+    sender_id = select(BROADCAST_READER_SENDER[kind]).where(reader_model.id == owner_id).scalar_subquery()
+    watermark = select(reader_model.broadcast_watermark).where(reader_model.id == owner_id).scalar_subquery()
+    return and_(
+        message_model.fanout_on_read == True,
+        getattr(message_model, sender_column) == sender_id,
+        message_model.id > watermark,
+    )
+
+async def broadcast_join_values(kind: str, sender_id: int, db: AsyncSession) -> dict:
+    """
+    Column values of a new garage ("garage") or remorqueur ("remorqueur").
+    The sender's broadcasts so far were never sent to it: they stay out of
+    its inbox (broadcast_watermark) and of its unread count (counted as read).
+    """
+    message_model, sender_column, sender_model, _ = BROADCASTS[kind]
+    last_broadcast_id, broadcast_count = (await db.execute(
+        select(
+            select(func.max(message_model.id))
+            .where(and_(getattr(message_model, sender_column) == sender_id, message_model.fanout_on_read == True))
+            .scalar_subquery(),
+            select(sender_model.broadcast_count).where(sender_model.id == sender_id).scalar_subquery(),
+        )
+    )).one()
+    return {"broadcast_watermark": last_broadcast_id or 0, "read_broadcast_count": broadcast_count or 0}
+
+async def get_broadcast_sender_id(kind: str, owner_id: int, db: AsyncSession) -> Optional[int]:
+    """Admin (for a garage) or garage (for a remorqueur) whose broadcasts reach this inbox"""
+    if kind == "garage":
+        query = select(Garage.created_by_id).where(Garage.id == owner_id)
+    else:
+        query = select(Remorqueur.garage_id).where(Remorqueur.id == owner_id)
+    return (await db.execute(query)).scalar_one_or_none()
+
+def inbox_scope(kind: str, owner_id: int):
+    """
+    (outer join onclause, membership clause, read state) of an inbox: messages
+    with a recipient row for the owner, plus the broadcasts of its audience.
+    A broadcast is unread until its receipt row exists.
+    """
+    _, _, recipients_table, recipient_column = UNREAD_COUNTERS[kind]
+    message_model = BROADCASTS[kind][0]
+    recipient = recipients_table.c[recipient_column]
+    onclause = and_(message_model.id == recipients_table.c.message_id, recipient == owner_id)
+    member = or_(recipient.isnot(None), broadcast_audience(kind, owner_id))
+    return onclause, member, func.coalesce(recipients_table.c.is_read, False)
+
+def count_broadcast_stmt(kind: str, sender_id: int):
+    sender_model = BROADCASTS[kind][2]
+    return (
+        update(sender_model)
+        .where(sender_model.id == sender_id)
+        .values(broadcast_count=sender_model.broadcast_count + 1)
+    )
+
+def count_broadcast_read_stmt(kind: str, owner_id: int):
+    reader_model = BROADCASTS[kind][3]
+    return (
+        update(reader_model)
+        .where(reader_model.id == owner_id)
+        .values(read_broadcast_count=reader_model.read_broadcast_count + 1)
+    )
+
+def release_message_stmts(kind: str, message_ids: List[int]):
+    """Every counter update due before these messages leave the inbox (deleted or archived)"""
+    return [release_unread_stmt(kind, message_ids)] + release_broadcast_stmts(kind, message_ids)
+
+def release_broadcast_stmts(kind: str, message_ids: List[int]):
+    """
+    Before broadcasts disappear: take them off their sender's count and their
+    readers' counts, both the receipts and the broadcasts counted as read at
+    account creation (at or below the reader's broadcast_watermark).
+    """
+    message_model, sender_column, sender_model, reader_model = BROADCASTS[kind]
+    _, _, recipients_table, recipient_column = UNREAD_COUNTERS[kind]
+    sender = getattr(message_model, sender_column)
+    broadcasts = and_(message_model.id.in_(message_ids), message_model.fanout_on_read == True)
+
+    sent_per_sender = (
+        select(func.count())
+        .select_from(message_model)
+        .where(and_(broadcasts, sender == sender_model.id))
+        .scalar_subquery()
+    )
+    release_sent = (
+        update(sender_model)
+        .where(sender_model.id.in_(select(sender).where(broadcasts)))
+        .values(broadcast_count=func.greatest(sender_model.broadcast_count - sent_per_sender, 0))
+    )
+
+    receipts = recipients_table.c.message_id.in_(select(message_model.id).where(broadcasts))
+    read_per_reader = (
+        select(func.count())
+        .select_from(recipients_table)
+        .where(and_(receipts, recipients_table.c[recipient_column] == reader_model.id))
+        .scalar_subquery()
+    )
+    release_read = (
+        update(reader_model)
+        .where(reader_model.id.in_(select(recipients_table.c[recipient_column]).where(receipts)))
+        .values(read_broadcast_count=func.greatest(reader_model.read_broadcast_count - read_per_reader, 0))
+    )
+
+    reader_sender = BROADCAST_READER_SENDER[kind]
+    predating_per_reader = (
+        select(func.count())
+        .select_from(message_model)
+        .where(and_(broadcasts, sender == reader_sender, message_model.id <= reader_model.broadcast_watermark))
+        .scalar_subquery()
+    )
+    release_predating = (
+        update(reader_model)
+        .where(and_(
+            reader_sender.in_(select(sender).where(broadcasts)),
+            reader_model.broadcast_watermark >= select(func.min(message_model.id)).where(broadcasts).scalar_subquery(),
+        ))
+        .values(read_broadcast_count=func.greatest(reader_model.read_broadcast_count - predating_per_reader, 0))
+    )
+    return [release_sent, release_read, release_predating]
+
+class ReadReceiptBuffer:
+    """
+    Single mark-as-read requests of this worker, coalesced by (message, recipient)
+    and written in batches. Receipts stay visible to reads served by this worker
+    (inbox listings, unread counts) until the batch holding them commits.
+    A crash loses at most the receipts of one interval; marking as read is
+    idempotent, so clients simply mark again.
+    """
+
+    def __init__(self):
+        # kind -> {(message_id, owner_id): fanout_on_read}
+        self._pending: Dict[str, Dict[Tuple[int, int], bool]] = {kind: {} for kind in UNREAD_COUNTERS}
+        # (kind, owner_id) -> message ids pending or being flushed
+        self._visible: Dict[Tuple[str, int], set] = {}
+        self._size = 0
+        self._lock = asyncio.Lock()
+        # Set once enough receipts are pending: wakes flush_periodically early
+        self._flush_requested = asyncio.Event()
+        self._failed_attempts = 0
+        self.flushed = 0
+        self.dropped = 0
+
+    def is_pending(self, kind: str, message_id: int, owner_id: int) -> bool:
+        return message_id in self._visible.get((kind, owner_id), ())
+
+    def pending_message_ids(self, kind: str, owner_id: int) -> set:
+        return self._visible.get((kind, owner_id), set())
+
+    def add(self, kind: str, message_id: int, owner_id: int, fanout_on_read: bool) -> bool:
+        """Queue a receipt; False when the buffer is full and the caller must write it itself"""
+        if self.is_pending(kind, message_id, owner_id):
+            return True
+        if self._size >= READ_RECEIPT_MAX_PENDING:
+            return False
+        self._pending[kind][(message_id, owner_id)] = fanout_on_read
+        self._visible.setdefault((kind, owner_id), set()).add(message_id)
+        self._size += 1
+        if self._size >= READ_RECEIPT_FLUSH_SIZE:
+            self._flush_requested.set()
+        return True
+
+    async def flush(self):
+        async with self._lock:
+            batch = self._pending
+            if not any(batch.values()):
+                return
+            self._pending = {kind: {} for kind in UNREAD_COUNTERS}
+
+            try:
+                async with PrimarySessionLocal() as db:
+                    for kind, receipts in batch.items():
+                        if receipts:
+                            await _write_read_receipts(kind, receipts, db)
+                    await db.commit()
+            except Exception as e:
+                self._failed_attempts += 1
+                print(f"Error flushing read receipts (attempt {self._failed_attempts}): {str(e)}")
+                if self._failed_attempts < READ_RECEIPT_MAX_ATTEMPTS:
+                    # Retry with the next flush, alongside receipts queued meanwhile
+                    for kind, receipts in batch.items():
+                        for key, fanout_on_read in receipts.items():
+                            self._pending[kind].setdefault(key, fanout_on_read)
+                    return
+                self.dropped += sum(len(receipts) for receipts in batch.values())
+            else:
+                self.flushed += sum(len(receipts) for receipts in batch.values())
+            self._failed_attempts = 0
+
+            for kind, receipts in batch.items():
+                owners = set()
+                for message_id, owner_id in receipts:
+                    visible = self._visible.get((kind, owner_id))
+                    if visible is not None:
+                        visible.discard(message_id)
+                        if not visible:
+                            del self._visible[(kind, owner_id)]
+                    owners.add(owner_id)
+                    self._size -= 1
+                unread_cache.invalidate(kind, list(owners))
+
+    async def flush_periodically(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), READ_RECEIPT_FLUSH_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Error flushing read receipts: {str(e)}")
+
+    def stats(self) -> dict:
+        return {
+            "pending": self._size,
+            "max_pending": READ_RECEIPT_MAX_PENDING,
+            "flushed": self.flushed,
+            "dropped": self.dropped,
+            "failed_attempts": self._failed_attempts,
+        }
+
+
+read_receipts = ReadReceiptBuffer()
+
+
+async def _write_read_receipts(kind: str, receipts: Dict[Tuple[int, int], bool], db: AsyncSession):
+    """
+    Apply a batch of receipts with a few set-based statements per chunk.
+    Rows are locked first so the counters move by exactly what changed.
+    """
+    owner_model, counter, recipients_table, recipient_column = UNREAD_COUNTERS[kind]
+    message_model, _, _, reader_model = BROADCASTS[kind]
+    recipient = recipients_table.c[recipient_column]
+    pair = tuple_(recipients_table.c.message_id, recipient)
+
+    direct = [key for key, fanout_on_read in receipts.items() if not fanout_on_read]
+    broadcasts = [key for key, fanout_on_read in receipts.items() if fanout_on_read]
+
+    for start in range(0, len(direct), READ_RECEIPT_BATCH_SIZE):
+        chunk = direct[start:start + READ_RECEIPT_BATCH_SIZE]
+        unread = (await db.execute(
+            select(recipients_table.c.message_id, recipient)
+            .where(and_(pair.in_(chunk), recipients_table.c.is_read == False))
+            .with_for_update()
+        )).all()
+        if not unread:
+            continue
+        unread = [tuple(row) for row in unread]
+        await db.execute(update(recipients_table).where(pair.in_(unread)).values(is_read=True))
+
+        per_owner = Counter(owner_id for _, owner_id in unread)
+        counter_column = getattr(owner_model, counter)
+        await db.execute(
+            update(owner_model)
+            .where(owner_model.id.in_(list(per_owner)))
+            .values({counter: func.greatest(
+                counter_column - case(per_owner, value=owner_model.id, else_=0), 0
+            )})
+        )
+
+    for start in range(0, len(broadcasts), READ_RECEIPT_BATCH_SIZE):
+        chunk = broadcasts[start:start + READ_RECEIPT_BATCH_SIZE]
+        existing = {
+            tuple(row) for row in (await db.execute(
+                select(recipients_table.c.message_id, recipient)
+                .where(pair.in_(chunk))
+                .with_for_update()
+            )).all()
+        }
+        # Broadcasts deleted since the request must not count as read
+        live_ids = set((await db.execute(
+            select(message_model.id).where(message_model.id.in_({message_id for message_id, _ in chunk}))
+        )).scalars())
+        missing = [key for key in chunk if key not in existing and key[0] in live_ids]
+        if not missing:
+            continue
+        await db.execute(
+            insert(recipients_table)
+            .prefix_with("IGNORE")
+            .values([
+                {"message_id": message_id, recipient_column: owner_id, "is_read": True}
+                for message_id, owner_id in missing
+            ])
+        )
+
+        per_owner = Counter(owner_id for _, owner_id in missing)
+        await db.execute(
+            update(reader_model)
+            .where(reader_model.id.in_(list(per_owner)))
+            .values(read_broadcast_count=reader_model.read_broadcast_count
+                    + case(per_owner, value=reader_model.id, else_=0))
+        )
+
+def apply_pending_receipts(kind: str, owner_id: int, items: list):
+    """Show receipts still waiting in this worker's buffer as read"""
+    pending = read_receipts.pending_message_ids(kind, owner_id)
+    if pending:
+        for item in items:
+            if item.id in pending:
+                item.is_read = True
+    return items
+
+async def get_unread_count_logic(kind: str, owner_id: int, db: AsyncSession) -> int:
+    """
+    Unread badge count: memory tier first, then one primary-key read of the
+    direct counter plus the audience's broadcasts not yet read.
+    """
+    pending = len(read_receipts.pending_message_ids(kind, owner_id))
+    cached = unread_cache.get(kind, owner_id)
+    if cached is not None:
+        return max(cached - pending, 0)
+
+    if kind == "garage":
+        query = (
+            select(
+                Garage.unread_admin_messages
+                + func.coalesce(User.broadcast_count, 0)
+                - Garage.read_broadcast_count
+            )
+            .outerjoin(User, User.id == Garage.created_by_id)
+            .where(Garage.id == owner_id)
+        )
+    else:
+        query = (
+            select(
+                Remorqueur.unread_garage_messages
+                + Garage.broadcast_count
+                - Remorqueur.read_broadcast_count
+            )
+            .join(Garage, Garage.id == Remorqueur.garage_id)
+            .where(Remorqueur.id == owner_id)
+        )
+    count = (await db.execute(query)).scalar_one_or_none()
+    if count is None:
+        raise HTTPException(status_code=404, detail=f"{kind.capitalize()} not found")
+
+    count = max(int(count), 0)
+    unread_cache.set(kind, owner_id, count)
+    return max(count - pending, 0)
+
+async def garage_remorqueur_ids(garage_id: int, remorqueur_ids: set, db: AsyncSession) -> set:
+    """
+    Which of remorqueur_ids belong to the garage. The cached roster answers
+    only when its versions are shared between workers and it knows every id;
+    otherwise (stale per-worker copy, or a driver it has not seen) one IN
+    query on remorqueurs decides.
+    """
+    if roster_cache.shared:
+        roster = await roster_cache.get(garage_id, db)
+        if roster is not None and remorqueur_ids <= roster.ids:
+            return set(remorqueur_ids)
+    return set((await db.execute(
+        select(Remorqueur.id).where(and_(Remorqueur.id.in_(list(remorqueur_ids)), Remorqueur.garage_id == garage_id))
+    )).scalars())
+
+async def get_recipient_ids(db: AsyncSession, recipients_table: Table, recipient_column: str, message_ids: List[int]) -> Dict[int, List[int]]:
+    """Recipient ids for a whole page of messages, fetched with a single IN query"""
+    recipient_ids = {message_id: [] for message_id in message_ids}
+    if not message_ids:
+        return recipient_ids
+
+    recipients_query = (
+        select(recipients_table.c.message_id, recipients_table.c[recipient_column])
+        .where(recipients_table.c.message_id.in_(message_ids))
+    )
+    recipients_result = await db.execute(recipients_query)
+    for message_id, recipient_id in recipients_result:
+        recipient_ids[message_id].append(recipient_id)
+    return recipient_ids
+
 async def get_all_admin_messages_logic(db: AsyncSession):
     try:
         # Get all admin messages
@@ -37,23 +543,20 @@ async def get_all_admin_messages_logic(db: AsyncSession):
         result = await db.execute(messages_query)
         messages = result.scalars().all()
 
+        # Get the recipients of every message at once
+        recipient_ids = await get_recipient_ids(
+            db, admin_message_recipients, "garage_id", [message.id for message in messages]
+        )
+
         message_responses = []
         for message in messages:
-            # Get all recipients for this message
-            recipients_query = (
-                select(admin_message_recipients.c.garage_id)
-                .where(admin_message_recipients.c.message_id == message.id)
-            )
-            recipients_result = await db.execute(recipients_query)
-            recipient_ids = [row[0] for row in recipients_result]
-            
             message_responses.append(AdminMessageResponse(
                 id=message.id,
                 title=message.title,
                 content=message.content,
                 created_at=message.created_at,
                 to_all=message.to_all,
-                garage_ids=recipient_ids,
+                garage_ids=None if message.fanout_on_read else recipient_ids[message.id],
                 is_read=False
             ))
 
@@ -69,23 +572,20 @@ async def get_all_garage_messages_logic(garage_id: int, db: AsyncSession):
         result = await db.execute(messages_query)
         messages = result.scalars().all()
 
+        # Get the recipients of every message at once
+        recipient_ids = await get_recipient_ids(
+            db, garage_message_recipients, "remorqueur_id", [message.id for message in messages]
+        )
+
         message_responses = []
         for message in messages:
-            # Get all recipients for this message
-            recipients_query = (
-                select(garage_message_recipients.c.remorqueur_id)
-                .where(garage_message_recipients.c.message_id == message.id)
-            )
-            recipients_result = await db.execute(recipients_query)
-            recipient_ids = [row[0] for row in recipients_result]
-            
             message_responses.append(GarageMessageResponse(
                 id=message.id,
                 title=message.title,
                 content=message.content,
                 created_at=message.created_at,
                 to_all=message.to_all,
-                remorqueur_ids=recipient_ids,
+                remorqueur_ids=None if message.fanout_on_read else recipient_ids[message.id],
                 is_read=False
             ))
 
@@ -98,43 +598,35 @@ async def get_admin_messages_logic(garage_id: int, db: AsyncSession):
 
     try:
         # Get all messages for this garage, including their read status
+        onclause, member, is_read = inbox_scope("garage", garage_id)
         messages_query = (
-            select(
-                AdminMessage,
-                admin_message_recipients.c.is_read
-            )
-            .join(
-                admin_message_recipients,
-                AdminMessage.id == admin_message_recipients.c.message_id
-            )
-            .where(admin_message_recipients.c.garage_id == garage_id)
+            select(AdminMessage, is_read)
+            .outerjoin(admin_message_recipients, onclause)
+            .where(member)
             .order_by(AdminMessage.created_at.desc())  # Show newest messages first
         )
         
         result = await db.execute(messages_query)
         messages = result.fetchall()
 
+        # Get the complete recipient lists of every message at once
+        recipient_ids = await get_recipient_ids(
+            db, admin_message_recipients, "garage_id", [message.id for message, _ in messages]
+        )
+
         message_responses = []
         for message, is_read in messages:
-            # Get all recipients for this message to maintain the complete recipient list
-            recipients_query = (
-                select(admin_message_recipients.c.garage_id)
-                .where(admin_message_recipients.c.message_id == message.id)
-            )
-            recipients_result = await db.execute(recipients_query)
-            recipient_ids = [row[0] for row in recipients_result]
-            
             message_responses.append(AdminMessageResponse(
                 id=message.id,
                 title=message.title,
                 content=message.content,
                 created_at=message.created_at,
                 to_all=message.to_all,
-                garage_ids=recipient_ids,
+                garage_ids=None if message.fanout_on_read else recipient_ids[message.id],
                 is_read=is_read  # Individual read status for this garage
             ))
 
-        return message_responses
+        return apply_pending_receipts("garage", garage_id, message_responses)
     except Exception as e:
         print(f"Error occurred: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to retrieve admin messages: {str(e)}")
@@ -155,48 +647,35 @@ async def get_garage_messages_logic(remorqueur_id: int, db: AsyncSession):
             raise HTTPException(status_code=404, detail="Remorqueur not found")
 
         # Get all messages for this remorqueur, including their read status
+        onclause, member, is_read = inbox_scope("remorqueur", remorqueur_id)
         messages_query = (
-            select(
-                GarageMessage,
-                garage_message_recipients.c.is_read
-            )
-            .join(
-                garage_message_recipients,
-                GarageMessage.id == garage_message_recipients.c.message_id
-            )
-            .where(
-                and_(
-                    GarageMessage.garage_id == remorqueur.garage_id,
-                    garage_message_recipients.c.remorqueur_id == remorqueur_id
-                )
-            )
+            select(GarageMessage, is_read)
+            .outerjoin(garage_message_recipients, onclause)
+            .where(and_(GarageMessage.garage_id == remorqueur.garage_id, member))
             .order_by(GarageMessage.created_at.desc())  # Show newest messages first
         )
         
         result = await db.execute(messages_query)
         messages = result.fetchall()
+
+        # Get the complete recipient lists of every message at once
+        recipient_ids = await get_recipient_ids(
+            db, garage_message_recipients, "remorqueur_id", [message.id for message, _ in messages]
+        )
         
         message_responses = []
         for message, is_read in messages:
-            # Get all recipients for this message to maintain the complete recipient list
-            recipients_query = (
-                select(garage_message_recipients.c.remorqueur_id)
-                .where(garage_message_recipients.c.message_id == message.id)
-            )
-            recipients_result = await db.execute(recipients_query)
-            recipient_ids = [row[0] for row in recipients_result]
-            
             message_responses.append(GarageMessageResponse(
                 id=message.id,
                 title=message.title,
                 content=message.content,
                 created_at=message.created_at,
                 to_all=message.to_all,
-                remorqueur_ids=recipient_ids,
+                remorqueur_ids=None if message.fanout_on_read else recipient_ids[message.id],
                 is_read=is_read  # Individual read status for this remorqueur
             ))
 
-        return message_responses
+        return apply_pending_receipts("remorqueur", remorqueur_id, message_responses)
     except Exception as e:
         print(f"Error occurred: {str(e)}")
         raise HTTPException(
@@ -204,6 +683,319 @@ async def get_garage_messages_logic(remorqueur_id: int, db: AsyncSession):
             detail=f"Failed to retrieve garage messages: {str(e)}"
         )
     
+def encode_cursor(created_at: datetime, message_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{message_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        created_at, message_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(message_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+async def _get_message_page(
+    db: AsyncSession,
+    message_model,
+    is_read_column,
+    filters: list,
+    cursor: Optional[str],
+    limit: int,
+    summary: bool,
+    recipients_table: Table,
+    recipient_column: str,
+    inbox_onclause=None,
+    newer: bool = False,
+):
+    """
+    One page of messages, newest first, using keyset pagination on (created_at, id).
+    Summary mode only reads a truncated preview of the content.
+    With newer=True the page holds messages after the cursor instead, oldest first.
+    Recipient views pass the outer join onclause of their inbox_scope.
+    """
+    columns = [
+        message_model.id,
+        message_model.title,
+        message_model.created_at,
+        message_model.to_all,
+        message_model.fanout_on_read,
+        is_read_column.label("is_read"),
+    ]
+    if summary:
+        columns.append(func.substr(message_model.content, 1, MESSAGE_PREVIEW_LENGTH).label("preview"))
+    else:
+        columns.append(message_model.content)
+
+    query = select(*columns).select_from(message_model)
+    if inbox_onclause is not None:
+        # Recipient view: one row per message received, with its read state
+        query = query.outerjoin(recipients_table, inbox_onclause)
+    for clause in filters:
+        query = query.where(clause)
+
+    if cursor and newer:
+        cursor_created_at, cursor_id = decode_cursor(cursor)
+        query = query.where(
+            or_(
+                message_model.created_at > cursor_created_at,
+                and_(
+                    message_model.created_at == cursor_created_at,
+                    message_model.id > cursor_id
+                )
+            )
+        )
+    elif cursor:
+        cursor_created_at, cursor_id = decode_cursor(cursor)
+        query = query.where(
+            or_(
+                message_model.created_at < cursor_created_at,
+                and_(
+                    message_model.created_at == cursor_created_at,
+                    message_model.id < cursor_id
+                )
+            )
+        )
+
+    if newer:
+        query = query.order_by(message_model.created_at.asc(), message_model.id.asc()).limit(limit + 1)
+    else:
+        query = query.order_by(message_model.created_at.desc(), message_model.id.desc()).limit(limit + 1)
+    rows = (await db.execute(query)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    if summary:
+        items = [
+            MessageSummary(
+                id=row.id,
+                title=row.title,
+                preview=row.preview,
+                created_at=row.created_at,
+                to_all=row.to_all,
+                is_read=row.is_read
+            )
+            for row in rows
+        ]
+    else:
+        recipient_ids = await get_recipient_ids(
+            db, recipients_table, recipient_column, [row.id for row in rows]
+        )
+        if recipient_column == "garage_id":
+            items = [
+                AdminMessageResponse(
+                    id=row.id,
+                    title=row.title,
+                    content=row.content,
+                    created_at=row.created_at,
+                    to_all=row.to_all,
+                    garage_ids=None if row.fanout_on_read else recipient_ids[row.id],
+                    is_read=row.is_read
+                )
+                for row in rows
+            ]
+        else:
+            items = [
+                GarageMessageResponse(
+                    id=row.id,
+                    title=row.title,
+                    content=row.content,
+                    created_at=row.created_at,
+                    to_all=row.to_all,
+                    remorqueur_ids=None if row.fanout_on_read else recipient_ids[row.id],
+                    is_read=row.is_read
+                )
+                for row in rows
+            ]
+
+    next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id) if has_more else None
+    return items, next_cursor
+
+async def get_all_admin_messages_page_logic(db: AsyncSession, cursor: Optional[str], limit: int, summary: bool):
+    try:
+        items, next_cursor = await _get_message_page(
+            db, AdminMessage, literal(False), [], cursor, limit, summary,
+            admin_message_recipients, "garage_id"
+        )
+        return AdminMessagePage(items=items, next_cursor=next_cursor)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error occurred: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to retrieve all admin messages: {str(e)}")
+
+async def get_all_garage_messages_page_logic(garage_id: int, db: AsyncSession, cursor: Optional[str], limit: int, summary: bool):
+    try:
+        items, next_cursor = await _get_message_page(
+            db, GarageMessage, literal(False), [GarageMessage.garage_id == garage_id],
+            cursor, limit, summary, garage_message_recipients, "remorqueur_id"
+        )
+        return GarageMessagePage(items=items, next_cursor=next_cursor)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error occurred: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to retrieve all garage messages: {str(e)}")
+
+async def get_admin_messages_page_logic(garage_id: int, db: AsyncSession, cursor: Optional[str], limit: int, summary: bool):
+    try:
+        onclause, member, is_read = inbox_scope("garage", garage_id)
+        items, next_cursor = await _get_message_page(
+            db, AdminMessage, is_read, [member],
+            cursor, limit, summary, admin_message_recipients, "garage_id", inbox_onclause=onclause
+        )
+        return AdminMessagePage(items=apply_pending_receipts("garage", garage_id, items), next_cursor=next_cursor)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error occurred: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to retrieve admin messages: {str(e)}")
+
+async def get_garage_messages_page_logic(remorqueur_id: int, db: AsyncSession, cursor: Optional[str], limit: int, summary: bool):
+    try:
+        onclause, member, is_read = inbox_scope("remorqueur", remorqueur_id)
+        items, next_cursor = await _get_message_page(
+            db, GarageMessage, is_read, [member],
+            cursor, limit, summary, garage_message_recipients, "remorqueur_id", inbox_onclause=onclause
+        )
+        return GarageMessagePage(items=apply_pending_receipts("remorqueur", remorqueur_id, items), next_cursor=next_cursor)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error occurred: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to retrieve garage messages: {str(e)}")
+
+# kind -> (message model, recipients table, recipient column) of each realtime inbox
+INBOXES = {
+    "garage": (AdminMessage, admin_message_recipients, "garage_id"),
+    "remorqueur": (GarageMessage, garage_message_recipients, "remorqueur_id"),
+}
+
+def message_created_event(kind: str, message, cursor: Optional[str] = None) -> dict:
+    """Realtime payload announcing a message to an inbox (summary fields only)"""
+    content = getattr(message, "content", None)
+    preview = getattr(message, "preview", None) or (content or "")[:MESSAGE_PREVIEW_LENGTH]
+    return {
+        "type": "message_created",
+        "inbox": kind,
+        "cursor": cursor or encode_cursor(message.created_at, message.id),
+        "message": {
+            "id": message.id,
+            "title": message.title,
+            "preview": preview,
+            "created_at": message.created_at.isoformat(),
+            "to_all": message.to_all,
+            "is_read": bool(getattr(message, "is_read", False)),
+        },
+    }
+
+def message_read_event(kind: str, message_id: int) -> dict:
+    return {"type": "message_read", "inbox": kind, "message_id": message_id}
+
+def messages_read_event(kind: str, message_ids: Optional[List[int]], up_to_cursor: Optional[str], unread: int) -> dict:
+    return {
+        "type": "messages_read",
+        "inbox": kind,
+        "message_ids": message_ids,
+        "up_to_cursor": up_to_cursor,
+        "unread": unread,
+    }
+
+async def get_inbox_updates_logic(kind: str, owner_id: int, cursor: str, db: AsyncSession, limit: int):
+    """
+    Messages received after a cursor, oldest first, for the realtime resume handshake.
+    Returns the events and whether more remain than the limit allowed.
+    """
+    message_model, recipients_table, recipient_column = INBOXES[kind]
+    onclause, member, is_read = inbox_scope(kind, owner_id)
+    items, _ = await _get_message_page(
+        db, message_model, is_read, [member],
+        cursor, limit + 1, True, recipients_table, recipient_column,
+        inbox_onclause=onclause, newer=True
+    )
+    return [message_created_event(kind, item) for item in items[:limit]], len(items) > limit
+
+def new_delivery_job(inbox: str, message_id: int, sender_id: int, recipient_ids: List[int]) -> MessageDeliveryJob:
+    recipient_ids = list(dict.fromkeys(recipient_ids))
+    now = get_eastern_time()
+    return MessageDeliveryJob(
+        inbox=inbox,
+        message_id=message_id,
+        sender_id=sender_id,
+        recipient_ids=json.dumps(recipient_ids),
+        total=len(recipient_ids),
+        delivered=0,
+        invalid_ids="[]",
+        status="pending",
+        created_at=now,
+        updated_at=now,
+    )
+
+async def get_admin_message_logic(message_id: int, garage_id: Optional[int], db: AsyncSession):
+    """Full content of a single admin message; when garage_id is given it must be a recipient"""
+    try:
+        if garage_id is None:
+            query = select(AdminMessage, literal(False)).where(AdminMessage.id == message_id)
+        else:
+            onclause, member, is_read = inbox_scope("garage", garage_id)
+            query = (
+                select(AdminMessage, is_read)
+                .outerjoin(admin_message_recipients, onclause)
+                .where(and_(AdminMessage.id == message_id, member))
+            )
+        row = (await db.execute(query)).first()
+        if not row:
+            raise HTTPException(status_code=404, detail="Message not found")
+
+        message, is_read = row
+        recipient_ids = await get_recipient_ids(db, admin_message_recipients, "garage_id", [message.id])
+        return AdminMessageResponse(
+            id=message.id,
+            title=message.title,
+            content=message.content,
+            created_at=message.created_at,
+            to_all=message.to_all,
+            garage_ids=None if message.fanout_on_read else recipient_ids[message.id],
+            is_read=is_read or (garage_id is not None and read_receipts.is_pending("garage", message.id, garage_id))
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error occurred: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to retrieve admin message: {str(e)}")
+
+async def get_garage_message_logic(message_id: int, remorqueur_id: Optional[int], db: AsyncSession):
+    """Full content of a single garage message; when remorqueur_id is given it must be a recipient"""
+    try:
+        if remorqueur_id is None:
+            query = select(GarageMessage, literal(False)).where(GarageMessage.id == message_id)
+        else:
+            onclause, member, is_read = inbox_scope("remorqueur", remorqueur_id)
+            query = (
+                select(GarageMessage, is_read)
+                .outerjoin(garage_message_recipients, onclause)
+                .where(and_(GarageMessage.id == message_id, member))
+            )
+        row = (await db.execute(query)).first()
+        if not row:
+            raise HTTPException(status_code=404, detail="Message not found")
+
+        message, is_read = row
+        recipient_ids = await get_recipient_ids(db, garage_message_recipients, "remorqueur_id", [message.id])
+        return GarageMessageResponse(
+            id=message.id,
+            title=message.title,
+            content=message.content,
+            created_at=message.created_at,
+            to_all=message.to_all,
+            remorqueur_ids=None if message.fanout_on_read else recipient_ids[message.id],
+            is_read=is_read or (remorqueur_id is not None and read_receipts.is_pending("remorqueur", message.id, remorqueur_id))
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error occurred: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to retrieve garage message: {str(e)}")
+    
 async def create_admin_message_logic(admin_id: int, message_data: AdminMessageCreate, db: AsyncSession):
     try:
         # First verify that the admin exists
@@ -221,6 +1013,8 @@ async def create_admin_message_logic(admin_id: int, message_data: AdminMessageCr
             title=message_data.title,
             content=message_data.content,
             to_all=message_data.to_all,
+            # Broadcasts are stored once and resolved against the admin's garages at read time
+            fanout_on_read=message_data.to_all,
             created_at=get_eastern_time(),
         )
         db.add(new_message)
@@ -228,11 +1022,14 @@ async def create_admin_message_logic(admin_id: int, message_data: AdminMessageCr
 
         # Handle recipient logic
         recipient_garage_ids = []
+        delivery_job = None
         if message_data.to_all:
-            # If to_all is true, get all garage IDs created by this admin
-            query = select(Garage.id).where(Garage.created_by_id == admin_id)
-            result = await db.execute(query)
-            recipient_garage_ids = [row[0] for row in result]
+            await db.execute(count_broadcast_stmt("garage", admin_id))
+        elif message_data.garage_ids and len(set(message_data.garage_ids)) > DELIVERY_QUEUE_THRESHOLD:
+            # Large send: recipients are validated and written in batches by the delivery worker
+            delivery_job = new_delivery_job("garage", new_message.id, admin_id, message_data.garage_ids)
+            db.add(delivery_job)
+            await db.flush()
         elif message_data.garage_ids:
             # Verify that all garages were created by this admin
             query = select(Garage.id).where(
@@ -261,16 +1058,25 @@ async def create_admin_message_logic(admin_id: int, message_data: AdminMessageCr
                 for garage_id in recipient_garage_ids
             ])
             await db.execute(query)
+            await db.execute(increment_unread_stmt("garage", recipient_garage_ids))
 
         await db.commit()
+        event = message_created_event("garage", new_message)
+        if new_message.fanout_on_read:
+            unread_cache.invalidate("garage")
+            await publish_event(BROADCAST_CHANNELS["garage"], [admin_id], event)
+        elif recipient_garage_ids:
+            unread_cache.invalidate("garage", recipient_garage_ids)
+            await publish_event("garage", recipient_garage_ids, event)
         return AdminMessageResponse(
             id=new_message.id,
             title=new_message.title,
             content=new_message.content,
             created_at=new_message.created_at,
             to_all=new_message.to_all,
-            garage_ids=recipient_garage_ids,
-            is_read=False
+            garage_ids=None if new_message.fanout_on_read or delivery_job else recipient_garage_ids,
+            is_read=False,
+            delivery_job_id=delivery_job.id if delivery_job else None
         )
 
     except Exception as e:
@@ -279,10 +1085,19 @@ async def create_admin_message_logic(admin_id: int, message_data: AdminMessageCr
     
 async def create_garage_message_logic(message_data: GarageMessageCreate, db: AsyncSession):
     try:
+        # online_only narrows the send to drivers with a live heartbeat: never a broadcast
+        online_ids = await get_online_remorqueur_ids(message_data.garage_id) if message_data.online_only else None
+        target_ids = message_data.remorqueur_ids
+        if online_ids is not None and message_data.to_all:
+            target_ids = sorted(online_ids)
+        broadcast = message_data.to_all and online_ids is None
+
         new_message = GarageMessage(
             title=message_data.title,
             content=message_data.content,
-            to_all=message_data.to_all,
+            to_all=broadcast,
+            # Broadcasts are stored once and resolved against the garage's remorqueurs at read time
+            fanout_on_read=broadcast,
             garage_id=message_data.garage_id,
             created_at=get_eastern_time(),
         )
@@ -291,30 +1106,32 @@ async def create_garage_message_logic(message_data: GarageMessageCreate, db: Asy
 
         # Handle recipient logic
         recipient_ids = []
-        if message_data.to_all:
-            # If to_all is true, get all remorqueur IDs from the same garage
-            query = select(Remorqueur.id).where(Remorqueur.garage_id == message_data.garage_id)
-            result = await db.execute(query)
-            recipient_ids = [row[0] for row in result]
-        elif message_data.remorqueur_ids:
-            # Verify that all remorqueurs belong to this garage
-            query = select(Remorqueur.id).where(
-                and_(
-                    Remorqueur.id.in_(message_data.remorqueur_ids),
-                    Remorqueur.garage_id == message_data.garage_id
-                )
+        delivery_job = None
+        if broadcast:
+            await db.execute(count_broadcast_stmt("remorqueur", message_data.garage_id))
+        elif target_ids and len(set(target_ids)) > DELIVERY_QUEUE_THRESHOLD:
+            if online_ids is not None:
+                target_ids = [remorqueur_id for remorqueur_id in target_ids if remorqueur_id in online_ids]
+            # Large send: recipients are validated and written in batches by the delivery worker
+            delivery_job = new_delivery_job(
+                "remorqueur", new_message.id, message_data.garage_id, target_ids
             )
-            result = await db.execute(query)
-            valid_ids = [row[0] for row in result]
-            
+            db.add(delivery_job)
+            await db.flush()
+        elif target_ids:
+            # Verify that all remorqueurs belong to this garage
+            valid_ids = await garage_remorqueur_ids(message_data.garage_id, set(target_ids), db)
+
             # Check if any invalid IDs were provided
-            invalid_ids = set(message_data.remorqueur_ids) - set(valid_ids)
+            invalid_ids = set(target_ids) - valid_ids
             if invalid_ids:
                 raise HTTPException(
                     status_code=400,
                     detail=f"Remorqueurs with IDs {list(invalid_ids)} do not belong to this garage"
                 )
-            recipient_ids = valid_ids
+            if online_ids is not None:
+                valid_ids = {remorqueur_id for remorqueur_id in valid_ids if remorqueur_id in online_ids}
+            recipient_ids = sorted(valid_ids)
 
         # Insert recipients if we have any
         if recipient_ids:
@@ -323,16 +1140,25 @@ async def create_garage_message_logic(message_data: GarageMessageCreate, db: Asy
                 for remorqueur_id in recipient_ids
             ])
             await db.execute(query)
+            await db.execute(increment_unread_stmt("remorqueur", recipient_ids))
 
         await db.commit()
+        event = message_created_event("remorqueur", new_message)
+        if new_message.fanout_on_read:
+            unread_cache.invalidate("remorqueur")
+            await publish_event(BROADCAST_CHANNELS["remorqueur"], [message_data.garage_id], event)
+        elif recipient_ids:
+            unread_cache.invalidate("remorqueur", recipient_ids)
+            await publish_event("remorqueur", recipient_ids, event)
         return GarageMessageResponse(
             id=new_message.id,
             title=new_message.title,
             content=new_message.content,
             created_at=new_message.created_at,
             to_all=new_message.to_all,
-            remorqueur_ids=recipient_ids,
-            is_read=False
+            remorqueur_ids=None if new_message.fanout_on_read or delivery_job else recipient_ids,
+            is_read=False,
+            delivery_job_id=delivery_job.id if delivery_job else None
         )
 
     except Exception as e:
@@ -341,6 +1167,10 @@ async def create_garage_message_logic(message_data: GarageMessageCreate, db: Asy
 
 async def delete_admin_message_logic(message_id: int, db: AsyncSession):
     try:
+        # Take the messages off the unread and broadcast counters
+        for stmt in release_message_stmts("garage", [message_id]):
+            await db.execute(stmt)
+
         # First delete from recipients table
         delete_recipients = delete(admin_message_recipients).where(
             admin_message_recipients.c.message_id == message_id
@@ -357,6 +1187,7 @@ async def delete_admin_message_logic(message_id: int, db: AsyncSession):
             raise HTTPException(status_code=404, detail="Message not found")
 
         await db.commit()
+        unread_cache.invalidate("garage")
         return {"message": f"Admin message {message_id} deleted successfully"}
 
     except Exception as e:
@@ -367,6 +1198,10 @@ async def delete_admin_message_logic(message_id: int, db: AsyncSession):
 
 async def delete_garage_message_logic(message_id: int, db: AsyncSession):
     try:
+        # Take the messages off the unread and broadcast counters
+        for stmt in release_message_stmts("remorqueur", [message_id]):
+            await db.execute(stmt)
+
         # First delete from recipients table
         delete_recipients = delete(garage_message_recipients).where(
             garage_message_recipients.c.message_id == message_id
@@ -383,6 +1218,7 @@ async def delete_garage_message_logic(message_id: int, db: AsyncSession):
             raise HTTPException(status_code=404, detail="Message not found")
 
         await db.commit()
+        unread_cache.invalidate("remorqueur")
         return {"message": f"Garage message {message_id} deleted successfully"}
 
     except Exception as e:
@@ -393,6 +1229,10 @@ async def delete_garage_message_logic(message_id: int, db: AsyncSession):
 
 async def delete_multiple_admin_messages_logic(message_ids: List[int], db: AsyncSession):
     try:
+        # Take the messages off the unread and broadcast counters
+        for stmt in release_message_stmts("garage", message_ids):
+            await db.execute(stmt)
+
         # First delete from recipients table
         delete_recipients = delete(admin_message_recipients).where(
             admin_message_recipients.c.message_id.in_(message_ids)
@@ -409,6 +1249,7 @@ async def delete_multiple_admin_messages_logic(message_ids: List[int], db: Async
             raise HTTPException(status_code=404, detail="No messages found")
 
         await db.commit()
+        unread_cache.invalidate("garage")
         return {"message": f"Successfully deleted {result.rowcount} messages"}
 
     except Exception as e:
@@ -421,35 +1262,57 @@ async def mark_admin_message_as_read_logic(message_id: int, garage_id: int, db:
    
     try:
         # First verify that the message exists and the garage is a recipient
+        onclause, member, is_read = inbox_scope("garage", garage_id)
         verify_query = (
-            select(admin_message_recipients)
-            .where(
-                and_(
-                    admin_message_recipients.c.message_id == message_id,
-                    admin_message_recipients.c.garage_id == garage_id
-                )
-            )
+            select(AdminMessage.fanout_on_read, is_read.label("is_read"))
+            .outerjoin(admin_message_recipients, onclause)
+            .where(and_(AdminMessage.id == message_id, member))
         )
-        verify_result = await db.execute(verify_query)
-        if not verify_result.first():
+        message = (await db.execute(verify_query)).first()
+        if not message:
             raise HTTPException(
                 status_code=404,
                 detail="Message not found or garage is not a recipient"
             )
 
-        # Update the read status for this specific garage
-        update_stmt = (
-            update(admin_message_recipients)
-            .where(
-                and_(
-                    admin_message_recipients.c.message_id == message_id,
-                    admin_message_recipients.c.garage_id == garage_id
+        if message.is_read or read_receipts.is_pending("garage", message_id, garage_id):
+            # Already read: nothing to write
+            pass
+        elif read_receipts.add("garage", message_id, garage_id, message.fanout_on_read):
+            # Written behind with the next batch of receipts
+            await publish_event("garage", [garage_id], message_read_event("garage", message_id))
+        else:
+            # Buffer full: update the read status for this specific garage now
+            update_stmt = (
+                update(admin_message_recipients)
+                .where(
+                    and_(
+                        admin_message_recipients.c.message_id == message_id,
+                        admin_message_recipients.c.garage_id == garage_id,
+                        admin_message_recipients.c.is_read == False
+                    )
                 )
+                .values(is_read=True)
             )
-            .values(is_read=True)
-        )
-        await db.execute(update_stmt)
-        await db.commit()
+            if message.fanout_on_read:
+                # Broadcast: its receipt row is only created by the first read
+                receipt_stmt = (
+                    insert(admin_message_recipients)
+                    .prefix_with("IGNORE")
+                    .values(message_id=message_id, garage_id=garage_id, is_read=True)
+                )
+                result = await db.execute(receipt_stmt)
+                if result.rowcount:
+                    await db.execute(count_broadcast_read_stmt("garage", garage_id))
+            else:
+                result = await db.execute(update_stmt)
+                if result.rowcount:
+                    await db.execute(decrement_unread_stmt("garage", garage_id))
+            await db.commit()
+            unread_cache.invalidate("garage", [garage_id])
+            if result.rowcount:
+                # Other sessions of the same garage drop their unread marker
+                await publish_event("garage", [garage_id], message_read_event("garage", message_id))
 
         return {
             "message": "Message marked as read successfully",
@@ -471,35 +1334,56 @@ async def mark_garage_message_as_read_logic(message_id: int, remorqueur_id: int,
    
     try:
         # First verify that the message exists and the remorqueur is a recipient
+        onclause, member, is_read = inbox_scope("remorqueur", remorqueur_id)
         verify_query = (
-            select(garage_message_recipients)
-            .where(
-                and_(
-                    garage_message_recipients.c.message_id == message_id,
-                    garage_message_recipients.c.remorqueur_id == remorqueur_id
-                )
-            )
+            select(GarageMessage.fanout_on_read, is_read.label("is_read"))
+            .outerjoin(garage_message_recipients, onclause)
+            .where(and_(GarageMessage.id == message_id, member))
         )
-        verify_result = await db.execute(verify_query)
-        if not verify_result.first():
+        message = (await db.execute(verify_query)).first()
+        if not message:
             raise HTTPException(
                 status_code=404,
                 detail="Message not found or remorqueur is not a recipient"
             )
 
-        # Update the read status for this specific remorqueur
-        update_stmt = (
-            update(garage_message_recipients)
-            .where(
-                and_(
-                    garage_message_recipients.c.message_id == message_id,
-                    garage_message_recipients.c.remorqueur_id == remorqueur_id
+        if message.is_read or read_receipts.is_pending("remorqueur", message_id, remorqueur_id):
+            # Already read: nothing to write
+            pass
+        elif read_receipts.add("remorqueur", message_id, remorqueur_id, message.fanout_on_read):
+            # Written behind with the next batch of receipts
+            await publish_event("remorqueur", [remorqueur_id], message_read_event("remorqueur", message_id))
+        else:
+            # Buffer full: update the read status for this specific remorqueur now
+            update_stmt = (
+                update(garage_message_recipients)
+                .where(
+                    and_(
+                        garage_message_recipients.c.message_id == message_id,
+                        garage_message_recipients.c.remorqueur_id == remorqueur_id,
+                        garage_message_recipients.c.is_read == False
+                    )
                 )
+                .values(is_read=True)
             )
-            .values(is_read=True)
-        )
-        await db.execute(update_stmt)
-        await db.commit()
+            if message.fanout_on_read:
+                # Broadcast: its receipt row is only created by the first read
+                receipt_stmt = (
+                    insert(garage_message_recipients)
+                    .prefix_with("IGNORE")
+                    .values(message_id=message_id, remorqueur_id=remorqueur_id, is_read=True)
+                )
+                result = await db.execute(receipt_stmt)
+                if result.rowcount:
+                    await db.execute(count_broadcast_read_stmt("remorqueur", remorqueur_id))
+            else:
+                result = await db.execute(update_stmt)
+                if result.rowcount:
+                    await db.execute(decrement_unread_stmt("remorqueur", remorqueur_id))
+            await db.commit()
+            unread_cache.invalidate("remorqueur", [remorqueur_id])
+            if result.rowcount:
+                await publish_event("remorqueur", [remorqueur_id], message_read_event("remorqueur", message_id))
 
         return {
             "message": "Message marked as read successfully",
@@ -515,4 +1399,87 @@ async def mark_garage_message_as_read_logic(message_id: int, remorqueur_id: int,
         raise HTTPException(
             status_code=500,
             detail=f"Failed to mark garage message as read: {str(e)}"
-        )
\ No newline at end of file
+        )
+async def mark_messages_as_read_logic(
+    kind: str,
+    owner_id: int,
+    message_ids: Optional[List[int]],
+    up_to_cursor: Optional[str],
+    db: AsyncSession
+):
+    """
+    Mark many messages of one inbox as read with set-based statements: one
+    UPDATE of the unread recipient rows, one INSERT IGNORE ... SELECT of the
+    receipts of unread broadcasts, and the matching counter updates.
+    """
+    message_model, recipients_table, recipient_column = INBOXES[kind]
+    if message_ids is not None and len(message_ids) > BULK_READ_MAX_IDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {BULK_READ_MAX_IDS} message ids per request"
+        )
+    if message_ids is not None and not message_ids:
+        return {"updated": 0, "unread": await get_unread_count_logic(kind, owner_id, db)}
+
+    try:
+        if message_ids is not None:
+            selected = message_model.id.in_(message_ids)
+        elif up_to_cursor:
+            cursor_created_at, cursor_id = decode_cursor(up_to_cursor)
+            selected = or_(
+                message_model.created_at < cursor_created_at,
+                and_(
+                    message_model.created_at == cursor_created_at,
+                    message_model.id <= cursor_id
+                )
+            )
+        else:
+            selected = true()
+
+        recipient = recipients_table.c[recipient_column]
+        unread_rows = and_(recipient == owner_id, recipients_table.c.is_read == False)
+        if message_ids is not None:
+            unread_rows = and_(unread_rows, recipients_table.c.message_id.in_(message_ids))
+        elif up_to_cursor:
+            unread_rows = and_(unread_rows, recipients_table.c.message_id.in_(select(message_model.id).where(selected)))
+        update_stmt = update(recipients_table).where(unread_rows).values(is_read=True)
+        direct = (await db.execute(update_stmt)).rowcount or 0
+        if direct:
+            await db.execute(decrement_unread_stmt(kind, owner_id, direct))
+
+        # Broadcasts read for the first time get their receipt row
+        receipts_stmt = (
+            insert(recipients_table)
+            .prefix_with("IGNORE")
+            .from_select(
+                ["message_id", recipient_column, "is_read"],
+                select(message_model.id, literal(owner_id), literal(True))
+                .where(and_(broadcast_audience(kind, owner_id), selected))
+            )
+        )
+        broadcasts = (await db.execute(receipts_stmt)).rowcount or 0
+        if broadcasts:
+            reader_model = BROADCASTS[kind][3]
+            await db.execute(
+                update(reader_model)
+                .where(reader_model.id == owner_id)
+                .values(read_broadcast_count=reader_model.read_broadcast_count + broadcasts)
+            )
+
+        await db.commit()
+        unread_cache.invalidate(kind, [owner_id])
+        unread = await get_unread_count_logic(kind, owner_id, db)
+        if direct or broadcasts:
+            await publish_event(kind, [owner_id], messages_read_event(kind, message_ids, up_to_cursor, unread))
+
+        return {"updated": direct + broadcasts, "unread": unread}
+
+    except Exception as e:
+        await db.rollback()
+        if isinstance(e, HTTPException):
+            raise e
+        print(f"Error marking messages as read: {str(e)}")  # Log the error
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to mark messages as read: {str(e)}"
+        )
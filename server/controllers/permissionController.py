@@ -0,0 +1,107 @@
+import asyncio
+import sys
+from typing import Dict, Iterable, NamedTuple, Tuple, Union
+from sqlalchemy import select
+from server.models.authModel import Permission, Role, role_permission
+from server.settings import AsyncSession, PrimarySessionLocal
+
+# Roles and permissions almost never change; reload them in the background
+PERMISSION_REFRESH_SECONDS = 300
+
+
+class CompiledPermissions(NamedTuple):
+    bits: Dict[str, int]                       # permission name -> bit
+    masks_by_id: Dict[int, int]                # role id -> bitset
+    masks_by_name: Dict[str, int]              # role name -> bitset
+    role_ids: Dict[str, int]                   # role name -> role id
+    permissions_by_role: Dict[str, Tuple[Tuple[int, str], ...]]
+
+
+class PermissionRegistry:
+    """
+    The roles / permissions / role_permission tables compiled into one integer
+    bitset per role. Bit n is the permission with id n, so masks stay identical
+    across refreshes and uvicorn workers. A refresh builds a new snapshot and
+    swaps it in with a single assignment.
+    """
+
+    def __init__(self):
+        self._compiled = CompiledPermissions({}, {}, {}, {}, {})
+        self.loaded = False
+
+    async def refresh(self, db: AsyncSession):
+        roles = (await db.execute(select(Role.id, Role.name))).all()
+        permissions = (await db.execute(select(Permission.id, Permission.name))).all()
+        links = (await db.execute(
+            select(role_permission.c.role_id, role_permission.c.permission_id)
+        )).all()
+
+        bits = {sys.intern(name): 1 << perm_id for perm_id, name in permissions}
+        names = {perm_id: sys.intern(name) for perm_id, name in permissions}
+
+        masks_by_id = {role_id: 0 for role_id, _ in roles}
+        granted: Dict[int, list] = {role_id: [] for role_id, _ in roles}
+        for role_id, perm_id in links:
+            if role_id in masks_by_id and perm_id in names:
+                masks_by_id[role_id] |= 1 << perm_id
+                granted[role_id].append((perm_id, names[perm_id]))
+
+        role_ids = {sys.intern(name): role_id for role_id, name in roles}
+        self._compiled = CompiledPermissions(
+            bits=bits,
+            masks_by_id=masks_by_id,
+            masks_by_name={name: masks_by_id[role_id] for name, role_id in role_ids.items()},
+            role_ids=role_ids,
+            permissions_by_role={
+                name: tuple(sorted(granted[role_id])) for name, role_id in role_ids.items()
+            },
+        )
+        self.loaded = True
+
+    def allows(self, role: Union[int, str], permission: str) -> bool:
+        """Constant-time check of a role (by id or by name) against a permission name"""
+        compiled = self._compiled
+        masks = compiled.masks_by_id if isinstance(role, int) else compiled.masks_by_name
+        bit = compiled.bits.get(permission, 0)
+        return bit != 0 and masks.get(role, 0) & bit != 0
+
+    def role_id(self, role_name: str):
+        return self._compiled.role_ids.get(role_name)
+
+    def role_permissions(self, role_name: str) -> Tuple[Tuple[int, str], ...]:
+        """(id, name) pairs granted to a role, as used in tokens and role responses"""
+        return self._compiled.permissions_by_role.get(role_name, ())
+
+    async def refresh_periodically(self):
+        while True:
+            await asyncio.sleep(PERMISSION_REFRESH_SECONDS)
+            await load_permission_registry()
+
+
+permission_registry = PermissionRegistry()
+
+
+async def load_role_permissions(role_ids: Iterable[int], db: AsyncSession) -> Dict[int, Tuple[Tuple[int, str], ...]]:
+    """(id, name) permission pairs of a few roles straight from the DB, for when the registry is not loaded"""
+    granted: Dict[int, list] = {role_id: [] for role_id in role_ids}
+    if granted:
+        links = await db.execute(
+            select(role_permission.c.role_id, Permission.id, Permission.name)
+            .join(Permission, Permission.id == role_permission.c.permission_id)
+            .where(role_permission.c.role_id.in_(list(granted)))
+            .order_by(Permission.id)
+        )
+        for role_id, perm_id, name in links:
+            granted[role_id].append((perm_id, name))
+    return {role_id: tuple(perms) for role_id, perms in granted.items()}
+
+
+async def load_permission_registry() -> bool:
+    """(Re)compile the registry from the database; callers fall back to ORM checks on failure"""
+    try:
+        async with PrimarySessionLocal() as db:
+            await permission_registry.refresh(db)
+        return True
+    except Exception as e:
+        print(f"Error loading permission registry: {str(e)}")
+        return False
@@ -0,0 +1,161 @@
+import asyncio
+import re
+from typing import Dict, List, Optional, Set, Tuple
+from fastapi import HTTPException, status
+from sqlalchemy import select
+from server.controllers.rosterController import roster_cache
+from server.models.remorqueurModel import PhoneLookupMatch, PhoneLookupResponse, Remorqueur
+from server.settings import AsyncSession, PrimarySessionLocal
+
+# Numbers without a country code are North American (NANP)
+DEFAULT_COUNTRY_CODE = "1"
+
+# Picks up writes made by other workers; local writes update the index directly
+PHONE_INDEX_REFRESH_SECONDS = 300
+
+EXTENSION_PATTERN = re.compile(r"\s*(?:ext\.?|x|#).*$", re.IGNORECASE)
+
+
+def normalize_tel(raw: Optional[str]) -> Optional[str]:
+    """
+    Canonical E.164 form of a phone number ("+15145550123"), or None when it
+    cannot be one. Extensions are dropped; 10-digit numbers get the default
+    country code. Keep in step with the backfill of migration 009.
+    """
+    if not raw:
+        return None
+    number = EXTENSION_PATTERN.sub("", raw.strip())
+    digits = re.sub(r"\D", "", number)
+    if number.startswith("+"):
+        pass
+    elif digits.startswith("011"):
+        digits = digits[3:]
+    elif len(digits) == 10:
+        digits = DEFAULT_COUNTRY_CODE + digits
+    elif not (len(digits) == 11 and digits.startswith(DEFAULT_COUNTRY_CODE)):
+        return None
+    if not 8 <= len(digits) <= 15:
+        return None
+    return "+" + digits
+
+
+class PhoneIndex:
+    """
+    Normalized number -> remorqueurs, mirroring remorqueurs.tel_normalized.
+    Rebuilt from the DB at startup and every PHONE_INDEX_REFRESH_SECONDS and
+    swapped in with a single assignment; local writes patch it in place.
+    """
+
+    def __init__(self):
+        self._by_tel: Dict[str, Set[int]] = {}
+        self._entries: Dict[int, Tuple[str, int]] = {}  # remorqueur id -> (number, garage id)
+        self.loaded = False
+        self.hits = 0
+        self.misses = 0
+
+    async def refresh(self, db: AsyncSession):
+        rows = await db.execute(
+            select(Remorqueur.id, Remorqueur.garage_id, Remorqueur.tel_normalized)
+            .where(Remorqueur.tel_normalized.isnot(None))
+        )
+        by_tel: Dict[str, Set[int]] = {}
+        entries: Dict[int, Tuple[str, int]] = {}
+        for remorqueur_id, garage_id, number in rows:
+            by_tel.setdefault(number, set()).add(remorqueur_id)
+            entries[remorqueur_id] = (number, garage_id)
+        self._by_tel, self._entries = by_tel, entries
+        self.loaded = True
+
+    def set(self, remorqueur_id: int, garage_id: int, number: Optional[str]):
+        self.remove(remorqueur_id)
+        if number is None:
+            return
+        self._by_tel.setdefault(number, set()).add(remorqueur_id)
+        self._entries[remorqueur_id] = (number, garage_id)
+
+    def remove(self, remorqueur_id: int):
+        entry = self._entries.pop(remorqueur_id, None)
+        if entry is None:
+            return
+        ids = self._by_tel.get(entry[0])
+        if ids is not None:
+            ids.discard(remorqueur_id)
+            if not ids:
+                del self._by_tel[entry[0]]
+
+    def lookup(self, number: str) -> List[Tuple[int, int]]:
+        """(remorqueur id, garage id) pairs registered under a normalized number"""
+        return [(remorqueur_id, self._entries[remorqueur_id][1]) for remorqueur_id in self._by_tel.get(number, ())]
+
+    async def refresh_periodically(self):
+        while True:
+            await asyncio.sleep(PHONE_INDEX_REFRESH_SECONDS)
+            await load_phone_index()
+
+    def stats(self) -> dict:
+        return {
+            "loaded": self.loaded,
+            "numbers": len(self._by_tel),
+            "remorqueurs": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+phone_index = PhoneIndex()
+
+
+async def load_phone_index() -> bool:
+    try:
+        async with PrimarySessionLocal() as db:
+            await phone_index.refresh(db)
+        return True
+    except Exception as e:
+        print(f"Error loading phone index: {str(e)}")
+        return False
+
+
+async def _resolve_matches(candidates: List[Tuple[int, int]], number: str, db: AsyncSession) -> List[PhoneLookupMatch]:
+    """Name the candidates from the cached rosters, dropping any whose number changed since indexing"""
+    matches = []
+    for remorqueur_id, garage_id in candidates:
+        roster = await roster_cache.get(garage_id, db)
+        member = roster.members_by_id.get(remorqueur_id) if roster is not None else None
+        if member is None or normalize_tel(member.tel) != number:
+            continue
+        matches.append(PhoneLookupMatch(
+            remorqueur_id=member.id,
+            name=member.name,
+            tel=member.tel,
+            is_active=member.is_active,
+            garage_id=roster.garage_id,
+            garage_name=roster.garage_name,
+        ))
+    return matches
+
+
+async def lookup_remorqueurs_by_tel_logic(tel: str, db: AsyncSession) -> PhoneLookupResponse:
+    """
+    Caller ID -> driver and garage: a hash lookup in the phone index, named
+    from the roster cache. A miss (or a stale entry) falls back to the
+    indexed tel_normalized column and patches the index.
+    """
+    number = normalize_tel(tel)
+    if number is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid phone number")
+
+    matches = await _resolve_matches(phone_index.lookup(number), number, db)
+    if matches:
+        phone_index.hits += 1
+    else:
+        phone_index.misses += 1
+        rows = (await db.execute(
+            select(Remorqueur.id, Remorqueur.garage_id).where(Remorqueur.tel_normalized == number)
+        )).all()
+        for remorqueur_id, garage_id in rows:
+            phone_index.set(remorqueur_id, garage_id, number)
+        matches = await _resolve_matches([tuple(row) for row in rows], number, db)
+
+    if not matches:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No remorqueur with this phone number")
+    return PhoneLookupResponse(tel=number, matches=matches)
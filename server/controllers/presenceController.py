@@ -0,0 +1,225 @@
+import asyncio
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Set, Tuple
+import pytz
+from fastapi import HTTPException, status
+from sqlalchemy import and_, case, or_, select, update
+from server.models.authModel import AuthPrincipal
+from server.models.remorqueurModel import Remorqueur
+from server.settings import WEB_CONCURRENCY, AsyncSession, PrimarySessionLocal, get_redis_client
+
+# Driver apps beat every 30 s; three missed beats and the driver is offline
+PRESENCE_TTL_SECONDS = 90
+PRESENCE_SWEEP_SECONDS = 15
+
+EASTERN_TZ = pytz.timezone("America/New_York")
+
+# Atomically take the stale members of one garage, so a single worker
+# sees (and persists) each offline transition
+EXPIRE_PRESENCE_SCRIPT = """
+local stale = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'WITHSCORES')
+if #stale > 0 then
+    redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+end
+return stale
+"""
+
+
+class MemoryPresenceBackend:
+    """
+    Last heartbeat per remorqueur, per garage, local to this worker: single
+    worker deployments only. With several workers each sees a fraction of
+    the beats, so drivers flap offline/online (a DB write per beat) and
+    online counts depend on the worker answering; set REDIS_URL.
+    """
+
+    def __init__(self):
+        self._last_seen: Dict[int, Dict[int, float]] = defaultdict(dict)
+
+    async def beat(self, garage_id: int, remorqueur_id: int, now: float) -> bool:
+        """Record a heartbeat; True when the driver was offline until now"""
+        previous = self._last_seen[garage_id].get(remorqueur_id)
+        self._last_seen[garage_id][remorqueur_id] = now
+        return previous is None or previous < now - PRESENCE_TTL_SECONDS
+
+    async def online_ids(self, garage_id: int, now: float) -> Set[int]:
+        cutoff = now - PRESENCE_TTL_SECONDS
+        return {
+            remorqueur_id for remorqueur_id, last_seen in self._last_seen.get(garage_id, {}).items()
+            if last_seen >= cutoff
+        }
+
+    async def expire(self, now: float) -> List[Tuple[int, float]]:
+        """Drop and return (remorqueur_id, last_seen) of the drivers gone offline"""
+        cutoff = now - PRESENCE_TTL_SECONDS
+        gone = []
+        for garage_id in list(self._last_seen):
+            members = self._last_seen[garage_id]
+            for remorqueur_id, last_seen in list(members.items()):
+                if last_seen < cutoff:
+                    del members[remorqueur_id]
+                    gone.append((remorqueur_id, last_seen))
+            if not members:
+                del self._last_seen[garage_id]
+        return gone
+
+    async def remove(self, garage_id: int, remorqueur_ids: Iterable[int]):
+        members = self._last_seen.get(garage_id)
+        if members is None:
+            return
+        for remorqueur_id in remorqueur_ids:
+            members.pop(remorqueur_id, None)
+
+
+class RedisPresenceBackend:
+    """
+    One sorted set per garage (presence:<garage id>, score = last heartbeat),
+    shared by every uvicorn worker, plus the set of garages to sweep.
+    """
+
+    def __init__(self, redis):
+        self._redis = redis
+
+    async def beat(self, garage_id: int, remorqueur_id: int, now: float) -> bool:
+        key = f"presence:{garage_id}"
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.zscore(key, remorqueur_id)
+            pipe.zadd(key, {remorqueur_id: now})
+            pipe.sadd("presence:garages", garage_id)
+            previous, _, _ = await pipe.execute()
+        return previous is None or float(previous) < now - PRESENCE_TTL_SECONDS
+
+    async def online_ids(self, garage_id: int, now: float) -> Set[int]:
+        members = await self._redis.zrangebyscore(f"presence:{garage_id}", now - PRESENCE_TTL_SECONDS, "+inf")
+        return {int(member) for member in members}
+
+    async def expire(self, now: float) -> List[Tuple[int, float]]:
+        gone = []
+        for garage_id in await self._redis.smembers("presence:garages"):
+            key = f"presence:{garage_id}"
+            stale = await self._redis.eval(EXPIRE_PRESENCE_SCRIPT, 1, key, now - PRESENCE_TTL_SECONDS)
+            gone.extend((int(stale[i]), float(stale[i + 1])) for i in range(0, len(stale), 2))
+            if not await self._redis.zcard(key):
+                await self._redis.srem("presence:garages", garage_id)
+        return gone
+
+    async def remove(self, garage_id: int, remorqueur_ids: Iterable[int]):
+        remorqueur_ids = list(remorqueur_ids)
+        if remorqueur_ids:
+            await self._redis.zrem(f"presence:{garage_id}", *remorqueur_ids)
+
+
+_presence_backend = None
+
+def get_presence_backend():
+    global _presence_backend
+    if _presence_backend is None:
+        redis = get_redis_client()
+        _presence_backend = RedisPresenceBackend(redis) if redis is not None else MemoryPresenceBackend()
+    return _presence_backend
+
+def set_presence_backend(backend):
+    """Plug in another backend (beat / online_ids / expire / remove like MemoryPresenceBackend)"""
+    global _presence_backend
+    _presence_backend = backend
+
+
+async def heartbeat_logic(principal: AuthPrincipal, db: AsyncSession) -> dict:
+    """
+    Mark a driver online for PRESENCE_TTL_SECONDS. Only the offline -> online
+    transition is written to remorqueurs; steady heartbeats stay in memory.
+    """
+    if principal.role != 'remorqueur':
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only remorqueurs send heartbeats"
+        )
+
+    garage_id = principal.garage_id
+    if garage_id is None:
+        garage_id = (await db.execute(
+            select(Remorqueur.garage_id).where(Remorqueur.id == principal.id)
+        )).scalar_one_or_none()
+        if garage_id is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Remorqueur not found")
+
+    now = time.time()
+    came_online = await get_presence_backend().beat(garage_id, principal.id, now)
+    if came_online:
+        try:
+            await db.execute(
+                update(Remorqueur)
+                .where(Remorqueur.id == principal.id)
+                .values(is_online=True, last_seen_at=datetime.fromtimestamp(now, EASTERN_TZ))
+            )
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            print(f"Error persisting presence: {str(e)}")
+    return {"online": True, "expires_in": PRESENCE_TTL_SECONDS}
+
+
+async def get_online_remorqueur_ids(garage_id: int) -> Set[int]:
+    """Drivers of a garage with a heartbeat in the last PRESENCE_TTL_SECONDS (empty if presence is unavailable)"""
+    try:
+        return await get_presence_backend().online_ids(garage_id, time.time())
+    except Exception as e:
+        print(f"Error reading presence: {str(e)}")
+        return set()
+
+
+async def forget_presence(garage_id: int, remorqueur_ids: List[int]):
+    """Deactivated or deleted drivers go offline at once (callers clear is_online themselves)"""
+    try:
+        await get_presence_backend().remove(garage_id, remorqueur_ids)
+    except Exception as e:
+        print(f"Error clearing presence: {str(e)}")
+
+
+async def expire_presence() -> int:
+    """
+    Persist the online -> offline transitions of drivers whose heartbeats
+    stopped. A driver whose beat came back after the sweep took it has a
+    newer last_seen_at in the DB and is left online.
+    """
+    gone = await get_presence_backend().expire(time.time())
+    if not gone:
+        return 0
+    last_seen = {
+        remorqueur_id: datetime.fromtimestamp(seen, EASTERN_TZ)
+        for remorqueur_id, seen in gone
+    }
+    async with PrimarySessionLocal() as db:
+        try:
+            await db.execute(
+                update(Remorqueur)
+                .where(and_(
+                    Remorqueur.id.in_(list(last_seen)),
+                    or_(
+                        Remorqueur.last_seen_at.is_(None),
+                        Remorqueur.last_seen_at <= case(last_seen, value=Remorqueur.id),
+                    ),
+                ))
+                .values(
+                    is_online=False,
+                    last_seen_at=case(last_seen, value=Remorqueur.id, else_=Remorqueur.last_seen_at)
+                )
+            )
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+    return len(gone)
+
+
+async def expire_presence_periodically():
+    if get_redis_client() is None and WEB_CONCURRENCY > 1:
+        print(f"Warning: REDIS_URL is not set, presence is tracked separately by each of the {WEB_CONCURRENCY} workers")
+    while True:
+        await asyncio.sleep(PRESENCE_SWEEP_SECONDS)
+        try:
+            await expire_presence()
+        except Exception as e:
+            print(f"Error expiring presence: {str(e)}")
@@ -0,0 +1,151 @@
+import asyncio
+import json
+from typing import Dict, Iterable, Optional, Sequence, Set
+from server.settings import get_redis_client
+
+# Events buffered per connection before it is considered too slow and told to resync
+SUBSCRIBER_QUEUE_SIZE = 256
+
+REDIS_CHANNEL_PREFIX = "realtime:"
+
+
+def inbox_channel(kind: str, owner_id: int) -> str:
+    """
+    Channel of one inbox: "garage" receives admin messages, "remorqueur" garage
+    messages. Broadcasts go to the audience channel instead: "admin_broadcast"
+    (per admin) or "garage_broadcast" (per garage).
+    """
+    return f"{kind}:{owner_id}"
+
+
+class Subscription:
+    """One connected client listening on one or more channels"""
+
+    def __init__(self, channels: Sequence[str]):
+        self.channels = tuple(channels)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.overflowed = False
+
+    def deliver(self, event: dict):
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Drop the backlog and wake the reader: it resumes from its cursor instead
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+
+class MemoryPubSub:
+    """Fan-out to connections of this worker only (single worker deployments)"""
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+
+    def _dispatch(self, channel: str, event: dict):
+        for subscription in list(self._subscribers.get(channel, ())):
+            subscription.deliver(event)
+
+    async def publish(self, channels: Iterable[str], event: dict):
+        for channel in channels:
+            self._dispatch(channel, event)
+
+    async def subscribe(self, channels: Sequence[str], subscription: Optional[Subscription] = None) -> Subscription:
+        """Pass a Subscription subclass to consume events in deliver() instead of a queue"""
+        if subscription is None:
+            subscription = Subscription(channels)
+        for channel in subscription.channels:
+            self._subscribers.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    async def unsubscribe(self, subscription: Subscription):
+        for channel in subscription.channels:
+            subscribers = self._subscribers.get(channel)
+            if subscribers is None:
+                continue
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[channel]
+
+    def connection_count(self) -> int:
+        return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+
+class RedisPubSub(MemoryPubSub):
+    """
+    Redis PUBLISH/SUBSCRIBE between uvicorn workers. Each worker holds one
+    Redis subscription per channel that has at least one local connection,
+    and fans the events out to those connections itself.
+    """
+
+    def __init__(self, redis):
+        super().__init__()
+        self._redis = redis
+        self._pubsub = redis.pubsub()
+        self._listener: Optional[asyncio.Task] = None
+
+    async def publish(self, channels: Iterable[str], event: dict):
+        payload = json.dumps(event)
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for channel in channels:
+                pipe.publish(REDIS_CHANNEL_PREFIX + channel, payload)
+            await pipe.execute()
+
+    async def subscribe(self, channels: Sequence[str], subscription: Optional[Subscription] = None) -> Subscription:
+        new_channels = [channel for channel in channels if channel not in self._subscribers]
+        subscription = await super().subscribe(channels, subscription)
+        if new_channels:
+            await self._pubsub.subscribe(*[REDIS_CHANNEL_PREFIX + channel for channel in new_channels])
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+        return subscription
+
+    async def unsubscribe(self, subscription: Subscription):
+        await super().unsubscribe(subscription)
+        unused = [channel for channel in subscription.channels if channel not in self._subscribers]
+        if unused:
+            await self._pubsub.unsubscribe(*[REDIS_CHANNEL_PREFIX + channel for channel in unused])
+
+    async def _listen(self):
+        while True:
+            try:
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Realtime Redis listener error: {str(e)}")
+                await asyncio.sleep(1)
+                continue
+            if message is None or message.get("type") != "message":
+                continue
+            channel = message["channel"][len(REDIS_CHANNEL_PREFIX):]
+            self._dispatch(channel, json.loads(message["data"]))
+
+
+_pubsub = None
+
+def get_pubsub():
+    global _pubsub
+    if _pubsub is None:
+        redis = get_redis_client()
+        _pubsub = RedisPubSub(redis) if redis is not None else MemoryPubSub()
+    return _pubsub
+
+def set_pubsub(backend):
+    """Plug in another backend (publish / subscribe / unsubscribe like MemoryPubSub)"""
+    global _pubsub
+    _pubsub = backend
+
+
+async def publish_event(kind: str, owner_ids: Iterable[int], event: dict):
+    """Push an event to the given inboxes; a failed push never fails the write behind it"""
+    channels = [inbox_channel(kind, owner_id) for owner_id in owner_ids]
+    if not channels:
+        return
+    try:
+        await get_pubsub().publish(channels, event)
+    except Exception as e:
+        print(f"Error publishing realtime event: {str(e)}")
@@ -1,13 +1,57 @@
+import csv
+import io
+import json
+from typing import List
 from fastapi import HTTPException, Request
-from sqlalchemy import select
+from pydantic import ValidationError
+from sqlalchemy import and_, delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session, joinedload
-from server.models.remorqueurModel import Remorqueur, CreateRemorqueurRequest, UpdateRemorqueurRequest
-from server.models.authModel import PermissionResponse, Role, RoleResponse
+from server.models.remorqueurModel import (
+    BulkCreateRemorqueursResponse,
+    BulkRemorqueurActionResponse,
+    BulkRemorqueurActionResult,
+    BulkRemorqueurResult,
+    BulkRemorqueurRow,
+    CreateRemorqueurRequest,
+    Remorqueur,
+    UpdateRemorqueurRequest,
+)
+from server.models.authModel import AuthPrincipal, PermissionResponse, Role, RoleResponse, garage_message_recipients
 from server.models.garageModel import Garage
-from server.controllers.authController import argon2_strong_hash, has_permission, authenticate_user
+from server.controllers.throttleController import run_bulk_hash, run_hash_operation
+from server.controllers.authController import (
+    argon2_hash_many,
+    argon2_strong_hash,
+    argon2_time_cost,
+    authenticate_user,
+    duplicate_key,
+    has_permission,
+)
+from server.controllers.locationController import forget_positions
+from server.controllers.messagesController import broadcast_join_values
+from server.controllers.permissionController import permission_registry
+from server.controllers.phoneController import normalize_tel, phone_index
+from server.controllers.presenceController import forget_presence
+from server.controllers.rosterController import roster_cache
+from server.controllers.tokenController import token_store
 from server.models.reponseModel import RemorqueurResponse
 from server.settings import AsyncSession
 
+async def commit_remorqueur(db: AsyncSession, failure: str):
+    """Commit a remorqueur write, turning a username collision into the usual 400"""
+    try:
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        if duplicate_key(e) == "username":
+            raise HTTPException(
+                status_code=400,
+                detail="Username already taken"
+            )
+        print(f"Error occurred: {str(e)}")
+        raise HTTPException(status_code=500, detail=failure)
+
 async def create_remorqueur(
     request: Request,
     db: AsyncSession,
@@ -47,16 +91,6 @@ async def create_remorqueur(
             detail="You can only create remorqueurs for your own garage"
         )
 
-    # Check if username already exists
-    result = await db.execute(
-        select(Remorqueur).where(Remorqueur.username == remorqueur_data.username)
-    )
-    if result.scalar_one_or_none():
-        raise HTTPException(
-            status_code=400,
-            detail="Username already taken"
-        )
-    
     # Get role by name
     result = await db.execute(
         select(Role).where(Role.name == remorqueur_data.role_name)
@@ -77,21 +111,27 @@ async def create_remorqueur(
         )
     
     # Hash the password
-    hashed_password = argon2_strong_hash(remorqueur_data.password)
+    hashed_password = await run_hash_operation(argon2_strong_hash, remorqueur_data.password)
     
-    # Create new remorqueur
+    # Create new remorqueur; the garage's earlier broadcasts are not its own
+    join_values = await broadcast_join_values("remorqueur", garage.id, db)
     new_remorqueur = Remorqueur(
         name=remorqueur_data.name,
         tel=remorqueur_data.tel,
+        tel_normalized=normalize_tel(remorqueur_data.tel),
         username=remorqueur_data.username,
         password=hashed_password,
         role_id=role.id,
         garage_id=garage.id,
+        **join_values
     )
     
+    # The unique index on username rejects duplicates, including concurrent ones
     db.add(new_remorqueur)
-    await db.commit()
+    await commit_remorqueur(db, "Failed to create remorqueur")
     await db.refresh(new_remorqueur)
+    await roster_cache.invalidate(garage.id)
+    phone_index.set(new_remorqueur.id, garage.id, new_remorqueur.tel_normalized)
     
     # Load relationships
     result = await db.execute(
@@ -165,31 +205,33 @@ async def update_remorqueur(
                 detail="You can only update remorqueurs from your own garage"
             )
 
-    if update_data.username:
-        result = await db.execute(
-            select(Remorqueur)
-            .where(Remorqueur.username == update_data.username)
-            .where(Remorqueur.id != remorqueur_id)
-        )
-        if result.scalar_one_or_none():
-            raise HTTPException(
-                status_code=400,
-                detail="Username already taken"
-            )
+    # Deactivation or a new password must end the driver's current sessions
+    revoke_sessions = bool(update_data.password) or update_data.is_active is False
 
     if update_data.name:
         remorqueur.name = update_data.name
     if update_data.tel:
         remorqueur.tel = update_data.tel
+        remorqueur.tel_normalized = normalize_tel(update_data.tel)
     if update_data.username:
         remorqueur.username = update_data.username
     if update_data.password:
-        remorqueur.password = argon2_strong_hash(update_data.password)
+        remorqueur.password = await run_hash_operation(argon2_strong_hash, update_data.password)
     if update_data.is_active is not None: 
         remorqueur.is_active = update_data.is_active
+        if update_data.is_active is False:
+            remorqueur.is_online = False
 
-    await db.commit()
+    await commit_remorqueur(db, "Failed to update remorqueur")
     await db.refresh(remorqueur)
+    await roster_cache.invalidate(remorqueur.garage_id)
+    phone_index.set(remorqueur.id, remorqueur.garage_id, remorqueur.tel_normalized)
+
+    if revoke_sessions:
+        await token_store.revoke_subject("remorqueur", remorqueur.id)
+    if update_data.is_active is False:
+        await forget_positions([remorqueur.id])
+        await forget_presence(remorqueur.garage_id, [remorqueur.id])
 
     result = await db.execute(
         select(Remorqueur)
@@ -271,8 +313,332 @@ async def delete_remorqueur(
     
     # Commit the changes to the database
     await db.commit()
+    await roster_cache.invalidate(remorqueur.garage_id)
+
+    # Outstanding access and refresh tokens die with the account
+    await token_store.revoke_subject("remorqueur", remorqueur_id)
+    await forget_positions([remorqueur_id])
+    await forget_presence(remorqueur.garage_id, [remorqueur_id])
+    phone_index.remove(remorqueur_id)
 
     return {
         "message": "Remorqueur successfully deleted",
         "remorqueur_id": remorqueur_id
-    }
\ No newline at end of file
+    }
+
+
+# Bulk onboarding: rows accepted per request, passwords per hashing task
+# and rows per INSERT statement
+BULK_REMORQUEUR_MAX_ROWS = 1000
+BULK_HASH_CHUNK_SIZE = 10
+BULK_INSERT_BATCH_SIZE = 200
+
+async def read_bulk_remorqueur_rows(request: Request) -> list:
+    """
+    Rows of a bulk onboarding request: text/csv with a header line
+    (name,tel,username,password), or JSON, either a list of objects or
+    {"remorqueurs": [...]}.
+    """
+    body = await request.body()
+    if "csv" in request.headers.get("content-type", ""):
+        try:
+            return list(csv.DictReader(io.StringIO(body.decode("utf-8-sig"))))
+        except (UnicodeDecodeError, csv.Error) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid CSV: {str(e)}")
+
+    try:
+        data = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON body")
+    if isinstance(data, dict):
+        data = data.get("remorqueurs")
+    if not isinstance(data, list):
+        raise HTTPException(status_code=400, detail="Expected a list of remorqueurs")
+    return data
+
+async def bulk_create_remorqueurs(
+    principal: AuthPrincipal,
+    rows: list,
+    db: AsyncSession,
+) -> BulkCreateRemorqueursResponse:
+    """
+    Create many remorqueurs for the caller's garage. Rows are validated
+    together (one query for taken usernames), passwords are hashed in
+    parallel on the bulk process pool, and the valid rows are inserted in
+    batches within one transaction. Invalid rows are reported, not fatal.
+    """
+    if principal.role != 'garage':
+        raise HTTPException(
+            status_code=403,
+            detail="Not authorized to create remorqueurs"
+        )
+    if not rows:
+        raise HTTPException(status_code=400, detail="No remorqueurs to create")
+    if len(rows) > BULK_REMORQUEUR_MAX_ROWS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {BULK_REMORQUEUR_MAX_ROWS} remorqueurs per request"
+        )
+
+    garage_id = (await db.execute(
+        select(Garage.id).where(Garage.id == principal.id)
+    )).scalar_one_or_none()
+    if garage_id is None:
+        raise HTTPException(status_code=404, detail="Garage not found")
+
+    role_id = permission_registry.role_id('remorqueur')
+    if role_id is None:
+        role_id = (await db.execute(
+            select(Role.id).where(Role.name == 'remorqueur')
+        )).scalar_one_or_none()
+    if role_id is None:
+        raise HTTPException(status_code=400, detail="Role remorqueur not found")
+
+    # Row numbers are 1-based positions in the request
+    results: List[BulkRemorqueurResult] = []
+    candidates = []
+    seen = set()
+    for number, raw in enumerate(rows, start=1):
+        username = raw.get("username") if isinstance(raw, dict) else None
+        try:
+            row = BulkRemorqueurRow.model_validate(raw)
+        except ValidationError as e:
+            error = e.errors()[0]
+            field = ".".join(str(part) for part in error["loc"])
+            results.append(BulkRemorqueurResult(
+                row=number, username=username, status="error",
+                error=f"{field}: {error['msg']}" if field else error["msg"]
+            ))
+            continue
+
+        row.username = row.username.strip()
+        if not (row.name.strip() and row.tel.strip() and row.username and row.password):
+            error = "name, tel, username and password are required"
+        elif row.username.lower() in seen:
+            error = "Duplicate username in request"
+        else:
+            error = None
+            seen.add(row.username.lower())
+            candidates.append((number, row))
+        if error:
+            results.append(BulkRemorqueurResult(row=number, username=row.username, status="error", error=error))
+
+    if candidates:
+        taken = {
+            username.lower() for username in (await db.execute(
+                select(Remorqueur.username)
+                .where(Remorqueur.username.in_([row.username for _, row in candidates]))
+            )).scalars()
+        }
+        accepted = []
+        for number, row in candidates:
+            if row.username.lower() in taken:
+                results.append(BulkRemorqueurResult(
+                    row=number, username=row.username, status="error", error="Username already taken"
+                ))
+            else:
+                accepted.append((number, row))
+        candidates = accepted
+
+    if candidates:
+        passwords = [row.password for _, row in candidates]
+        hashes = await run_bulk_hash(
+            argon2_hash_many,
+            [passwords[i:i + BULK_HASH_CHUNK_SIZE] for i in range(0, len(passwords), BULK_HASH_CHUNK_SIZE)],
+            argon2_time_cost()
+        )
+
+        ids = {}
+        try:
+            join_values = await broadcast_join_values("remorqueur", garage_id, db)
+            for start in range(0, len(candidates), BULK_INSERT_BATCH_SIZE):
+                batch = candidates[start:start + BULK_INSERT_BATCH_SIZE]
+                await db.execute(insert(Remorqueur).values([
+                    {
+                        "name": row.name.strip(),
+                        "tel": row.tel.strip(),
+                        "tel_normalized": normalize_tel(row.tel),
+                        "username": row.username,
+                        "password": hashes[start + offset],
+                        "role_id": role_id,
+                        "garage_id": garage_id,
+                        "is_active": True,
+                        **join_values,
+                    }
+                    for offset, (_, row) in enumerate(batch)
+                ]))
+                ids.update(
+                    (username.lower(), remorqueur_id) for remorqueur_id, username in (await db.execute(
+                        select(Remorqueur.id, Remorqueur.username)
+                        .where(Remorqueur.username.in_([row.username for _, row in batch]))
+                    )).all()
+                )
+            await db.commit()
+            await roster_cache.invalidate(garage_id)
+            for _, row in candidates:
+                if row.username.lower() in ids:
+                    phone_index.set(ids[row.username.lower()], garage_id, normalize_tel(row.tel))
+        except IntegrityError as e:
+            await db.rollback()
+            if duplicate_key(e) != "username":
+                print(f"Error occurred: {str(e)}")
+                raise HTTPException(status_code=500, detail="Failed to create remorqueurs")
+            # A username was registered between the check and the insert
+            raise HTTPException(
+                status_code=400,
+                detail="Username already taken (created concurrently); nothing was imported, please retry"
+            )
+        except Exception as e:
+            await db.rollback()
+            print(f"Error occurred: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Failed to create remorqueurs: {str(e)}")
+
+        results.extend(
+            BulkRemorqueurResult(row=number, username=row.username, status="created", id=ids.get(row.username.lower()))
+            for number, row in candidates
+        )
+
+    results.sort(key=lambda result: result.row)
+    created = sum(1 for result in results if result.status == "created")
+    return BulkCreateRemorqueursResponse(created=created, failed=len(results) - created, results=results)
+
+
+async def _lock_garage_remorqueurs(principal: AuthPrincipal, remorqueur_ids: List[int], db: AsyncSession) -> dict:
+    """
+    Lock the requested remorqueurs that belong to the caller's garage and
+    return {id: is_active}. Ids of other garages are treated as missing.
+    """
+    if principal.role != 'garage':
+        raise HTTPException(
+            status_code=403,
+            detail="Only garages can manage their remorqueurs"
+        )
+    if not remorqueur_ids:
+        raise HTTPException(status_code=400, detail="No remorqueur ids given")
+    if len(remorqueur_ids) > BULK_REMORQUEUR_MAX_ROWS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {BULK_REMORQUEUR_MAX_ROWS} remorqueurs per request"
+        )
+
+    rows = await db.execute(
+        select(Remorqueur.id, Remorqueur.is_active)
+        .where(
+            and_(
+                Remorqueur.id.in_(set(remorqueur_ids)),
+                Remorqueur.garage_id == principal.id
+            )
+        )
+        .with_for_update()
+    )
+    return dict(rows.all())
+
+async def bulk_set_remorqueurs_active(
+    principal: AuthPrincipal,
+    remorqueur_ids: List[int],
+    is_active: bool,
+    db: AsyncSession,
+) -> BulkRemorqueurActionResponse:
+    """Activate or deactivate many of the caller's remorqueurs with one UPDATE"""
+    try:
+        owned = await _lock_garage_remorqueurs(principal, remorqueur_ids, db)
+        changed = [remorqueur_id for remorqueur_id, active in owned.items() if active != is_active]
+        if changed:
+            values = {"is_active": is_active}
+            if not is_active:
+                # Deactivated drivers are off shift as well
+                values["is_online"] = False
+            await db.execute(
+                update(Remorqueur)
+                .where(
+                    and_(
+                        Remorqueur.id.in_(changed),
+                        Remorqueur.garage_id == principal.id
+                    )
+                )
+                .values(values)
+            )
+        await db.commit()
+    except HTTPException:
+        await db.rollback()
+        raise
+    except Exception as e:
+        await db.rollback()
+        print(f"Error occurred: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to update remorqueurs: {str(e)}")
+
+    if changed:
+        await roster_cache.invalidate(principal.id)
+        if not is_active:
+            # Deactivated drivers lose their current sessions
+            for remorqueur_id in changed:
+                await token_store.revoke_subject("remorqueur", remorqueur_id)
+            await forget_positions(changed)
+            await forget_presence(principal.id, changed)
+
+    changed_ids = set(changed)
+    return BulkRemorqueurActionResponse(
+        affected=len(changed),
+        results=[
+            BulkRemorqueurActionResult(
+                id=remorqueur_id,
+                status="updated" if remorqueur_id in changed_ids
+                else "unchanged" if remorqueur_id in owned
+                else "not_found"
+            )
+            for remorqueur_id in dict.fromkeys(remorqueur_ids)
+        ]
+    )
+
+async def bulk_delete_remorqueurs(
+    principal: AuthPrincipal,
+    remorqueur_ids: List[int],
+    db: AsyncSession,
+) -> BulkRemorqueurActionResponse:
+    """Hard-delete many of the caller's remorqueurs, with their message receipts, in one transaction"""
+    try:
+        owned = list(await _lock_garage_remorqueurs(principal, remorqueur_ids, db))
+        if owned:
+            await db.execute(
+                delete(garage_message_recipients)
+                .where(garage_message_recipients.c.remorqueur_id.in_(owned))
+            )
+            await db.execute(
+                delete(Remorqueur)
+                .where(
+                    and_(
+                        Remorqueur.id.in_(owned),
+                        Remorqueur.garage_id == principal.id
+                    )
+                )
+            )
+        await db.commit()
+    except HTTPException:
+        await db.rollback()
+        raise
+    except Exception as e:
+        await db.rollback()
+        print(f"Error occurred: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to delete remorqueurs: {str(e)}")
+
+    if owned:
+        await roster_cache.invalidate(principal.id)
+        # Outstanding access and refresh tokens die with the accounts
+        for remorqueur_id in owned:
+            await token_store.revoke_subject("remorqueur", remorqueur_id)
+        await forget_positions(owned)
+        await forget_presence(principal.id, owned)
+        for remorqueur_id in owned:
+            phone_index.remove(remorqueur_id)
+
+    deleted = set(owned)
+    return BulkRemorqueurActionResponse(
+        affected=len(deleted),
+        results=[
+            BulkRemorqueurActionResult(
+                id=remorqueur_id,
+                status="deleted" if remorqueur_id in deleted else "not_found"
+            )
+            for remorqueur_id in dict.fromkeys(remorqueur_ids)
+        ]
+    )
@@ -0,0 +1,133 @@
+import time
+from typing import Dict, FrozenSet, NamedTuple, Optional, Tuple
+from sqlalchemy import select
+from server.controllers.permissionController import load_role_permissions, permission_registry
+from server.models.authModel import Role
+from server.models.garageModel import Garage
+from server.models.remorqueurModel import Remorqueur
+from server.settings import AsyncSession, get_redis_client
+
+# Without Redis, changes made by another worker show up after this long
+ROSTER_CACHE_SECONDS = 60
+
+
+class RosterMember(NamedTuple):
+    id: int
+    name: str
+    tel: str
+    username: str
+    is_active: bool
+    role_id: int
+    role_name: str
+
+
+class GarageRoster(NamedTuple):
+    garage_id: int
+    garage_name: str
+    version: int
+    members: Tuple[RosterMember, ...]
+    members_by_id: Dict[int, RosterMember]
+    ids: FrozenSet[int]
+    # role id -> ((permission id, name), ...) of the roles present
+    role_permissions: Dict[int, Tuple[Tuple[int, str], ...]]
+
+
+class RosterCache:
+    """
+    The remorqueurs of each garage, loaded once and kept until a remorqueur
+    of that garage is created, updated or deleted. Every invalidation bumps
+    the garage's version; a load that raced with one is not kept. With
+    Redis the versions are shared (roster:version:<garage id>), so other
+    workers drop their copy on their next read.
+    """
+
+    def __init__(self, max_size: int = 10000):
+        self._entries: Dict[int, Tuple[GarageRoster, float]] = {}
+        self._versions: Dict[int, int] = {}
+        self._max_size = max_size
+
+    @property
+    def shared(self) -> bool:
+        """True when versions are shared between workers, i.e. a roster read is never stale"""
+        return get_redis_client() is not None
+
+    async def _current_version(self, garage_id: int) -> int:
+        redis = get_redis_client()
+        if redis is not None:
+            try:
+                return int(await redis.get(f"roster:version:{garage_id}") or 0)
+            except Exception as e:
+                print(f"Error reading roster version: {str(e)}")
+        return self._versions.get(garage_id, 0)
+
+    async def get(self, garage_id: int, db: AsyncSession) -> Optional[GarageRoster]:
+        """The garage's roster, from memory when current; None when the garage does not exist"""
+        version = await self._current_version(garage_id)
+        entry = self._entries.get(garage_id)
+        if entry is not None and entry[0].version == version and entry[1] > time.time():
+            return entry[0]
+
+        roster = await self._load(garage_id, version, db)
+        if roster is not None and await self._current_version(garage_id) == version:
+            if len(self._entries) >= self._max_size:
+                self._entries.clear()
+            self._entries[garage_id] = (roster, time.time() + ROSTER_CACHE_SECONDS)
+        return roster
+
+    async def _load(self, garage_id: int, version: int, db: AsyncSession) -> Optional[GarageRoster]:
+        rows = (await db.execute(
+            select(
+                Garage.name.label("garage_name"),
+                Remorqueur.id,
+                Remorqueur.name,
+                Remorqueur.tel,
+                Remorqueur.username,
+                Remorqueur.is_active,
+                Remorqueur.role_id,
+                Role.name.label("role_name"),
+            )
+            .select_from(Garage)
+            .outerjoin(Remorqueur, Remorqueur.garage_id == Garage.id)
+            .outerjoin(Role, Role.id == Remorqueur.role_id)
+            .where(Garage.id == garage_id)
+            .order_by(Remorqueur.id)
+        )).all()
+        if not rows:
+            return None
+
+        members = tuple(
+            RosterMember(row.id, row.name, row.tel, row.username, row.is_active, row.role_id, row.role_name)
+            for row in rows if row.id is not None
+        )
+        role_ids = {member.role_id: member.role_name for member in members}
+        if permission_registry.loaded:
+            role_permissions = {
+                role_id: permission_registry.role_permissions(role_name)
+                for role_id, role_name in role_ids.items()
+            }
+        else:
+            role_permissions = await load_role_permissions(role_ids, db)
+
+        return GarageRoster(
+            garage_id=garage_id,
+            garage_name=rows[0].garage_name,
+            version=version,
+            members=members,
+            members_by_id={member.id: member for member in members},
+            ids=frozenset(member.id for member in members),
+            role_permissions=role_permissions,
+        )
+
+    async def invalidate(self, garage_id: int):
+        """Call after committing any change to the garage's remorqueurs"""
+        self._versions[garage_id] = self._versions.get(garage_id, 0) + 1
+        self._entries.pop(garage_id, None)
+        redis = get_redis_client()
+        if redis is not None:
+            try:
+                await redis.incr(f"roster:version:{garage_id}")
+            except Exception as e:
+                print(f"Error bumping roster version: {str(e)}")
+
+
+roster_cache = RosterCache()
@@ -0,0 +1,127 @@
+import base64
+import re
+from typing import Optional, Tuple
+from fastapi import HTTPException
+from sqlalchemy import and_, func, literal, or_, select
+from sqlalchemy.dialects.mysql import match
+from server.controllers.messagesController import (
+    MESSAGE_PREVIEW_LENGTH,
+    admin_message_recipients,
+    apply_pending_receipts,
+    garage_message_recipients,
+    inbox_scope,
+)
+from server.models.authModel import AuthPrincipal
+from server.models.messagesModel import AdminMessage, GarageMessage, MessageSearchHit, MessageSearchPage
+from server.settings import AsyncSession
+
+# Keywords kept from one query (the rest is ignored)
+SEARCH_MAX_TERMS = 8
+
+
+def build_boolean_query(text: str) -> str:
+    """
+    Turn free text into a FULLTEXT boolean query: every word required,
+    matched as a prefix. Operators typed by the user are dropped.
+    """
+    terms = re.findall(r"\w+", text, flags=re.UNICODE)[:SEARCH_MAX_TERMS]
+    return " ".join(f"+{term}*" for term in terms)
+
+def encode_search_cursor(score: float, message_id: int) -> str:
+    raw = f"{score!r}|{message_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_search_cursor(cursor: str) -> Tuple[float, int]:
+    try:
+        score, message_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return float(score), int(message_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+async def search_messages_logic(
+    principal: AuthPrincipal,
+    text: str,
+    scope: str,
+    db: AsyncSession,
+    cursor: Optional[str],
+    limit: int
+) -> MessageSearchPage:
+    """
+    Ranked keyword search over title and content of the messages the caller
+    can see, using the FULLTEXT indexes. Scopes: "inbox" (messages received by
+    a garage or remorqueur, through the recipient tables and broadcasts) and
+    "sent" (messages sent by a garage or an admin).
+    """
+    boolean_query = build_boolean_query(text)
+    if not boolean_query:
+        raise HTTPException(status_code=400, detail="Search query must contain at least one word")
+
+    role = principal.role.lower()
+    onclause = None
+    if scope == "inbox" and role == "garage":
+        kind, message_model, recipients_table = "garage", AdminMessage, admin_message_recipients
+        onclause, member, is_read = inbox_scope(kind, principal.id)
+    elif scope == "inbox" and role == "remorqueur":
+        kind, message_model, recipients_table = "remorqueur", GarageMessage, garage_message_recipients
+        onclause, member, is_read = inbox_scope(kind, principal.id)
+    elif scope == "sent" and role == "garage":
+        kind, message_model = None, GarageMessage
+        member, is_read = GarageMessage.garage_id == principal.id, literal(False)
+    elif scope == "sent" and role not in ("garage", "remorqueur"):
+        kind, message_model = None, AdminMessage
+        member, is_read = AdminMessage.admin_id == principal.id, literal(False)
+    else:
+        raise HTTPException(status_code=400, detail=f"Search scope '{scope}' is not available for this account")
+
+    try:
+        score = match(message_model.title, message_model.content, against=boolean_query).in_boolean_mode()
+        query = select(
+            message_model.id,
+            message_model.title,
+            func.substr(message_model.content, 1, MESSAGE_PREVIEW_LENGTH).label("preview"),
+            message_model.created_at,
+            message_model.to_all,
+            is_read.label("is_read"),
+            score.label("score"),
+        ).select_from(message_model)
+        if onclause is not None:
+            query = query.outerjoin(recipients_table, onclause)
+        query = query.where(and_(member, score > 0))
+
+        if cursor:
+            cursor_score, cursor_id = decode_search_cursor(cursor)
+            query = query.where(
+                or_(
+                    score < cursor_score,
+                    and_(score == cursor_score, message_model.id < cursor_id)
+                )
+            )
+
+        query = query.order_by(score.desc(), message_model.id.desc()).limit(limit + 1)
+        rows = (await db.execute(query)).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        items = [
+            MessageSearchHit(
+                id=row.id,
+                title=row.title,
+                preview=row.preview,
+                created_at=row.created_at,
+                to_all=row.to_all,
+                is_read=row.is_read,
+                score=float(row.score)
+            )
+            for row in rows
+        ]
+        if kind is not None:
+            apply_pending_receipts(kind, principal.id, items)
+
+        next_cursor = encode_search_cursor(float(rows[-1].score), rows[-1].id) if has_more else None
+        return MessageSearchPage(items=items, next_cursor=next_cursor)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error occurred: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to search messages: {str(e)}")
@@ -0,0 +1,165 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+from fastapi import HTTPException, status
+from pyrate_limiter import Duration, InMemoryBucket, Rate, RateItem, RedisBucket
+from pyrate_limiter.buckets.redis_bucket import LuaScript
+from server.settings import WEB_CONCURRENCY, get_redis_client
+
+# Login attempts allowed per username and per client IP (sorted by interval)
+USERNAME_LOGIN_RATES = [Rate(5, Duration.MINUTE), Rate(30, Duration.HOUR)]
+IP_LOGIN_RATES = [Rate(20, Duration.MINUTE), Rate(200, Duration.HOUR)]
+
+# Argon2 verifications use 64 MiB and a full core each: cap how many run at
+# once and how many may wait before new ones are turned away
+HASH_CONCURRENCY = int(os.getenv("ARGON2_MAX_CONCURRENCY", os.cpu_count() or 1))
+HASH_QUEUE_LIMIT = int(os.getenv("ARGON2_MAX_QUEUE", HASH_CONCURRENCY * 4))
+
+# Processes for bulk hashing (account imports) in each uvicorn worker: half of
+# this worker's share of the cores, so logins keep the rest while imports run.
+# One import at a time per worker; a second one is turned away with a 503.
+BULK_HASH_WORKERS = int(os.getenv(
+    "ARGON2_BULK_WORKERS", max((os.cpu_count() or 1) // WEB_CONCURRENCY // 2, 1)
+))
+
+
+class MemoryThrottleBackend:
+    """One pyrate_limiter InMemoryBucket per key, local to this worker (LRU bounded)"""
+
+    def __init__(self, max_keys: int = 100_000):
+        self._buckets: "OrderedDict[str, InMemoryBucket]" = OrderedDict()
+        self._max_keys = max_keys
+
+    async def hit(self, key: str, rates: List[Rate]) -> bool:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = InMemoryBucket(rates)
+            self._buckets[key] = bucket
+            if len(self._buckets) > self._max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+
+        now = int(time.time() * 1000)
+        bucket.leak(now)
+        return bucket.put(RateItem(key, now))
+
+
+class RedisThrottleBackend:
+    """One pyrate_limiter RedisBucket per key, shared by every uvicorn worker"""
+
+    def __init__(self, redis):
+        self._redis = redis
+        self._script_hash: Optional[str] = None
+
+    async def hit(self, key: str, rates: List[Rate]) -> bool:
+        if self._script_hash is None:
+            self._script_hash = await self._redis.script_load(LuaScript.PUT_ITEM)
+
+        bucket_key = f"throttle:{key}"
+        bucket = RedisBucket(rates, self._redis, bucket_key, self._script_hash)
+        now = int(time.time() * 1000)
+        allowed = await bucket.put(RateItem(key, now))
+
+        # Keep idle keys from accumulating in Redis
+        await bucket.leak(now)
+        await self._redis.pexpire(bucket_key, rates[-1].interval)
+        return allowed
+
+
+_throttle_backend = None
+
+def get_throttle_backend():
+    global _throttle_backend
+    if _throttle_backend is None:
+        redis = get_redis_client()
+        _throttle_backend = RedisThrottleBackend(redis) if redis is not None else MemoryThrottleBackend()
+    return _throttle_backend
+
+def set_throttle_backend(backend):
+    """Plug in another backend (anything with an async hit(key, rates) -> bool)"""
+    global _throttle_backend
+    _throttle_backend = backend
+
+
+async def throttle_login(username: str, client_ip: Optional[str]):
+    """Reject a login attempt before any DB lookup or hashing when a bucket is full"""
+    backend = get_throttle_backend()
+    too_many = HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many login attempts, please try again later",
+        headers={"Retry-After": "60"}
+    )
+
+    if client_ip and not await backend.hit(f"login:ip:{client_ip}", IP_LOGIN_RATES):
+        raise too_many
+    if not await backend.hit(f"login:user:{username.strip().lower()}", USERNAME_LOGIN_RATES):
+        raise too_many
+
+
+_hash_slots = asyncio.Semaphore(HASH_CONCURRENCY)
+_hash_in_flight = 0
+
+async def run_hash_operation(func, *args):
+    """
+    Run an Argon2 hash/verify off the event loop under the global concurrency cap.
+    When the wait queue is full the request is rejected immediately with a 503.
+    """
+    global _hash_in_flight
+    if _hash_in_flight >= HASH_CONCURRENCY + HASH_QUEUE_LIMIT:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server busy, please try again",
+            headers={"Retry-After": "1"}
+        )
+
+    _hash_in_flight += 1
+    try:
+        async with _hash_slots:
+            return await asyncio.to_thread(func, *args)
+    finally:
+        _hash_in_flight -= 1
+
+
+_bulk_hash_pool = None
+_bulk_hash_running = asyncio.Lock()
+
+def get_bulk_hash_pool() -> ProcessPoolExecutor:
+    global _bulk_hash_pool
+    if _bulk_hash_pool is None:
+        # spawn: forking this threaded asyncio process could copy held locks
+        _bulk_hash_pool = ProcessPoolExecutor(
+            max_workers=BULK_HASH_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _bulk_hash_pool
+
+def shutdown_bulk_hash_pool():
+    global _bulk_hash_pool
+    if _bulk_hash_pool is not None:
+        _bulk_hash_pool.shutdown(cancel_futures=True)
+        _bulk_hash_pool = None
+
+async def run_bulk_hash(func, chunks: List[list], *args) -> list:
+    """
+    Run func(chunk, *args) for every chunk on the bulk process pool and
+    concatenate the results in order. func must be a picklable module-level
+    function; the chunks are hashed in parallel, outside the GIL. Raises a
+    503 while another bulk hash runs in this worker.
+    """
+    if _bulk_hash_running.locked():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Another import is running, please try again later",
+            headers={"Retry-After": "30"}
+        )
+    async with _bulk_hash_running:
+        loop = asyncio.get_running_loop()
+        pool = get_bulk_hash_pool()
+        results = await asyncio.gather(*[
+            loop.run_in_executor(pool, func, chunk, *args) for chunk in chunks
+        ])
+    return [item for result in results for item in result]
@@ -0,0 +1,202 @@
+import hashlib
+import json
+import secrets
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+import pytz
+from server.settings import get_redis_client
+
+REFRESH_TOKEN_EXPIRE_DAYS = 30
+REFRESH_TOKEN_TTL = REFRESH_TOKEN_EXPIRE_DAYS * 24 * 3600
+
+# Verified access tokens kept per worker
+VERIFIED_TOKEN_CACHE_SIZE = 10000
+
+# How long a worker trusts its local copy of a Redis revocation marker
+REVOCATION_CACHE_SECONDS = 5
+
+EASTERN_TZ = pytz.timezone("America/New_York")
+
+
+def _digest(token: str) -> str:
+    # Refresh tokens are never stored in clear text
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class TokenStore:
+    """
+    Rotation and revocation store for refresh tokens.
+
+    Without REDIS_URL everything lives in this worker's memory. With REDIS_URL,
+    Redis holds the data so rotations and revocations are shared by every worker,
+    and the memory tier only caches revocation markers for a few seconds.
+    """
+
+    def __init__(self):
+        self._memory: Dict[str, Tuple[str, float]] = {}
+        self._revocation_cache: Dict[str, Tuple[Optional[int], float]] = {}
+        self._writes = 0
+
+    # ---------- key/value tiers ----------
+
+    def _purge(self):
+        now = time.time()
+        for key in [k for k, (_, expires) in self._memory.items() if expires < now]:
+            del self._memory[key]
+
+    async def _set(self, key: str, value: str, ttl: int):
+        redis = get_redis_client()
+        if redis is not None:
+            await redis.set(key, value, ex=ttl)
+            return
+        self._writes += 1
+        if self._writes % 1024 == 0:
+            self._purge()
+        self._memory[key] = (value, time.time() + ttl)
+
+    async def _get(self, key: str) -> Optional[str]:
+        redis = get_redis_client()
+        if redis is not None:
+            return await redis.get(key)
+        entry = self._memory.get(key)
+        if entry is None or entry[1] < time.time():
+            return None
+        return entry[0]
+
+    async def _pop(self, key: str) -> Optional[str]:
+        redis = get_redis_client()
+        if redis is not None:
+            # GETDEL makes rotation atomic across workers
+            return await redis.getdel(key)
+        entry = self._memory.pop(key, None)
+        if entry is None or entry[1] < time.time():
+            return None
+        return entry[0]
+
+    # ---------- refresh tokens ----------
+
+    async def issue_refresh_token(self, role: str, sub: str, family: Optional[str] = None) -> Tuple[str, datetime]:
+        """Create a new refresh token, optionally continuing an existing rotation family"""
+        token = secrets.token_urlsafe(32)
+        record = {
+            "role": role,
+            "sub": str(sub),
+            "family": family or secrets.token_hex(8),
+            "iat": int(time.time()),
+        }
+        await self._set(f"refresh:{_digest(token)}", json.dumps(record), REFRESH_TOKEN_TTL)
+        expires_at = datetime.now(EASTERN_TZ) + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+        return token, expires_at
+
+    async def rotate_refresh_token(self, token: str) -> Optional[dict]:
+        """
+        Consume a refresh token and return its record, or None if it is unknown,
+        expired or revoked. Presenting an already rotated token revokes its whole family.
+        """
+        digest = _digest(token)
+        raw = await self._pop(f"refresh:{digest}")
+        if raw is None:
+            family = await self._get(f"refresh_used:{digest}")
+            if family is not None:
+                await self._set(f"family_revoked:{family}", "1", REFRESH_TOKEN_TTL)
+            return None
+
+        record = json.loads(raw)
+        await self._set(f"refresh_used:{digest}", record["family"], REFRESH_TOKEN_TTL)
+
+        if await self._get(f"family_revoked:{record['family']}") is not None:
+            return None
+        if await self.is_subject_revoked(record["role"], record["sub"], record["iat"]):
+            return None
+        return record
+
+    async def revoke_refresh_token(self, token: str):
+        """Logout: drop the token and every token rotated from the same login"""
+        raw = await self._pop(f"refresh:{_digest(token)}")
+        if raw is not None:
+            family = json.loads(raw)["family"]
+            await self._set(f"family_revoked:{family}", "1", REFRESH_TOKEN_TTL)
+
+    # ---------- subject revocation ----------
+
+    async def revoke_subject(self, role: str, sub):
+        """Invalidate every token issued so far to this account (deleted, deactivated, unpaid...)"""
+        key = f"revoked:{role}:{sub}"
+        revoked_at = int(time.time())
+        await self._set(key, str(revoked_at), REFRESH_TOKEN_TTL)
+        self._revocation_cache[key] = (revoked_at, time.time() + REVOCATION_CACHE_SECONDS)
+
+    async def is_subject_revoked(self, role: str, sub, issued_at) -> bool:
+        key = f"revoked:{role}:{sub}"
+        if get_redis_client() is None:
+            raw = await self._get(key)
+            revoked_at = int(raw) if raw is not None else None
+        else:
+            cached = self._revocation_cache.get(key)
+            if cached is not None and cached[1] > time.time():
+                revoked_at = cached[0]
+            else:
+                raw = await self._get(key)
+                revoked_at = int(raw) if raw is not None else None
+                if len(self._revocation_cache) > 10000:
+                    self._revocation_cache.clear()
+                self._revocation_cache[key] = (revoked_at, time.time() + REVOCATION_CACHE_SECONDS)
+
+        return revoked_at is not None and int(issued_at or 0) < revoked_at
+
+
+token_store = TokenStore()
+
+
+class VerifiedTokenCache:
+    """
+    Bounded LRU of access tokens whose signature and claims were already
+    verified, mapped to their decoded claims. Keyed by the full token string,
+    so two tokens can never share an entry; entries die with the token's exp.
+    Revocation is still checked by the caller on every hit.
+    """
+
+    def __init__(self, max_size: int = VERIFIED_TOKEN_CACHE_SIZE):
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, token: str) -> Optional[dict]:
+        payload = self._entries.get(token)
+        if payload is None:
+            self.misses += 1
+            return None
+        if payload["exp"] <= time.time():
+            del self._entries[token]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(token)
+        self.hits += 1
+        return payload
+
+    def put(self, token: str, payload: dict):
+        if "exp" not in payload:
+            return
+        self._entries[token] = payload
+        self._entries.move_to_end(token)
+        if len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self._max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+verified_token_cache = VerifiedTokenCache()
@@ -1,23 +1,15 @@
 from fastapi import HTTPException, Request, status
 from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 from server.settings import (
     AsyncSession,
 )
-from server.controllers.authController import  argon2_strong_hash, authenticate_user, verify_password
+from server.controllers.throttleController import run_hash_operation
+from server.controllers.authController import  argon2_strong_hash, authenticate_user, duplicate_key, verify_password
 from server.models.authModel import  CreateUserRequest, LoginRequest, UpdateUserPassword, User, Role
 from sqlalchemy.orm import joinedload
 
 async def create_user(db: AsyncSession, user_data: CreateUserRequest) -> User:
-    # Check if username already exists
-    stmt = select(User).where(User.username == user_data.username)
-    result = await db.execute(stmt)
-    existing_user = result.scalars().first()
-    if existing_user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Username already exists"
-        )
-
     # Get the role by name with permissions
     stmt = select(Role).options(
         joinedload(Role.permissions)
@@ -32,7 +24,7 @@ async def create_user(db: AsyncSession, user_data: CreateUserRequest) -> User:
         )
 
     # Hash the password
-    hashed_password = argon2_strong_hash(user_data.password)
+    hashed_password = await run_hash_operation(argon2_strong_hash, user_data.password)
 
     # Create the new user
     new_user = User(
@@ -42,9 +34,22 @@ async def create_user(db: AsyncSession, user_data: CreateUserRequest) -> User:
         is_active=False  # Set default value explicitly
     )
 
-    # Add and commit the new user to the database
+    # Add and commit the new user to the database; the unique index on
+    # username rejects duplicates, including concurrent signups
     db.add(new_user)
-    await db.commit()
+    try:
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        if duplicate_key(e) == "username":
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Username already exists"
+            )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to create user."
+        )
     await db.refresh(new_user)
 
     return new_user
@@ -89,27 +94,30 @@ async def update_admin(
 
     # If updating username
     if update_data.new_username:
-        # Check if the new username is already taken
-        username_exists = await db.execute(
-            select(User).where(User.username == update_data.new_username)
-        )
-        if username_exists.scalar_one_or_none():
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Username already in use. Please choose another one."
-            )
+        # Uniqueness is checked by the unique index at commit
         user_to_update.username = update_data.new_username
 
     # If updating password
     if update_data.password:
         # Add more password validation rules as needed
-        user_to_update.password = argon2_strong_hash(update_data.password)
+        user_to_update.password = await run_hash_operation(argon2_strong_hash, update_data.password)
 
     # Commit changes
     try:
         await db.commit()
         await db.refresh(user_to_update)
-    except HTTPException as e:
+    except IntegrityError as e:
+        await db.rollback()
+        if duplicate_key(e) == "username":
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Username already in use. Please choose another one."
+            )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to update user information."
+        )
+    except Exception as e:
         await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -1,8 +1,11 @@
+import asyncio
+from contextlib import asynccontextmanager
 from ftplib import FTP
 import hmac
 import io
 import os
-from typing import Dict, List, Union
+import time
+from typing import Dict, List, Optional, Union
 from fastapi import (
     APIRouter,
     Depends,
@@ -12,7 +15,10 @@ from fastapi import (
     Path,
     Query,
     Request,
+    Response,
     UploadFile,
+    WebSocket,
+    WebSocketDisconnect,
     status
 )
 from fastapi.responses import StreamingResponse
@@ -20,34 +26,97 @@ import pytz
 from sqlalchemy import and_, func, insert, select, update
 import stripe
 from server import settings
-from server.controllers.authController import ACCESS_TOKEN_EXPIRE_HOURS, ALGORITHM, SECRET_KEY, authenticate_user
+from server.controllers.accountSearchController import ACCOUNT_NGRAM_INDEX, account_index, search_garages_logic, search_remorqueurs_logic
+from server.controllers.archiveController import archive_old_messages, archive_periodically, get_archived_messages_page_logic
+from server.controllers.authController import ALGORITHM, SECRET_KEY, argon2_calibration, configure_argon2, decode_access_token, role_allows
+from server.controllers.dashboardController import get_garage_dashboard_logic
+from server.controllers.deliveryController import delivery_worker, get_delivery_job_logic
+from server.controllers.directoryController import decode_directory_cursor, stream_garages_with_remorqueurs, stream_remorqueurs_with_garages
 from server.controllers.faqController import create_faq_db, delete_faq_db
 from server.controllers.ftpController import FTPManager
 from server.controllers.garageController import create_garage, get_garage_remorqueurs, update_garage
-from server.controllers.loginController import process_login
-from server.controllers.messagesController import create_admin_message_logic, create_garage_message_logic, delete_admin_message_logic, delete_garage_message_logic, delete_multiple_admin_messages_logic, get_admin_messages_logic, get_all_admin_messages_logic, get_all_garage_messages_logic, get_garage_messages_logic, mark_admin_message_as_read_logic, mark_garage_message_as_read_logic
-from server.controllers.remorqueurController import create_remorqueur, delete_remorqueur, update_remorqueur
+from server.controllers.locationController import get_nearest_remorqueurs_logic, position_index, report_position_logic, start_position_replication
+from server.controllers.loginController import process_login, process_logout, process_refresh
+from server.controllers.phoneController import load_phone_index, lookup_remorqueurs_by_tel_logic, phone_index
+from server.controllers.presenceController import expire_presence_periodically, heartbeat_logic
+from server.controllers.permissionController import load_permission_registry, permission_registry
+from server.controllers.messagesController import BROADCAST_CHANNELS, create_admin_message_logic, create_garage_message_logic, delete_admin_message_logic, delete_garage_message_logic, delete_multiple_admin_messages_logic, get_admin_message_logic, get_admin_messages_logic, get_admin_messages_page_logic, get_all_admin_messages_logic, get_all_admin_messages_page_logic, get_all_garage_messages_logic, get_all_garage_messages_page_logic, get_broadcast_sender_id, get_garage_message_logic, get_garage_messages_logic, get_garage_messages_page_logic, get_inbox_updates_logic, get_unread_count_logic, mark_admin_message_as_read_logic, mark_garage_message_as_read_logic, mark_messages_as_read_logic, read_receipts
+from server.controllers.realtimeController import get_pubsub, inbox_channel
+from server.controllers.remorqueurController import (
+    bulk_create_remorqueurs,
+    bulk_delete_remorqueurs,
+    bulk_set_remorqueurs_active,
+    create_remorqueur,
+    delete_remorqueur,
+    read_bulk_remorqueur_rows,
+    update_remorqueur,
+)
+from server.controllers.searchController import search_messages_logic
+from server.controllers.throttleController import shutdown_bulk_hash_pool
+from server.controllers.tokenController import token_store, verified_token_cache
 from server.controllers.userAdminController import create_user, update_admin
 from server.controllers.vehicleController import get_available_years, get_brands_by_year, get_models_by_year_and_brand, get_vehicle_by_filters
-from server.models.authModel import CreateUserRequest, LoginRequest, LoginResponse, PermissionResponse, Role, RoleResponse, UpdateUserPassword, User, UserResponse
+from server.models.authModel import AuthPrincipal, CreateUserRequest, LoginRequest, LoginResponse, PermissionResponse, RefreshTokenRequest, Role, RoleResponse, UpdateUserPassword, User, UserResponse
 from sqlalchemy.orm import joinedload, selectinload
 from fastapi.middleware.cors import CORSMiddleware
 from server.models.faqModel import DeleteResponse, FAQCreate, FAQResponse, faq
 from server.models.garageModel import CreateGarageRequest, Garage, GarageRequest, UpdateGarageRequest
-from server.models.messagesModel import AdminMessage, AdminMessageCreate, AdminMessageRequest, AdminMessageResponse, DeleteMessageRequest, DeleteMultipleMessagesRequest, GarageMessage, GarageMessageCreate, GarageMessageRequest, GarageMessageResponse, get_eastern_time
-from server.models.remorqueurModel import CreateRemorqueurRequest, Remorqueur, UpdateRemorqueurRequest
-from server.models.reponseModel import GarageResponse, GarageWithRemorqueursResponse, RemorqueurResponse, RemorqueurWithGarageResponse
+from server.models.messagesModel import AdminMessage, AdminMessageCreate, BulkReadAdminMessagesRequest, BulkReadGarageMessagesRequest, BulkReadResponse, AdminMessagePage, AdminMessageRequest, AdminMessageResponse, DeleteMessageRequest, DeleteMultipleMessagesRequest, DeliveryJobResponse, GarageMessage, GarageMessageCreate, GarageMessagePage, GarageMessageRequest, GarageMessageResponse, MessageSearchPage, UnreadCountResponse, get_eastern_time
+from server.models.remorqueurModel import (
+    BulkCreateRemorqueursResponse,
+    BulkRemorqueurActionResponse,
+    BulkRemorqueurIdsRequest,
+    BulkRemorqueurStatusRequest,
+    CreateRemorqueurRequest,
+    NearbyRemorqueursResponse,
+    PhoneLookupResponse,
+    PositionReport,
+    Remorqueur,
+    UpdateRemorqueurRequest,
+)
+from server.models.reponseModel import GarageDashboardResponse, GarageResponse, GarageSearchPage, GarageWithRemorqueursResponse, RemorqueurResponse, RemorqueurSearchPage, RemorqueurWithGarageResponse
 from server.models.vehiculeModel import BrandsResponse, DeactivationPDF, NeutralPDF, Vehicle, VehicleCreate, VehicleFilterParams, VehicleFilterResponse, VehicleImage, VehicleResponse, YearsResponse
 from server.settings import (
     get_primary_db,
     AsyncSession,
     DISPATCH_ADMIN_KEY,
+    PrimarySessionLocal,
 )
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Compile role/permission bitsets once, then keep them fresh in the background
+    await load_permission_registry()
+    # Caller ID lookups are served from memory
+    await load_phone_index()
+    # Tune Argon2 cost to this CPU (or adopt the one shared by the other workers) before serving logins
+    await configure_argon2()
+    background_tasks = [
+        asyncio.create_task(permission_registry.refresh_periodically()),
+        asyncio.create_task(read_receipts.flush_periodically()),
+        asyncio.create_task(delivery_worker.run()),
+        asyncio.create_task(archive_periodically()),
+        asyncio.create_task(position_index.expire_periodically()),
+        asyncio.create_task(expire_presence_periodically()),
+        asyncio.create_task(phone_index.refresh_periodically()),
+    ]
+    if ACCOUNT_NGRAM_INDEX:
+        # Built in the background; searches use MariaDB until it is loaded
+        background_tasks.append(asyncio.create_task(account_index.refresh_periodically()))
+    # Apply the position reports received by the other workers
+    await start_position_replication()
+    yield
+    for task in background_tasks:
+        task.cancel()
+    # Write out the receipts still buffered before the worker exits
+    await read_receipts.flush()
+    shutdown_bulk_hash_pool()
+
 app = FastAPI(
     debug=False,
     docs_url=None,
     redoc_url=None,
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -84,7 +153,9 @@ stripe.api_key = "sk_test_51QkWvrCYKd15COmIkCuDzhjNSAccrHeDHqZgsZr2ydXCisiR0HaWF
 
 # =============== Middlewares ===============#
 
-async def authenticate(request: Request, db: AsyncSession = Depends(get_primary_db)):
+async def authenticate(request: Request) -> AuthPrincipal:
+    # Stateless: short-lived access tokens are checked against the revocation
+    # store only; the account itself is re-read from the DB at refresh time
     token = request.headers.get("X-Deliver-Auth")
     if not token:
         raise HTTPException(
@@ -92,14 +163,44 @@ async def authenticate(request: Request, db: AsyncSession = Depends(get_primary_
             detail="Non autorisé"
         )
     
-    user = await authenticate_user(token, db)
-    if not user:
+    try:
+        payload = await decode_access_token(token)
+    except HTTPException:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, 
             detail="Non autorisé"
         )
-    return user
+    return AuthPrincipal(
+        id=int(payload["sub"]),
+        username=payload.get("username"),
+        role=payload["role"],
+        role_id=payload.get("role_id"),
+        permissions=payload.get("permissions", []),
+        garage_id=payload.get("garage_id")
+    )
     
+def require_permission(permission: str):
+    """Router-level permission check against the compiled role bitsets"""
+    async def check_permission(principal: AuthPrincipal = Depends(authenticate)):
+        if not role_allows(principal.role_id, principal.permissions, permission):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not enough permissions"
+            )
+        return principal
+    return check_permission
+
+def require_role(*roles: str):
+    """Restrict a route to the given roles (e.g. the superadmin and apdq staff)"""
+    async def check_role(principal: AuthPrincipal = Depends(authenticate)):
+        if principal.role not in roles:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not enough permissions"
+            )
+        return principal
+    return check_role
+
 def is_dispatch(request: Request):
     if not hmac.compare_digest(
         request.headers.get("X-Dispatch-Key"), DISPATCH_ADMIN_KEY
@@ -263,6 +364,10 @@ async def stripe_webhook(
             print(f"Processing subscription deletion for customer: {customer_id}")
 
             try:
+                garage_ids = (await db.execute(
+                    select(Garage.id).where(Garage.stripe_customer_id == customer_id)
+                )).scalars().all()
+
                 # Update the garage's active status
                 update_query = (
                     update(Garage)
@@ -274,6 +379,10 @@ async def stripe_webhook(
                 )
                 await db.execute(update_query)
                 await db.commit()
+
+                # Cut off outstanding tokens of the unpaid garage
+                for garage_id in garage_ids:
+                    await token_store.revoke_subject("garage", garage_id)
                 print(f"Successfully deactivated garage for customer ID: {customer_id}")
                 return {"status": "success", "message": "Subscription ended"}
 
@@ -290,6 +399,10 @@ async def stripe_webhook(
             print(f"Processing subscription update for customer: {customer_id}")
 
             try:
+                garage_ids = (await db.execute(
+                    select(Garage.id).where(Garage.stripe_customer_id == customer_id)
+                )).scalars().all()
+
                 # Update the garage's active status based on subscription status
                 update_query = (
                     update(Garage)
@@ -301,6 +414,10 @@ async def stripe_webhook(
                 )
                 await db.execute(update_query)
                 await db.commit()
+
+                if not is_active:
+                    for garage_id in garage_ids:
+                        await token_store.revoke_subject("garage", garage_id)
                 print(f"Successfully updated garage status to {is_active} for customer ID: {customer_id}")
                 return {"status": "success", "message": "Subscription updated"}
 
@@ -439,6 +556,16 @@ async def get_current_garage(
             status_code=500,
             detail="Internal server error while fetching garage data"
         )
+
+@garage_router.get("/api/v1/garage_dashboard", response_model=GarageDashboardResponse)
+async def get_garage_dashboard(
+    response: Response,
+    principal: AuthPrincipal = Depends(authenticate),
+    db: AsyncSession = Depends(get_primary_db)
+):
+    """Profile, driver counts, unread admin messages and send statistics of the calling garage"""
+    response.headers["Cache-Control"] = UNREAD_BADGE_CACHE_CONTROL
+    return await get_garage_dashboard_logic(principal, db)
 # =================== stripe_webhook =================#
 # =================== ADMIN =================#
 
@@ -574,7 +701,64 @@ async def create_user_endpoint(request: CreateUserRequest, db: AsyncSession = De
         is_active=user_with_relations.is_active
     )
 
-@garage_router.post("/api/v1/create_garages", response_model=GarageResponse, status_code=status.HTTP_201_CREATED)
+@dispatch_router.get("/api/v1/argon2_calibration", response_model=dict)
+async def argon2_calibration_endpoint():
+    return argon2_calibration
+
+@dispatch_router.get("/api/v1/token_cache_stats", response_model=dict)
+async def token_cache_stats_endpoint():
+    return verified_token_cache.stats()
+
+@dispatch_router.get("/api/v1/read_receipt_stats", response_model=dict)
+async def read_receipt_stats_endpoint():
+    return read_receipts.stats()
+
+@dispatch_router.get("/api/v1/delivery_queue_stats", response_model=dict)
+async def delivery_queue_stats_endpoint(db: AsyncSession = Depends(get_primary_db)):
+    return await delivery_worker.stats(db)
+
+@dispatch_router.get("/api/v1/nearest_remorqueurs", response_model=NearbyRemorqueursResponse)
+async def nearest_remorqueurs_endpoint(
+    garage_id: int,
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    k: int = Query(5, ge=1, le=50),
+    radius_km: float = Query(25, gt=0, le=200),
+    db: AsyncSession = Depends(get_primary_db)
+):
+    """Closest active remorqueurs of a garage to a breakdown, from the in-memory position index"""
+    return await get_nearest_remorqueurs_logic(garage_id, lat, lon, k, radius_km, db)
+
+@dispatch_router.get("/api/v1/remorqueur_by_tel", response_model=PhoneLookupResponse)
+async def remorqueur_by_tel_endpoint(
+    tel: str,
+    db: AsyncSession = Depends(get_primary_db)
+):
+    """Resolve a caller ID (any common format) to the driver(s) and garage using it"""
+    return await lookup_remorqueurs_by_tel_logic(tel, db)
+
+@dispatch_router.get("/api/v1/phone_index_stats", response_model=dict)
+async def phone_index_stats_endpoint():
+    return phone_index.stats()
+
+@dispatch_router.get("/api/v1/position_index_stats", response_model=dict)
+async def position_index_stats_endpoint():
+    return position_index.stats()
+
+@dispatch_router.post("/api/v1/archive_messages", response_model=dict)
+async def archive_messages_endpoint():
+    # Apply the retention policy now instead of waiting for the hourly run
+    return {"archived": await archive_old_messages()}
+
+@dispatch_router.post("/api/v1/reload_permissions", response_model=dict)
+async def reload_permissions_endpoint():
+    # Call after editing the roles / permissions / role_permission tables
+    if not await load_permission_registry():
+        raise HTTPException(status_code=500, detail="Failed to reload permissions")
+    return {"message": "Permissions reloaded"}
+
+@garage_router.post("/api/v1/create_garages", response_model=GarageResponse, status_code=status.HTTP_201_CREATED,
+                    dependencies=[Depends(require_permission("create_garage"))])
 async def create_garage_endpoint(
     request: Request,
     garage_data: CreateGarageRequest,
@@ -622,6 +806,63 @@ async def get_all_remorqueurs_with_garages(db: AsyncSession = Depends(get_primar
             detail="Database error occurred while fetching remorqueurs"
         )
 
+# Paginated variants, streamed as {"items": [...], "next_cursor": ...}; pass
+# next_cursor back as `cursor` for the following page
+@app.get("/api/v1/garages_with_remorqueurs_page")
+async def get_garages_with_remorqueurs_page(
+    cursor: Optional[str] = None,
+    limit: int = Query(default=100, ge=1, le=500)
+):
+    after_id = decode_directory_cursor(cursor)
+    return StreamingResponse(
+        stream_garages_with_remorqueurs(after_id, limit), media_type="application/json"
+    )
+
+@app.get("/api/v1/remorqueurs_with_garages_page")
+async def get_remorqueurs_with_garages_page(
+    cursor: Optional[str] = None,
+    limit: int = Query(default=100, ge=1, le=500)
+):
+    after_id = decode_directory_cursor(cursor)
+    return StreamingResponse(
+        stream_remorqueurs_with_garages(after_id, limit), media_type="application/json"
+    )
+
+# Account search: q matches the start of names, emails, usernames and numbers
+# (anywhere in them when the n-gram index is on), pages in id order. Staff only:
+# admin_router alone lets any garage or remorqueur token through.
+@admin_router.get("/api/v1/search_garages", response_model=GarageSearchPage,
+                  dependencies=[Depends(require_role("superadmin", "apdq"))])
+async def search_garages_endpoint(
+    q: str = Query(min_length=1, max_length=100),
+    is_active: Optional[bool] = None,
+    payment_status: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(default=25, ge=1, le=100),
+    db: AsyncSession = Depends(get_primary_db)
+):
+    after_id = decode_directory_cursor(cursor)
+    return await search_garages_logic(q, is_active, payment_status, after_id, limit, db)
+
+@admin_router.get("/api/v1/search_remorqueurs", response_model=RemorqueurSearchPage,
+                  dependencies=[Depends(require_role("superadmin", "apdq"))])
+async def search_remorqueurs_endpoint(
+    q: str = Query(min_length=1, max_length=100),
+    is_active: Optional[bool] = None,
+    payment_status: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(default=25, ge=1, le=100),
+    db: AsyncSession = Depends(get_primary_db)
+):
+    """payment_status filters on the remorqueur's garage"""
+    after_id = decode_directory_cursor(cursor)
+    return await search_remorqueurs_logic(q, is_active, payment_status, after_id, limit, db)
+
+@admin_router.get("/api/v1/account_index_stats", response_model=dict,
+                  dependencies=[Depends(require_role("superadmin", "apdq"))])
+async def account_index_stats_endpoint():
+    return account_index.stats()
+
 @admin_router.put("/api/v1/update_admin", status_code=status.HTTP_200_OK)
 async def update_admin_endpoint(
     request: Request,
@@ -669,6 +910,63 @@ async def get_remoqueurs_fromGarage_messages(
             detail=f"Failed to retrieve messages: {str(e)}"
         )
 
+# Paginated inboxes: newest first, `cursor` is the next_cursor of the previous page.
+# summary=true returns title, preview and read state; fetch full content per message.
+@admin_router.get("/api/v1/admin_messages_page", response_model=AdminMessagePage)
+async def get_all_admin_messages_page(
+    cursor: Optional[str] = None,
+    limit: int = Query(default=50, ge=1, le=200),
+    summary: bool = True,
+    db: AsyncSession = Depends(get_primary_db)
+):
+    return await get_all_admin_messages_page_logic(db, cursor, limit, summary)
+
+@admin_router.get("/api/v1/garages_fromAdmin_messages_page", response_model=AdminMessagePage)
+async def get_garages_fromAdmin_messages_page(
+    garage_id: int,
+    cursor: Optional[str] = None,
+    limit: int = Query(default=50, ge=1, le=200),
+    summary: bool = True,
+    db: AsyncSession = Depends(get_primary_db)
+):
+    return await get_admin_messages_page_logic(garage_id, db, cursor, limit, summary)
+
+@admin_router.get("/api/v1/admin_message/{message_id}", response_model=AdminMessageResponse)
+async def get_admin_message(
+    message_id: int,
+    garage_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_primary_db)
+):
+    return await get_admin_message_logic(message_id, garage_id, db)
+
+@garage_router.get("/api/v1/garage_messages_page", response_model=GarageMessagePage)
+async def get_all_garage_messages_page(
+    garage_id: int,
+    cursor: Optional[str] = None,
+    limit: int = Query(default=50, ge=1, le=200),
+    summary: bool = True,
+    db: AsyncSession = Depends(get_primary_db)
+):
+    return await get_all_garage_messages_page_logic(garage_id, db, cursor, limit, summary)
+
+@garage_router.get("/api/v1/remoqueurs_fromGarage_messages_page", response_model=GarageMessagePage)
+async def get_remoqueurs_fromGarage_messages_page(
+    remorqueur_id: int,
+    cursor: Optional[str] = None,
+    limit: int = Query(default=50, ge=1, le=200),
+    summary: bool = True,
+    db: AsyncSession = Depends(get_primary_db)
+):
+    return await get_garage_messages_page_logic(remorqueur_id, db, cursor, limit, summary)
+
+@garage_router.get("/api/v1/garage_message/{message_id}", response_model=GarageMessageResponse)
+async def get_garage_message(
+    message_id: int,
+    remorqueur_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_primary_db)
+):
+    return await get_garage_message_logic(message_id, remorqueur_id, db)
+
 @admin_router.post("/api/v1/create_admin_messages", response_model=AdminMessageResponse)
 async def create_admin_messages(
     message_data: AdminMessageCreate, 
@@ -680,6 +978,55 @@ async def create_admin_messages(
 async def create_garage_messages(message_data: GarageMessageCreate, db: AsyncSession = Depends(get_primary_db)):
     return await create_garage_message_logic(message_data, db)
 
+@garage_router.get("/api/v1/search_messages", response_model=MessageSearchPage)
+async def search_messages(
+    q: str = Query(..., min_length=1, max_length=200),
+    scope: str = "inbox",
+    cursor: Optional[str] = None,
+    limit: int = Query(default=20, ge=1, le=100),
+    principal: AuthPrincipal = Depends(authenticate),
+    db: AsyncSession = Depends(get_primary_db)
+):
+    # Scoped by the token: a garage or remorqueur searches its own inbox,
+    # a garage or admin (scope=sent) what it sent
+    return await search_messages_logic(principal, q, scope, db, cursor, limit)
+
+@admin_router.get("/api/v1/archived_admin_messages_page", response_model=AdminMessagePage)
+async def get_archived_admin_messages_page(
+    garage_id: int,
+    cursor: Optional[str] = None,
+    limit: int = Query(default=50, ge=1, le=200),
+    summary: bool = True,
+    db: AsyncSession = Depends(get_primary_db)
+):
+    return await get_archived_messages_page_logic("garage", garage_id, db, cursor, limit, summary)
+
+@garage_router.get("/api/v1/archived_garage_messages_page", response_model=GarageMessagePage)
+async def get_archived_garage_messages_page(
+    remorqueur_id: int,
+    cursor: Optional[str] = None,
+    limit: int = Query(default=50, ge=1, le=200),
+    summary: bool = True,
+    db: AsyncSession = Depends(get_primary_db)
+):
+    return await get_archived_messages_page_logic("remorqueur", remorqueur_id, db, cursor, limit, summary)
+
+@admin_router.get("/api/v1/admin_delivery_jobs/{job_id}", response_model=DeliveryJobResponse)
+async def get_admin_delivery_job(
+    job_id: int,
+    principal: AuthPrincipal = Depends(require_role("superadmin", "apdq")),
+    db: AsyncSession = Depends(get_primary_db)
+):
+    return await get_delivery_job_logic(job_id, "garage", principal.id, db)
+
+@garage_router.get("/api/v1/garage_delivery_jobs/{job_id}", response_model=DeliveryJobResponse)
+async def get_garage_delivery_job(
+    job_id: int,
+    principal: AuthPrincipal = Depends(require_role("garage")),
+    db: AsyncSession = Depends(get_primary_db)
+):
+    return await get_delivery_job_logic(job_id, "remorqueur", principal.id, db)
+
 @admin_router.delete("/api/v1/delete_admin_message", response_model=dict)
 async def delete_admin_message(
     request: DeleteMessageRequest,
@@ -713,6 +1060,15 @@ async def mark_admin_message_as_read(
         db=db
     )
 
+@admin_router.put("/admin-messages/read", response_model=BulkReadResponse)
+async def mark_admin_messages_as_read(
+    request: BulkReadAdminMessagesRequest,
+    db: AsyncSession = Depends(get_primary_db)
+):
+    return await mark_messages_as_read_logic(
+        "garage", request.garage_id, request.message_ids, request.up_to_cursor, db
+    )
+
 @garage_router.put("/garage-messages/{message_id}/read")
 async def mark_garage_message_as_read(
     message_id: int,
@@ -724,10 +1080,127 @@ async def mark_garage_message_as_read(
         remorqueur_id=request.remorqueur_id,
         db=db
     )
+
+@garage_router.put("/garage-messages/read", response_model=BulkReadResponse)
+async def mark_garage_messages_as_read(
+    request: BulkReadGarageMessagesRequest,
+    db: AsyncSession = Depends(get_primary_db)
+):
+    return await mark_messages_as_read_logic(
+        "remorqueur", request.remorqueur_id, request.message_ids, request.up_to_cursor, db
+    )
+
+# Unread badges are polled constantly: one primary-key read, cacheable briefly by the client
+UNREAD_BADGE_CACHE_CONTROL = "private, max-age=10"
+
+@garage_router.get("/api/v1/unread_admin_messages_count", response_model=UnreadCountResponse)
+async def get_unread_admin_messages_count(
+    garage_id: int,
+    response: Response,
+    db: AsyncSession = Depends(get_primary_db)
+):
+    response.headers["Cache-Control"] = UNREAD_BADGE_CACHE_CONTROL
+    return {"unread": await get_unread_count_logic("garage", garage_id, db)}
+
+@garage_router.get("/api/v1/unread_garage_messages_count", response_model=UnreadCountResponse)
+async def get_unread_garage_messages_count(
+    remorqueur_id: int,
+    response: Response,
+    db: AsyncSession = Depends(get_primary_db)
+):
+    response.headers["Cache-Control"] = UNREAD_BADGE_CACHE_CONTROL
+    return {"unread": await get_unread_count_logic("remorqueur", remorqueur_id, db)}
+
+# Messages replayed on reconnect before the client is told to reload its inbox instead
+REALTIME_REPLAY_LIMIT = 200
+
+# An open socket re-checks its token's revocation this often; it is closed
+# at the token's exp either way, and the client reconnects with a fresh one
+REALTIME_TOKEN_CHECK_SECONDS = 30
+
+@app.websocket("/ws/v1/inbox")
+async def inbox_websocket(websocket: WebSocket, token: Optional[str] = None, cursor: Optional[str] = None):
+    """
+    Push channel of the caller's inbox: admin messages for a garage, garage
+    messages for a remorqueur. Authenticated with the access token (query
+    parameter or X-Deliver-Auth header). Handshake: messages newer than
+    `cursor` are replayed, then {"type": "ready"} is sent and live events follow.
+    A {"type": "resync"} event means the client must reload its inbox page.
+    The socket is closed with 1008 when the access token expires or its
+    account's tokens are revoked (deactivated, deleted, new password...).
+    """
+    try:
+        payload = await decode_access_token(token or websocket.headers.get("X-Deliver-Auth"))
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    kind = str(payload["role"]).lower()
+    if kind not in ("garage", "remorqueur"):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    owner_id = int(payload["sub"])
+    expires_at = float(payload["exp"])
+
+    await websocket.accept()
+    pubsub = get_pubsub()
+    async with PrimarySessionLocal() as db:
+        sender_id = await get_broadcast_sender_id(kind, owner_id, db)
+    channels = [inbox_channel(kind, owner_id)]
+    if sender_id is not None:
+        # Broadcasts are published once per sender, not once per recipient
+        channels.append(inbox_channel(BROADCAST_CHANNELS[kind], sender_id))
+
+    # Subscribe before replaying so nothing published in between is lost;
+    # clients de-duplicate by message id
+    subscription = await pubsub.subscribe(channels)
+    try:
+        if cursor:
+            try:
+                async with PrimarySessionLocal() as db:
+                    events, truncated = await get_inbox_updates_logic(
+                        kind, owner_id, cursor, db, REALTIME_REPLAY_LIMIT
+                    )
+            except HTTPException:
+                # Unreadable cursor: same as too many missed messages
+                events, truncated = [], True
+            if truncated:
+                await websocket.send_json({"type": "resync"})
+            else:
+                for event in events:
+                    await websocket.send_json(event)
+        await websocket.send_json({"type": "ready"})
+
+        next_check = time.time() + REALTIME_TOKEN_CHECK_SECONDS
+        while True:
+            now = time.time()
+            if now >= expires_at:
+                await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Token expired")
+                return
+            if now >= next_check:
+                if await token_store.is_subject_revoked(payload["role"], payload["sub"], payload.get("iat")):
+                    await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Token revoked")
+                    return
+                next_check = now + REALTIME_TOKEN_CHECK_SECONDS
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), min(expires_at, next_check) - now)
+            except asyncio.TimeoutError:
+                continue
+            if event is None:
+                # Fell too far behind: the client reconnects with its last cursor
+                await websocket.send_json({"type": "resync"})
+                await websocket.close()
+                return
+            await websocket.send_json(event)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await pubsub.unsubscribe(subscription)
 # =================== END MESSAGES =================#
 # =================== Garages =================#
 @remorqueur_router.post("/api/v1/create_remorqueur", 
-                        response_model=RemorqueurResponse, status_code=status.HTTP_201_CREATED)
+                        response_model=RemorqueurResponse, status_code=status.HTTP_201_CREATED,
+                        dependencies=[Depends(require_permission("create_remorqueur"))])
 async def create_remorqueur_endpoint(
     request: Request,
     remorqueur_data: CreateRemorqueurRequest,
@@ -735,17 +1208,50 @@ async def create_remorqueur_endpoint(
 ):
     return await create_remorqueur(request, db, remorqueur_data)
 
+@remorqueur_router.post("/api/v1/bulk_create_remorqueurs",
+                        response_model=BulkCreateRemorqueursResponse)
+async def bulk_create_remorqueurs_endpoint(
+    request: Request,
+    principal: AuthPrincipal = Depends(require_permission("create_remorqueur")),
+    db: AsyncSession = Depends(get_primary_db)
+):
+    """
+    Onboard the caller's drivers in one call: text/csv with the header
+    name,tel,username,password, or a JSON list of the same objects.
+    Returns one result per row.
+    """
+    rows = await read_bulk_remorqueur_rows(request)
+    return await bulk_create_remorqueurs(principal, rows, db)
+
+@remorqueur_router.post("/api/v1/report_position", status_code=status.HTTP_204_NO_CONTENT)
+async def report_position_endpoint(
+    report: PositionReport,
+    principal: AuthPrincipal = Depends(authenticate),
+    db: AsyncSession = Depends(get_primary_db)
+):
+    """Called by the driver app every few seconds while on the road; kept in memory only"""
+    await report_position_logic(principal, report.lat, report.lon, db)
+
+@remorqueur_router.post("/api/v1/heartbeat", response_model=dict)
+async def heartbeat_endpoint(
+    principal: AuthPrincipal = Depends(authenticate),
+    db: AsyncSession = Depends(get_primary_db)
+):
+    """Sent by the driver app while on shift; the driver is online until the beats stop"""
+    return await heartbeat_logic(principal, db)
+
 @remorqueur_router.get("/api/v1/get_garage_remorqueurs/", 
                        response_model=List[RemorqueurResponse])
 async def get_garage_remorqueurs_endpoint(
     request: Request,
-    current_user: User = Depends(authenticate),
+    current_user: AuthPrincipal = Depends(authenticate),
     db: AsyncSession = Depends(get_primary_db)
 ):
     return await get_garage_remorqueurs(db, current_user)
 
 @remorqueur_router.put("/api/v1/update_remorqueur/{remorqueur_id}", 
-                       response_model=RemorqueurResponse)
+                       response_model=RemorqueurResponse,
+                       dependencies=[Depends(require_permission("update_remorqueur"))])
 async def update_remorqueur_endpoint(
     request: Request,
     remorqueur_id: int,
@@ -755,7 +1261,8 @@ async def update_remorqueur_endpoint(
     return await update_remorqueur(request, db, remorqueur_id, update_data)
 
 @remorqueur_router.delete("/api/v1/delete_remorqueur/{remorqueur_id}", 
-                         response_model=dict)
+                         response_model=dict,
+                         dependencies=[Depends(require_permission("delete_remorqueur"))])
 async def delete_remorqueur_endpoint(
     request: Request,
     remorqueur_id: int,
@@ -763,6 +1270,26 @@ async def delete_remorqueur_endpoint(
 ):
     return await delete_remorqueur(request, db, remorqueur_id)
 
+@remorqueur_router.put("/api/v1/bulk_update_remorqueurs_status",
+                       response_model=BulkRemorqueurActionResponse)
+async def bulk_update_remorqueurs_status_endpoint(
+    request: BulkRemorqueurStatusRequest,
+    principal: AuthPrincipal = Depends(require_permission("update_remorqueur")),
+    db: AsyncSession = Depends(get_primary_db)
+):
+    """Activate or deactivate several of the caller's remorqueurs at once"""
+    return await bulk_set_remorqueurs_active(principal, request.remorqueur_ids, request.is_active, db)
+
+@remorqueur_router.post("/api/v1/bulk_delete_remorqueurs",
+                        response_model=BulkRemorqueurActionResponse)
+async def bulk_delete_remorqueurs_endpoint(
+    request: BulkRemorqueurIdsRequest,
+    principal: AuthPrincipal = Depends(require_permission("delete_remorqueur")),
+    db: AsyncSession = Depends(get_primary_db)
+):
+    """Delete several of the caller's remorqueurs at once"""
+    return await bulk_delete_remorqueurs(principal, request.remorqueur_ids, db)
+
 @garage_router.put("/api/v1/update_garage", status_code=status.HTTP_200_OK)
 async def update_garage_endpoint(
     request: Request,
@@ -1219,9 +1746,22 @@ async def test_ftp_connection_endpoint():
 @auth_router.post("/api/v1/login", response_model=LoginResponse)
 async def login_endpoint(
     request: LoginRequest, 
+    fastapi_request: Request,
     db: AsyncSession = Depends(get_primary_db)
 ):
-    return await process_login(db, request)
+    client_ip = fastapi_request.client.host if fastapi_request.client else None
+    return await process_login(db, request, client_ip)
+
+@auth_router.post("/api/v1/refresh", response_model=LoginResponse)
+async def refresh_endpoint(
+    request: RefreshTokenRequest,
+    db: AsyncSession = Depends(get_primary_db)
+):
+    return await process_refresh(db, request)
+
+@auth_router.post("/api/v1/logout", response_model=dict)
+async def logout_endpoint(request: RefreshTokenRequest):
+    return await process_logout(request)
 
 
 @app.get("/api/v1/years", response_model=YearsResponse)
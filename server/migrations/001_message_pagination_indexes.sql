@@ -0,0 +1,10 @@
+-- Keyset pagination of message listings on (created_at, id),
+-- and inbox lookups by recipient instead of by message.
+CREATE INDEX IF NOT EXISTS ix_admin_messages_created
+    ON admin_messages (created_at, id);
+CREATE INDEX IF NOT EXISTS ix_garage_messages_garage_created
+    ON garage_messages (garage_id, created_at, id);
+CREATE INDEX IF NOT EXISTS ix_admin_message_recipients_garage
+    ON admin_message_recipients (garage_id, message_id);
+CREATE INDEX IF NOT EXISTS ix_garage_message_recipients_remorqueur
+    ON garage_message_recipients (remorqueur_id, message_id);
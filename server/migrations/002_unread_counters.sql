@@ -0,0 +1,18 @@
+-- Denormalized unread counters, kept in step with the recipient tables
+-- by messagesController in the same transaction as each write.
+ALTER TABLE garages
+    ADD COLUMN IF NOT EXISTS unread_admin_messages INT NOT NULL DEFAULT 0;
+ALTER TABLE remorqueurs
+    ADD COLUMN IF NOT EXISTS unread_garage_messages INT NOT NULL DEFAULT 0;
+
+-- Backfill from the existing read receipts
+UPDATE garages g
+    SET g.unread_admin_messages = (
+        SELECT COUNT(*) FROM admin_message_recipients r
+        WHERE r.garage_id = g.id AND r.is_read = 0
+    );
+UPDATE remorqueurs rq
+    SET rq.unread_garage_messages = (
+        SELECT COUNT(*) FROM garage_message_recipients r
+        WHERE r.remorqueur_id = rq.id AND r.is_read = 0
+    );
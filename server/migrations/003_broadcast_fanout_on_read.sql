@@ -0,0 +1,18 @@
+-- to_all messages are stored once and resolved at read time against their
+-- audience; recipient rows of such broadcasts only hold read receipts.
+-- Existing broadcasts keep their materialized rows (fanout_on_read = 0).
+ALTER TABLE admin_messages
+    ADD COLUMN IF NOT EXISTS fanout_on_read TINYINT(1) NOT NULL DEFAULT 0;
+ALTER TABLE garage_messages
+    ADD COLUMN IF NOT EXISTS fanout_on_read TINYINT(1) NOT NULL DEFAULT 0;
+CREATE INDEX IF NOT EXISTS ix_admin_messages_broadcast
+    ON admin_messages (admin_id, fanout_on_read, created_at, id);
+
+-- Unread = direct counter + broadcasts sent to the audience - broadcasts read
+ALTER TABLE users
+    ADD COLUMN IF NOT EXISTS broadcast_count INT NOT NULL DEFAULT 0;
+ALTER TABLE garages
+    ADD COLUMN IF NOT EXISTS broadcast_count INT NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS read_broadcast_count INT NOT NULL DEFAULT 0;
+ALTER TABLE remorqueurs
+    ADD COLUMN IF NOT EXISTS read_broadcast_count INT NOT NULL DEFAULT 0;
@@ -0,0 +1,17 @@
+-- Recipients of large sends are written in batches by the delivery worker.
+CREATE TABLE IF NOT EXISTS message_delivery_jobs (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    inbox VARCHAR(20) NOT NULL,
+    message_id INT NOT NULL,
+    sender_id INT NOT NULL,
+    recipient_ids MEDIUMTEXT NOT NULL,
+    total INT NOT NULL,
+    delivered INT NOT NULL DEFAULT 0,
+    invalid_ids MEDIUMTEXT NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    attempts INT NOT NULL DEFAULT 0,
+    error TEXT NULL,
+    created_at DATETIME NOT NULL,
+    updated_at DATETIME NOT NULL,
+    INDEX ix_message_delivery_jobs_status (status, id)
+);
@@ -0,0 +1,47 @@
+-- Messages past MESSAGE_RETENTION_DAYS are moved here in small batches,
+-- keeping the hot tables limited to recent data.
+CREATE INDEX IF NOT EXISTS ix_garage_messages_created
+    ON garage_messages (created_at, id);
+
+CREATE TABLE IF NOT EXISTS admin_messages_archive (
+    id INT PRIMARY KEY,
+    title VARCHAR(255) NOT NULL,
+    content TEXT NOT NULL,
+    created_at DATETIME NULL,
+    admin_id INT NOT NULL,
+    to_all TINYINT(1) NOT NULL DEFAULT 0,
+    fanout_on_read TINYINT(1) NOT NULL DEFAULT 0,
+    archived_at DATETIME NOT NULL,
+    INDEX ix_admin_messages_archive_created (created_at, id),
+    INDEX ix_admin_messages_archive_broadcast (admin_id, fanout_on_read, created_at, id)
+);
+
+CREATE TABLE IF NOT EXISTS garage_messages_archive (
+    id INT PRIMARY KEY,
+    title VARCHAR(255) NOT NULL,
+    content TEXT NOT NULL,
+    created_at DATETIME NULL,
+    garage_id INT NOT NULL,
+    to_all TINYINT(1) NOT NULL DEFAULT 0,
+    fanout_on_read TINYINT(1) NOT NULL DEFAULT 0,
+    archived_at DATETIME NOT NULL,
+    INDEX ix_garage_messages_archive_garage_created (garage_id, created_at, id)
+);
+
+CREATE TABLE IF NOT EXISTS admin_message_recipients_archive (
+    message_id INT NOT NULL,
+    garage_id INT NOT NULL,
+    is_read TINYINT(1) NOT NULL DEFAULT 0,
+    archived_at DATETIME NOT NULL,
+    PRIMARY KEY (message_id, garage_id),
+    INDEX ix_admin_message_recipients_archive_garage (garage_id, message_id)
+);
+
+CREATE TABLE IF NOT EXISTS garage_message_recipients_archive (
+    message_id INT NOT NULL,
+    remorqueur_id INT NOT NULL,
+    is_read TINYINT(1) NOT NULL DEFAULT 0,
+    archived_at DATETIME NOT NULL,
+    PRIMARY KEY (message_id, remorqueur_id),
+    INDEX ix_garage_message_recipients_archive_remorqueur (remorqueur_id, message_id)
+);
@@ -0,0 +1,5 @@
+-- Keyword search over message title and content (InnoDB FULLTEXT, boolean mode).
+ALTER TABLE admin_messages
+    ADD FULLTEXT INDEX IF NOT EXISTS ft_admin_messages_text (title, content);
+ALTER TABLE garage_messages
+    ADD FULLTEXT INDEX IF NOT EXISTS ft_garage_messages_text (title, content);
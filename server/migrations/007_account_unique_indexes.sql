@@ -0,0 +1,13 @@
+-- Account writes no longer pre-check names with a SELECT: the unique
+-- indexes below reject duplicates and the controllers map the index name
+-- (see authController.duplicate_key) to the matching 400. The names are
+-- the ones create_all gives to unique=True columns, so existing indexes
+-- are kept as they are.
+ALTER TABLE garages
+    ADD UNIQUE INDEX IF NOT EXISTS name (name),
+    ADD UNIQUE INDEX IF NOT EXISTS email (email),
+    ADD UNIQUE INDEX IF NOT EXISTS username (username);
+ALTER TABLE remorqueurs
+    ADD UNIQUE INDEX IF NOT EXISTS username (username);
+ALTER TABLE users
+    ADD UNIQUE INDEX IF NOT EXISTS username (username);
@@ -0,0 +1,6 @@
+-- Last presence transition of each driver. Heartbeats only live in memory
+-- (or Redis); presenceController writes these columns when a driver comes
+-- online or its heartbeats stop.
+ALTER TABLE remorqueurs
+    ADD COLUMN IF NOT EXISTS is_online TINYINT(1) NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS last_seen_at DATETIME NULL;
@@ -0,0 +1,24 @@
+-- Caller ID lookups: tel in E.164 form, written by the application
+-- (phoneController.normalize_tel) and indexed.
+ALTER TABLE remorqueurs
+    ADD COLUMN IF NOT EXISTS tel_normalized VARCHAR(20) NULL;
+CREATE INDEX IF NOT EXISTS ix_remorqueurs_tel_normalized
+    ON remorqueurs (tel_normalized);
+
+-- Backfill with the same rules: drop extensions, keep digits, then
+-- +<digits> (leading + or 011), +1<10 digits>, +<11 digits starting with 1>
+UPDATE remorqueurs r
+    JOIN (
+        SELECT id,
+               TRIM(REGEXP_REPLACE(tel, '(?i)\\s*(ext\\.?|x|#).*$', '')) AS number,
+               REGEXP_REPLACE(REGEXP_REPLACE(tel, '(?i)\\s*(ext\\.?|x|#).*$', ''), '[^0-9]', '') AS digits
+        FROM remorqueurs
+    ) t ON t.id = r.id
+    SET r.tel_normalized = CASE
+        WHEN t.number LIKE '+%' AND LENGTH(t.digits) BETWEEN 8 AND 15 THEN CONCAT('+', t.digits)
+        WHEN t.digits LIKE '011%' AND LENGTH(t.digits) BETWEEN 11 AND 18 THEN CONCAT('+', SUBSTRING(t.digits, 4))
+        WHEN LENGTH(t.digits) = 10 THEN CONCAT('+1', t.digits)
+        WHEN LENGTH(t.digits) = 11 AND t.digits LIKE '1%' THEN CONCAT('+', t.digits)
+        ELSE NULL
+    END
+    WHERE r.tel_normalized IS NULL;
@@ -0,0 +1,8 @@
+-- Admin account search (accountSearchController) matches prefixes of:
+--   garages.name / email / username     -> the unique indexes of migration 007
+--   remorqueurs.username                -> unique index of migration 007
+--   remorqueurs.tel_normalized          -> ix_remorqueurs_tel_normalized (009)
+--   remorqueurs.name                    -> the prefix index below
+-- 32 characters of a name are enough to narrow a LIKE 'term%' range scan.
+CREATE INDEX IF NOT EXISTS ix_remorqueurs_name_prefix
+    ON remorqueurs (name(32));
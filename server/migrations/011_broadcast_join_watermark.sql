@@ -0,0 +1,9 @@
+-- Broadcasts sent before an account existed were never sent to it. New
+-- garages and remorqueurs record the id of their sender's last broadcast
+-- (messagesController.broadcast_join_values): only later broadcasts reach
+-- their inbox, and the earlier ones start out counted as read.
+-- Existing accounts keep 0, i.e. every broadcast of their sender.
+ALTER TABLE garages
+    ADD COLUMN IF NOT EXISTS broadcast_watermark INT NOT NULL DEFAULT 0;
+ALTER TABLE remorqueurs
+    ADD COLUMN IF NOT EXISTS broadcast_watermark INT NOT NULL DEFAULT 0;
@@ -57,9 +57,25 @@ class LoginResponse(BaseModel):
     role: RoleResponse
     expires_at: datetime
     garage_name: Optional[str] = None
+    refresh_token: Optional[str] = None
+    refresh_expires_at: Optional[datetime] = None
     
     model_config = ConfigDict(from_attributes=True)
 
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
+
+# Identity carried by a validated access token (no DB lookup)
+class AuthPrincipal(BaseModel):
+    id: int
+    username: Optional[str] = None
+    role: str
+    # Account's roles row; role is only the account type for garages and remorqueurs
+    role_id: Optional[int] = None
+    permissions: List[str] = []
+    # Remorqueur tokens only
+    garage_id: Optional[int] = None
+
 class AllUsers(BaseModel):
     id: int
     username: str
@@ -101,6 +117,8 @@ class User(Base):
     role_id = Column(Integer, ForeignKey('roles.id'), nullable=False)
     role = relationship('Role', back_populates='users')
     is_active = Column(Boolean, default=False, nullable=False)
+    # to_all admin messages stored once for the garages this admin created
+    broadcast_count = Column(Integer, default=0, nullable=False)
 
 garage_message_recipients = Table(
     'garage_message_recipients',
@@ -42,6 +42,13 @@ class Garage(Base):
     payment_status = Column(String(50))
     payment_session_id = Column(String(255))
     stripe_customer_id = Column(String(255), nullable=True) 
+    # Maintained with admin_message_recipients, see messagesController
+    unread_admin_messages = Column(Integer, default=0, nullable=False)
+    # Admin broadcasts read, and broadcasts sent to its remorqueurs (fan-out on read)
+    read_broadcast_count = Column(Integer, default=0, nullable=False)
+    # Last admin broadcast sent before the garage was created: older ones are not its own
+    broadcast_watermark = Column(Integer, default=0, nullable=False)
+    broadcast_count = Column(Integer, default=0, nullable=False)
   
     role = relationship('Role', backref='garages')
     created_by = relationship('User')
@@ -1,7 +1,7 @@
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Optional, Union
 import pytz
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, String, Table
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Index, Integer, String, Table, Text
 from sqlalchemy.orm import relationship
 from pydantic import BaseModel
 from server.models.authModel import Base
@@ -16,6 +16,25 @@ class AdminMessageRequest(BaseModel):
 class GarageMessageRequest(BaseModel):
     remorqueur_id: int  
 
+class UnreadCountResponse(BaseModel):
+    unread: int
+
+# Bulk read state: the listed messages, or when message_ids is omitted every
+# message up to and including the one up_to_cursor points at (all if no cursor)
+class BulkReadAdminMessagesRequest(BaseModel):
+    garage_id: int
+    message_ids: Optional[List[int]] = None
+    up_to_cursor: Optional[str] = None
+
+class BulkReadGarageMessagesRequest(BaseModel):
+    remorqueur_id: int
+    message_ids: Optional[List[int]] = None
+    up_to_cursor: Optional[str] = None
+
+class BulkReadResponse(BaseModel):
+    updated: int
+    unread: int
+
 class DeleteMessageRequest(BaseModel):
     message_id: int
     
@@ -41,6 +60,9 @@ class GarageMessageCreate(BaseModel):
     to_all: bool
     garage_id: int  
     remorqueur_ids: Optional[List[int]] = None
+    # Only drivers currently online (heartbeat presence): with to_all, every
+    # online driver of the garage; otherwise the online ones of remorqueur_ids
+    online_only: bool = False
 
 class AdminMessageResponse(BaseModel):
     id: int
@@ -50,6 +72,8 @@ class AdminMessageResponse(BaseModel):
     to_all: bool
     garage_ids: Optional[List[int]] = None
     is_read: bool = False
+    # Set when recipients are written by the delivery queue
+    delivery_job_id: Optional[int] = None
 
 
 class GarageMessageResponse(BaseModel):
@@ -60,10 +84,47 @@ class GarageMessageResponse(BaseModel):
     to_all: bool
     remorqueur_ids: Optional[List[int]] = None
     is_read: bool = False
+    delivery_job_id: Optional[int] = None
+
+class DeliveryJobResponse(BaseModel):
+    id: int
+    inbox: str
+    message_id: int
+    status: str
+    total: int
+    delivered: int
+    invalid_ids: List[int] = []
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
 
 class DeleteMultipleMessagesRequest(BaseModel):
     message_ids: List[int]
 
+# Inbox list entry without the full content
+class MessageSummary(BaseModel):
+    id: int
+    title: str
+    preview: str
+    created_at: datetime
+    to_all: bool
+    is_read: bool = False
+
+class MessageSearchHit(MessageSummary):
+    score: float
+
+class MessageSearchPage(BaseModel):
+    items: List[MessageSearchHit]
+    next_cursor: Optional[str] = None
+
+class AdminMessagePage(BaseModel):
+    items: List[Union[AdminMessageResponse, MessageSummary]]
+    next_cursor: Optional[str] = None
+
+class GarageMessagePage(BaseModel):
+    items: List[Union[GarageMessageResponse, MessageSummary]]
+    next_cursor: Optional[str] = None
+
 class GarageMessage(Base):
     __tablename__ = 'garage_messages'
     
@@ -73,9 +134,20 @@ class GarageMessage(Base):
     created_at = Column(DateTime, default=get_eastern_time)
     garage_id = Column(Integer, ForeignKey('garages.id'), nullable=False) 
     to_all = Column(Boolean, default=False, nullable=False)
+    # Broadcast stored once: recipients are the garage's remorqueurs, rows only hold read receipts
+    fanout_on_read = Column(Boolean, default=False, nullable=False)
 
     remorqueurs = relationship('Remorqueur', secondary='garage_message_recipients', back_populates='garage_messages')
 
+    # Keyset pagination of a garage's sent messages on (created_at, id)
+    __table_args__ = (
+        Index('ix_garage_messages_garage_created', 'garage_id', 'created_at', 'id'),
+        # Retention scans by age across garages
+        Index('ix_garage_messages_created', 'created_at', 'id'),
+        # Keyword search
+        Index('ft_garage_messages_text', 'title', 'content', mysql_prefix='FULLTEXT'),
+    )
+
 
 class AdminMessage(Base):
     __tablename__ = 'admin_messages'
@@ -86,5 +158,75 @@ class AdminMessage(Base):
     created_at = Column(DateTime, default=get_eastern_time)
     admin_id = Column(Integer, ForeignKey('users.id'), nullable=False)  
     to_all = Column(Boolean, default=False, nullable=False)  
+    # Broadcast stored once: recipients are the admin's garages, rows only hold read receipts
+    fanout_on_read = Column(Boolean, default=False, nullable=False)
+
+    garages = relationship('Garage', secondary='admin_message_recipients', back_populates='admin_messages')
+
+    # Keyset pagination on (created_at, id)
+    __table_args__ = (
+        Index('ix_admin_messages_created', 'created_at', 'id'),
+        # Broadcasts of one admin, resolved at read time
+        Index('ix_admin_messages_broadcast', 'admin_id', 'fanout_on_read', 'created_at', 'id'),
+        # Keyword search
+        Index('ft_admin_messages_text', 'title', 'content', mysql_prefix='FULLTEXT'),
+    )
+
+class ArchivedAdminMessage(Base):
+    """Admin messages past the retention period, moved out of the hot table"""
+    __tablename__ = 'admin_messages_archive'
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    title = Column(String, nullable=False)
+    content = Column(String, nullable=False)
+    created_at = Column(DateTime)
+    admin_id = Column(Integer, nullable=False)
+    to_all = Column(Boolean, default=False, nullable=False)
+    fanout_on_read = Column(Boolean, default=False, nullable=False)
+    archived_at = Column(DateTime, default=get_eastern_time, nullable=False)
+
+    __table_args__ = (
+        Index('ix_admin_messages_archive_created', 'created_at', 'id'),
+        Index('ix_admin_messages_archive_broadcast', 'admin_id', 'fanout_on_read', 'created_at', 'id'),
+    )
+
 
-    garages = relationship('Garage', secondary='admin_message_recipients', back_populates='admin_messages')
\ No newline at end of file
+class ArchivedGarageMessage(Base):
+    """Garage messages past the retention period, moved out of the hot table"""
+    __tablename__ = 'garage_messages_archive'
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    title = Column(String, nullable=False)
+    content = Column(String, nullable=False)
+    created_at = Column(DateTime)
+    garage_id = Column(Integer, nullable=False)
+    to_all = Column(Boolean, default=False, nullable=False)
+    fanout_on_read = Column(Boolean, default=False, nullable=False)
+    archived_at = Column(DateTime, default=get_eastern_time, nullable=False)
+
+    __table_args__ = (
+        Index('ix_garage_messages_archive_garage_created', 'garage_id', 'created_at', 'id'),
+    )
+
+
+class MessageDeliveryJob(Base):
+    """Recipients of a large send, written in batches by the delivery worker"""
+    __tablename__ = 'message_delivery_jobs'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    inbox = Column(String(20), nullable=False)          # "garage" (admin message) or "remorqueur" (garage message)
+    message_id = Column(Integer, nullable=False)
+    sender_id = Column(Integer, nullable=False)         # admin id or garage id, used to validate recipients
+    recipient_ids = Column(Text, nullable=False)        # JSON list, deduplicated
+    total = Column(Integer, nullable=False)
+    delivered = Column(Integer, default=0, nullable=False)
+    invalid_ids = Column(Text, default="[]", nullable=False)
+    status = Column(String(20), default="pending", nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=get_eastern_time, nullable=False)
+    updated_at = Column(DateTime, default=get_eastern_time, nullable=False)
+
+    __table_args__ = (
+        Index('ix_message_delivery_jobs_status', 'status', 'id'),
+    )
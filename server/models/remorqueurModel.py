@@ -1,8 +1,8 @@
 # server/models/remorqueurModel.py
-from typing import Optional
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey
+from typing import List, Optional
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from server.models.authModel import Base
 
 class RemorqueurBase(BaseModel):
@@ -29,20 +29,100 @@ class UpdateRemorqueurRequest(BaseModel):
     password: Optional[str] = None
     is_active: Optional[bool] = None
 
+class BulkRemorqueurRow(BaseModel):
+    name: str
+    tel: str
+    username: str
+    password: str
+
+class BulkRemorqueurResult(BaseModel):
+    row: int
+    username: Optional[str] = None
+    status: str  # "created" or "error"
+    id: Optional[int] = None
+    error: Optional[str] = None
+
+class BulkCreateRemorqueursResponse(BaseModel):
+    created: int
+    failed: int
+    results: List[BulkRemorqueurResult]
+
+class BulkRemorqueurStatusRequest(BaseModel):
+    remorqueur_ids: List[int]
+    is_active: bool
+
+class BulkRemorqueurIdsRequest(BaseModel):
+    remorqueur_ids: List[int]
+
+class BulkRemorqueurActionResult(BaseModel):
+    id: int
+    status: str  # "updated", "unchanged", "deleted" or "not_found"
+
+class BulkRemorqueurActionResponse(BaseModel):
+    affected: int
+    results: List[BulkRemorqueurActionResult]
+
+class PositionReport(BaseModel):
+    lat: float = Field(..., ge=-90, le=90)
+    lon: float = Field(..., ge=-180, le=180)
+
+class NearbyRemorqueur(BaseModel):
+    id: int
+    name: str
+    tel: str
+    lat: float
+    lon: float
+    distance_km: float
+    reported_at: float  # epoch seconds
+
+class NearbyRemorqueursResponse(BaseModel):
+    garage_id: int
+    items: List[NearbyRemorqueur]
+
+class PhoneLookupMatch(BaseModel):
+    remorqueur_id: int
+    name: str
+    tel: str
+    is_active: bool
+    garage_id: int
+    garage_name: str
+
+class PhoneLookupResponse(BaseModel):
+    tel: str  # normalized
+    matches: List[PhoneLookupMatch]
+
 class Remorqueur(Base):
     __tablename__ = 'remorqueurs'
     id = Column(Integer, primary_key=True, autoincrement=True)
     name = Column(String, nullable=False)
     tel = Column(String, nullable=False)
+    # E.164 form of tel, written with it (see phoneController.normalize_tel)
+    tel_normalized = Column(String(20), nullable=True)
     username = Column(String, unique=True, nullable=False)
     password = Column(String, nullable=False)
     role_id = Column(Integer, ForeignKey('roles.id'), nullable=False)
     garage_id = Column(Integer, ForeignKey('garages.id'), nullable=False)
     is_active = Column(Boolean, default=True, nullable=False)
+    # Maintained with garage_message_recipients, see messagesController
+    unread_garage_messages = Column(Integer, default=0, nullable=False)
+    # Garage broadcasts read (fan-out on read)
+    read_broadcast_count = Column(Integer, default=0, nullable=False)
+    # Last garage broadcast sent before the remorqueur was created: older ones are not its own
+    broadcast_watermark = Column(Integer, default=0, nullable=False)
+    # Last presence transition, see presenceController (live state is in memory)
+    is_online = Column(Boolean, default=False, nullable=False)
+    last_seen_at = Column(DateTime, nullable=True)
     
     role = relationship('Role', backref='remorqueurs')
     garage = relationship('Garage', back_populates='remorqueurs')
 
     garage_messages = relationship('GarageMessage', secondary='garage_message_recipients', back_populates='remorqueurs')
 
+    __table_args__ = (
+        # Caller ID lookups
+        Index('ix_remorqueurs_tel_normalized', 'tel_normalized'),
+        # Admin account search (name prefixes, see accountSearchController)
+        Index('ix_remorqueurs_name_prefix', 'name', mysql_length=32),
+    )
+
 
@@ -45,6 +45,8 @@ class RemorqueurResponse(BaseModel):
     role: RoleResponse
     garage_name: str
     is_active: bool
+    # Heartbeat presence, filled in by roster views
+    is_online: Optional[bool] = None
     
     model_config = ConfigDict(from_attributes=True)
 
@@ -69,3 +71,54 @@ class GarageWithRemorqueursResponse(GarageBaseResponse):
 class RemorqueurWithGarageResponse(RemorqueurBaseResponse):
     garage: Optional[GarageBaseResponse] = None
 
+
+# Account search, see accountSearchController
+class GarageSearchHit(BaseModel):
+    id: int
+    name: str
+    email: str
+    username: str
+    is_active: bool
+    payment_status: Optional[str] = None
+
+class RemorqueurSearchHit(BaseModel):
+    id: int
+    name: str
+    username: str
+    tel: str
+    is_active: bool
+    garage_id: int
+    garage_name: str
+
+class GarageSearchPage(BaseModel):
+    items: List[GarageSearchHit]
+    next_cursor: Optional[str] = None
+    source: str  # "index" or "db"
+
+class RemorqueurSearchPage(BaseModel):
+    items: List[RemorqueurSearchHit]
+    next_cursor: Optional[str] = None
+    source: str
+
+
+# Garage dashboard, one response for the whole page
+class GarageDriverCounts(BaseModel):
+    total: int
+    active: int
+    inactive: int
+    online: int
+
+class GarageSendStats(BaseModel):
+    window_days: int
+    sent_last_7_days: int
+    sent_in_window: int
+    broadcasts_in_window: int
+    direct_recipients_in_window: int
+    direct_reads_in_window: int
+    last_sent_at: Optional[datetime] = None
+
+class GarageDashboardResponse(BaseModel):
+    profile: GarageResponse
+    drivers: GarageDriverCounts
+    unread_admin_messages: int
+    sends: GarageSendStats
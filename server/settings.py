@@ -24,6 +24,12 @@ if ARGON2_SECRET_KEY is None:
 DISPATCH_ADMIN_KEY = os.getenv("DISPATCH_ADMIN_KEY")
 if DISPATCH_ADMIN_KEY is None:
     raise ValueError("DISPATCH_ADMIN_KEY environment variable is not set")
+
+# Optional: shared state between uvicorn workers (token store, etc.)
+REDIS_URL = os.getenv("REDIS_URL")
+
+# uvicorn workers per machine (uvicorn reads the same variable for --workers)
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", 1))
 # ---------------------------------------------
 
 # Define EnvironmentType before using it
@@ -104,3 +110,15 @@ async def get_primary_db() -> AsyncSession:
             yield session
         finally:
             await session.close()
+
+# Shared Redis client, only created when REDIS_URL is set
+_redis_client = None
+
+def get_redis_client():
+    global _redis_client
+    if REDIS_URL is None:
+        return None
+    if _redis_client is None:
+        import redis.asyncio as aioredis
+        _redis_client = aioredis.from_url(REDIS_URL, decode_responses=True)
+    return _redis_client
@@ -0,0 +1,48 @@
+import os
+from contextlib import asynccontextmanager
+
+# settings.py refuses to import without these; the tests never use real secrets
+os.environ.setdefault("JWE_SECRET_KEY", "test-jwe-secret")
+os.environ.setdefault("ARGON2_SECRET_KEY", "test-argon2-pepper")
+os.environ.setdefault("DISPATCH_ADMIN_KEY", "test-dispatch-key")
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import StaticPool
+from server.controllers import messagesController  # noqa: F401  (registers the recipient tables)
+from server.models.authModel import Base
+
+
+class QueryCounter:
+    """Statements sent to the database while enabled"""
+
+    def __init__(self):
+        self.count = 0
+        self.enabled = False
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if self.enabled:
+            self.count += 1
+
+    @asynccontextmanager
+    async def counting(self):
+        self.count, self.enabled = 0, True
+        try:
+            yield self
+        finally:
+            self.enabled = False
+
+
+@asynccontextmanager
+async def sqlite_session():
+    """A session on a fresh in-memory SQLite schema, plus a query counter on its engine"""
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    counter = QueryCounter()
+    event.listen(engine.sync_engine, "before_cursor_execute", counter)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    try:
+        async with AsyncSession(bind=engine, expire_on_commit=False) as db:
+            yield db, counter
+    finally:
+        await engine.dispose()
@@ -0,0 +1,38 @@
+"""
+Account search sits on admin_router, which only checks the token: the
+endpoints themselves must turn away garage and remorqueur accounts.
+"""
+import pytest
+from fastapi.testclient import TestClient
+from server.main import app, authenticate
+from server.models.authModel import AuthPrincipal
+
+ENDPOINTS = [
+    "/admin/api/v1/search_garages?q=tremblay",
+    "/admin/api/v1/search_remorqueurs?q=tremblay",
+    "/admin/api/v1/account_index_stats",
+]
+
+
+def client_as(role: str) -> TestClient:
+    app.dependency_overrides[authenticate] = lambda: AuthPrincipal(id=1, username=role, role=role)
+    return TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def clear_overrides():
+    yield
+    app.dependency_overrides.clear()
+
+
+@pytest.mark.parametrize("role", ["garage", "remorqueur"])
+@pytest.mark.parametrize("endpoint", ENDPOINTS)
+def test_account_search_forbidden_to_accounts(role, endpoint):
+    response = client_as(role).get(endpoint, headers={"X-Deliver-Auth": "token"})
+    assert response.status_code == 403
+
+
+@pytest.mark.parametrize("role", ["superadmin", "apdq"])
+def test_account_index_stats_open_to_staff(role):
+    response = client_as(role).get(ENDPOINTS[-1], headers={"X-Deliver-Auth": "token"})
+    assert response.status_code == 200
@@ -0,0 +1,61 @@
+"""
+Broadcasts are resolved at read time against the sender's audience; an
+account created after a broadcast must not find it in its inbox or badge.
+"""
+import asyncio
+from sqlalchemy import insert, update
+from server.controllers.messagesController import (
+    broadcast_join_values,
+    get_admin_messages_logic,
+    get_unread_count_logic,
+    unread_cache,
+)
+from server.models.authModel import Role, User
+from server.models.garageModel import Garage
+from server.models.messagesModel import AdminMessage
+from server.tests.conftest import sqlite_session
+
+ADMIN_ID, OLD_GARAGE_ID, NEW_GARAGE_ID = 1, 1, 2
+
+
+async def broadcast(db, message_id: int):
+    await db.execute(insert(AdminMessage).values(
+        id=message_id, title=f"t{message_id}", content="c", admin_id=ADMIN_ID, to_all=True, fanout_on_read=True,
+    ))
+    await db.execute(update(User).where(User.id == ADMIN_ID).values(broadcast_count=User.broadcast_count + 1))
+    await db.commit()
+
+
+async def create_garage(db, garage_id: int):
+    await db.execute(insert(Garage).values(
+        id=garage_id, name=f"garage{garage_id}", email=f"garage{garage_id}@example.com",
+        username=f"garage{garage_id}", password="x", role_id=1, created_by_id=ADMIN_ID,
+        **await broadcast_join_values("garage", ADMIN_ID, db),
+    ))
+    await db.commit()
+
+
+async def inboxes() -> dict:
+    async with sqlite_session() as (db, _):
+        await db.execute(insert(Role).values(id=1, name="admin"))
+        await db.execute(insert(User).values(id=ADMIN_ID, username="admin", password="x", role_id=1))
+        await create_garage(db, OLD_GARAGE_ID)
+        for message_id in (1, 2, 3):
+            await broadcast(db, message_id)
+        await create_garage(db, NEW_GARAGE_ID)
+        await broadcast(db, 4)
+
+        unread_cache.invalidate("garage")
+        return {
+            garage_id: (
+                sorted(message.id for message in await get_admin_messages_logic(garage_id, db)),
+                await get_unread_count_logic("garage", garage_id, db),
+            )
+            for garage_id in (OLD_GARAGE_ID, NEW_GARAGE_ID)
+        }
+
+
+def test_new_account_only_receives_later_broadcasts():
+    result = asyncio.run(inboxes())
+    assert result[OLD_GARAGE_ID] == ([1, 2, 3, 4], 4)
+    assert result[NEW_GARAGE_ID] == ([4], 1)
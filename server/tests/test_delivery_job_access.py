@@ -0,0 +1,54 @@
+"""
+Delivery jobs expose the message, progress and rejected ids of a send:
+only the sender may read them, and only through its own inbox endpoint.
+"""
+import asyncio
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from server.controllers.deliveryController import get_delivery_job_logic
+from server.controllers.messagesController import new_delivery_job
+from server.main import app, authenticate
+from server.models.authModel import AuthPrincipal
+from server.tests.conftest import sqlite_session
+
+OWNER_ID, OTHER_GARAGE_ID = 1, 2
+
+
+async def read_job(sender_id: int):
+    async with sqlite_session() as (db, _):
+        job = new_delivery_job("remorqueur", 10, OWNER_ID, [1, 2, 3])
+        db.add(job)
+        await db.commit()
+        return await get_delivery_job_logic(job.id, "remorqueur", sender_id, db)
+
+
+def test_sender_reads_its_job():
+    job = asyncio.run(read_job(OWNER_ID))
+    assert (job.message_id, job.total) == (10, 3)
+
+
+def test_other_sender_gets_not_found():
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(read_job(OTHER_GARAGE_ID))
+    assert error.value.status_code == 404
+
+
+@pytest.fixture
+def client_as():
+    def client(role: str) -> TestClient:
+        app.dependency_overrides[authenticate] = lambda: AuthPrincipal(id=1, username=role, role=role)
+        return TestClient(app)
+    yield client
+    app.dependency_overrides.clear()
+
+
+@pytest.mark.parametrize("role, endpoint", [
+    ("garage", "/admin/api/v1/admin_delivery_jobs/1"),
+    ("remorqueur", "/admin/api/v1/admin_delivery_jobs/1"),
+    ("superadmin", "/garages/api/v1/garage_delivery_jobs/1"),
+    ("remorqueur", "/garages/api/v1/garage_delivery_jobs/1"),
+])
+def test_job_endpoints_restricted_to_the_owning_role(client_as, role, endpoint):
+    response = client_as(role).get(endpoint, headers={"X-Deliver-Auth": "token"})
+    assert response.status_code == 403
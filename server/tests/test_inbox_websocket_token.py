@@ -0,0 +1,55 @@
+"""
+The inbox socket is authenticated once, at the handshake: it must still
+close when the access token expires or the account's tokens are revoked.
+"""
+import asyncio
+import time
+import jwt
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+from server import main
+from server.controllers.authController import ALGORITHM, SECRET_KEY
+from server.controllers.tokenController import token_store
+
+REMORQUEUR_ID = 4242
+
+
+def access_token(expires_in: float) -> str:
+    now = time.time()
+    return jwt.encode({
+        "sub": str(REMORQUEUR_ID), "iat": int(now) - 10, "exp": now + expires_in,
+        "type": "access", "role": "remorqueur", "permissions": [],
+    }, SECRET_KEY, algorithm=ALGORITHM)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    async def no_sender(kind, owner_id, db):
+        return None
+    # No broadcasts to subscribe to, so the handshake never touches the DB
+    monkeypatch.setattr(main, "get_broadcast_sender_id", no_sender)
+    monkeypatch.setattr(main, "REALTIME_TOKEN_CHECK_SECONDS", 0.2)
+    return TestClient(main.app)
+
+
+def close_code(client: TestClient, token: str, while_open=None) -> int:
+    with client.websocket_connect(f"/ws/v1/inbox?token={token}") as websocket:
+        assert websocket.receive_json() == {"type": "ready"}
+        if while_open:
+            while_open()
+        with pytest.raises(WebSocketDisconnect) as closed:
+            websocket.receive_json()
+    return closed.value.code
+
+
+def test_socket_closes_when_the_token_expires(client):
+    started = time.time()
+    assert close_code(client, access_token(expires_in=1)) == 1008
+    assert time.time() - started < 5
+
+
+def test_socket_closes_when_the_account_is_revoked(client):
+    def revoke():
+        asyncio.run(token_store.revoke_subject("remorqueur", REMORQUEUR_ID))
+    assert close_code(client, access_token(expires_in=900), revoke) == 1008
@@ -0,0 +1,83 @@
+"""
+The message listings must cost the same number of queries whatever the
+size of the inbox: recipients are loaded for the whole result set at once,
+never per message.
+"""
+import asyncio
+from sqlalchemy import insert
+from server.controllers.messagesController import (
+    admin_message_recipients,
+    garage_message_recipients,
+    get_admin_messages_logic,
+    get_all_admin_messages_logic,
+    get_all_garage_messages_logic,
+    get_garage_messages_logic,
+)
+from server.models.authModel import Role, User
+from server.models.garageModel import Garage
+from server.models.messagesModel import AdminMessage, GarageMessage
+from server.models.remorqueurModel import Remorqueur
+from server.tests.conftest import sqlite_session
+
+ADMIN_ID, GARAGE_ID, REMORQUEUR_ID = 1, 1, 1
+
+
+async def seed(db, message_count: int):
+    """One admin, garage and remorqueur, with message_count messages in each inbox (every other one a broadcast)"""
+    await db.execute(insert(Role).values(id=1, name="admin"))
+    await db.execute(insert(User).values(id=ADMIN_ID, username="admin", password="x", role_id=1))
+    await db.execute(insert(Garage).values(
+        id=GARAGE_ID, name="garage", email="garage@example.com", username="garage",
+        password="x", role_id=1, created_by_id=ADMIN_ID,
+    ))
+    await db.execute(insert(Remorqueur).values(
+        id=REMORQUEUR_ID, name="driver", tel="5145550123", username="driver",
+        password="x", role_id=1, garage_id=GARAGE_ID,
+    ))
+
+    message_ids = range(1, message_count + 1)
+    await db.execute(insert(AdminMessage).values([
+        {"id": i, "title": f"t{i}", "content": "c", "admin_id": ADMIN_ID,
+         "to_all": i % 2 == 0, "fanout_on_read": i % 2 == 0}
+        for i in message_ids
+    ]))
+    await db.execute(insert(GarageMessage).values([
+        {"id": i, "title": f"t{i}", "content": "c", "garage_id": GARAGE_ID,
+         "to_all": i % 2 == 0, "fanout_on_read": i % 2 == 0}
+        for i in message_ids
+    ]))
+    direct_ids = [i for i in message_ids if i % 2 == 1]
+    await db.execute(insert(admin_message_recipients).values([
+        {"message_id": i, "garage_id": GARAGE_ID, "is_read": False} for i in direct_ids
+    ]))
+    await db.execute(insert(garage_message_recipients).values([
+        {"message_id": i, "remorqueur_id": REMORQUEUR_ID, "is_read": False} for i in direct_ids
+    ]))
+    await db.commit()
+
+
+LISTINGS = {
+    "all admin messages": lambda db: get_all_admin_messages_logic(db),
+    "all garage messages": lambda db: get_all_garage_messages_logic(GARAGE_ID, db),
+    "garage inbox": lambda db: get_admin_messages_logic(GARAGE_ID, db),
+    "remorqueur inbox": lambda db: get_garage_messages_logic(REMORQUEUR_ID, db),
+}
+
+
+async def count_queries(message_count: int) -> dict:
+    counts = {}
+    async with sqlite_session() as (db, counter):
+        await seed(db, message_count)
+        for name, listing in LISTINGS.items():
+            db.expunge_all()
+            async with counter.counting():
+                messages = await listing(db)
+            assert len(messages) == message_count, name
+            counts[name] = counter.count
+    return counts
+
+
+def test_listing_query_count_does_not_grow_with_inbox_size():
+    small = asyncio.run(count_queries(1))
+    large = asyncio.run(count_queries(500))
+    assert small == large
@@ -0,0 +1,60 @@
+"""
+The sweeper takes stale drivers out of the presence backend, then writes
+them offline; a heartbeat landing in between must not be overwritten.
+"""
+import asyncio
+from datetime import datetime, timedelta
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from server.controllers import presenceController
+from server.models.authModel import Role, User
+from server.models.garageModel import Garage
+from server.models.remorqueurModel import Remorqueur
+from server.tests.conftest import sqlite_session
+
+SWEPT_AT = presenceController.EASTERN_TZ.localize(datetime(2026, 1, 5, 8, 0, 0))
+STALE_ID, BEAT_AGAIN_ID = 1, 2
+
+
+class SweptBackend:
+    """Both drivers were last seen at SWEPT_AT when the sweep took them"""
+
+    async def expire(self, now: float):
+        return [(STALE_ID, SWEPT_AT.timestamp()), (BEAT_AGAIN_ID, SWEPT_AT.timestamp())]
+
+
+async def online_after_sweep(monkeypatch) -> dict:
+    async with sqlite_session() as (db, _):
+        await db.execute(insert(Role).values(id=1, name="admin"))
+        await db.execute(insert(User).values(id=1, username="admin", password="x", role_id=1))
+        await db.execute(insert(Garage).values(
+            id=1, name="garage", email="garage@example.com", username="garage",
+            password="x", role_id=1, created_by_id=1,
+        ))
+        # STALE_ID came online an hour before; BEAT_AGAIN_ID beat again after the sweep
+        naive = SWEPT_AT.replace(tzinfo=None)
+        await db.execute(insert(Remorqueur).values([
+            {"id": STALE_ID, "name": "stale", "tel": "5145550101", "username": "stale", "password": "x",
+             "role_id": 1, "garage_id": 1, "is_online": True, "last_seen_at": naive - timedelta(hours=1)},
+            {"id": BEAT_AGAIN_ID, "name": "back", "tel": "5145550102", "username": "back", "password": "x",
+             "role_id": 1, "garage_id": 1, "is_online": True, "last_seen_at": naive + timedelta(seconds=5)},
+        ]))
+        await db.commit()
+
+        monkeypatch.setattr(presenceController, "get_presence_backend", lambda: SweptBackend())
+        monkeypatch.setattr(
+            presenceController, "PrimarySessionLocal",
+            lambda: AsyncSession(bind=db.bind, expire_on_commit=False),
+        )
+        assert await presenceController.expire_presence() == 2
+
+        db.expunge_all()
+        rows = (await db.execute(select(Remorqueur.id, Remorqueur.is_online, Remorqueur.last_seen_at))).all()
+        return {row.id: (row.is_online, row.last_seen_at) for row in rows}
+
+
+def test_sweep_does_not_overwrite_a_newer_heartbeat(monkeypatch):
+    result = asyncio.run(online_after_sweep(monkeypatch))
+    naive = SWEPT_AT.replace(tzinfo=None)
+    assert result[STALE_ID] == (False, naive)
+    assert result[BEAT_AGAIN_ID] == (True, naive + timedelta(seconds=5))
@@ -0,0 +1,50 @@
+"""
+Explicit recipients of a garage message are validated on the write path:
+a roster cached by this worker must not accept a driver deleted by another
+worker, nor reject one it created.
+"""
+import asyncio
+from sqlalchemy import delete, insert
+from server.controllers.messagesController import garage_remorqueur_ids
+from server.controllers.rosterController import roster_cache
+from server.models.authModel import Role, User
+from server.models.garageModel import Garage
+from server.models.remorqueurModel import Remorqueur
+from server.tests.conftest import sqlite_session
+
+GARAGE_ID = 1
+
+
+def remorqueur(remorqueur_id: int) -> dict:
+    return {
+        "id": remorqueur_id, "name": f"driver{remorqueur_id}", "tel": "5145550123",
+        "username": f"driver{remorqueur_id}", "password": "x", "role_id": 1, "garage_id": GARAGE_ID,
+    }
+
+
+async def validate_after_foreign_writes() -> set:
+    async with sqlite_session() as (db, _):
+        await db.execute(insert(Role).values(id=1, name="remorqueur"))
+        await db.execute(insert(User).values(id=1, username="admin", password="x", role_id=1))
+        await db.execute(insert(Garage).values(
+            id=GARAGE_ID, name="garage", email="garage@example.com", username="garage",
+            password="x", role_id=1, created_by_id=1,
+        ))
+        await db.execute(insert(Remorqueur).values([remorqueur(1), remorqueur(2)]))
+        await db.commit()
+
+        # This worker caches the roster, then another worker (no invalidation
+        # reaches us without Redis) deletes driver 2 and creates driver 3
+        assert (await roster_cache.get(GARAGE_ID, db)).ids == {1, 2}
+        await db.execute(delete(Remorqueur).where(Remorqueur.id == 2))
+        await db.execute(insert(Remorqueur).values(remorqueur(3)))
+        await db.commit()
+
+        try:
+            return await garage_remorqueur_ids(GARAGE_ID, {1, 2, 3}, db)
+        finally:
+            await roster_cache.invalidate(GARAGE_ID)
+
+
+def test_stale_roster_does_not_decide_recipients():
+    assert asyncio.run(validate_after_foreign_writes()) == {1, 3}
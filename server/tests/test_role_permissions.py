@@ -0,0 +1,57 @@
+"""
+Garage and remorqueur tokens carry the account type as their role; the
+router and the controllers must both check the account's own roles row.
+"""
+import asyncio
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import insert
+from server.controllers.authController import role_allows
+from server.controllers.permissionController import PermissionRegistry
+from server.main import require_permission
+from server.models.authModel import AuthPrincipal, Permission, Role, role_permission
+from server.tests.conftest import sqlite_session
+
+PREMIUM_GARAGE_ROLE, PLAIN_GARAGE_ROLE = 7, 8
+
+
+async def compiled_registry() -> PermissionRegistry:
+    """A 'garage' role without create_remorqueur, and a differently named garage role with it"""
+    async with sqlite_session() as (db, _):
+        await db.execute(insert(Role).values([
+            {"id": PREMIUM_GARAGE_ROLE, "name": "garage_premium"},
+            {"id": PLAIN_GARAGE_ROLE, "name": "garage"},
+        ]))
+        await db.execute(insert(Permission).values(id=3, name="create_remorqueur"))
+        await db.execute(insert(role_permission).values(role_id=PREMIUM_GARAGE_ROLE, permission_id=3))
+        await db.commit()
+        registry = PermissionRegistry()
+        await registry.refresh(db)
+        return registry
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    registry = asyncio.run(compiled_registry())
+    monkeypatch.setattr("server.controllers.authController.permission_registry", registry)
+    return registry
+
+
+def check(role_id):
+    principal = AuthPrincipal(id=1, role="garage", role_id=role_id)
+    return asyncio.run(require_permission("create_remorqueur")(principal))
+
+
+def test_role_id_decides_not_the_account_type(registry):
+    assert role_allows(PREMIUM_GARAGE_ROLE, [], "create_remorqueur")
+    assert not role_allows(PLAIN_GARAGE_ROLE, ["create_remorqueur"], "create_remorqueur")
+
+    assert check(PREMIUM_GARAGE_ROLE).role_id == PREMIUM_GARAGE_ROLE
+    with pytest.raises(HTTPException) as error:
+        check(PLAIN_GARAGE_ROLE)
+    assert error.value.status_code == 403
+
+
+def test_tokens_without_role_id_use_their_permissions(registry):
+    assert role_allows(None, ["create_remorqueur"], "create_remorqueur")
+    assert not role_allows(None, [], "create_remorqueur")